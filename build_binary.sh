@@ -32,7 +32,7 @@ pyinstaller \
     --osx-bundle-identifier "com.firecorners.app" \
     --add-binary "configure_ui.py:." \
     --collect-all firecorners \
-    firecorners/simple_hot_corners.py
+    firecorners/__main__.py
 
 # Copy helper scripts into the app bundle
 mkdir -p "dist/FireCorners.app/Contents/Resources/scripts"
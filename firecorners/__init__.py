@@ -5,8 +5,17 @@ A lightweight hot corners daemon that detects when your mouse cursor reaches
 the corners of your screen and triggers configured actions.
 """
 
-from .ui import ConfigWindow
-from .simple_hot_corners import main
-
 __version__ = "1.0.0"
-__all__ = ["ConfigWindow", "main"] 
\ No newline at end of file
+__all__ = ["ConfigWindow", "main"]
+
+
+def __getattr__(name):
+    """Lazily import the Qt/Quartz entry points so that the pure-Python
+    detection modules can be imported on machines without them."""
+    if name == "ConfigWindow":
+        from .ui import ConfigWindow
+        return ConfigWindow
+    if name == "main":
+        from .__main__ import main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,23 @@
+"""
+FireCorners Entry Point
+
+Runs the daemon with ``python -m firecorners`` and the ``firecorners``
+console script. This is also the entry script of the PyInstaller app
+bundle, which runs it outside the package, hence the absolute imports.
+
+The spawn helper is forked here, before the daemon module is imported:
+importing it loads Quartz and PyQt6, and the helper should carry neither.
+"""
+
+
+def main():
+    """Fork the spawn helper, then run the daemon"""
+    from firecorners.spawner import start_spawn_helper
+    spawn_helper = start_spawn_helper()
+
+    from firecorners.simple_hot_corners import main as run_daemon
+    run_daemon(spawn_helper)
+
+
+if __name__ == "__main__":
+    main()
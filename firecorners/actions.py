@@ -0,0 +1,342 @@
+"""
+FireCorners Actions
+
+Turns configured corner actions into launches. Configs come in a few
+dialects: the configuration window writes lists of {"type": "URL" |
+"Application" | "Shell Command" | "AppleScript", "value": ...}, while older
+hand-written configs use "url", "app", "shell" and "script" and may give a
+corner a single action object instead of a list. A "script" whose value is
+an absolute path ("/..." or "~/...") or names an existing file, relative
+to the config file's folder, runs that executable; any other "script" is
+AppleScript source. Whether a relative one exists is recorded, so a
+compiled config can tell when the answer changes (see scripts_unchanged).
+
+Every dialect is normalized once, when the config is loaded, and each
+corner is compiled into a tuple of LaunchPlans whose argv is already built,
+so a trigger only iterates and hands the plans to a launcher. Shell
+commands that use no shell syntax are split into argv up front and can be
+launched without a shell.
+
+Compatible actions of a corner are then merged into fewer launches: all
+URLs of a stage (the actions between two "wait": true) open with one
+`open`, and consecutive AppleScripts of a stage run as one script. Merging
+never crosses a stage boundary, so requested sequencing is kept.
+
+"Keystroke" actions send a key combination (see launchers.py); their plans
+carry the parsed key and, as a fallback, an AppleScript for System Events.
+
+"Python" actions call a function inside the daemon (see plugins.py); they
+launch nothing, and their plans carry the function's keyword arguments.
+
+"Application" actions are resolved to a bundle path through an
+ApplicationCatalog when one is given, so a missing application is reported
+at load time.
+
+The launcher is injected so the daemon can hand commands to subprocess
+while benchmarks and replays use a stub.
+"""
+
+import logging
+import os
+import shlex
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .geometry import CORNERS
+from .launchers import parse_key_combo
+
+logger = logging.getLogger(__name__)
+
+Command = Tuple[Union[List[str], str], bool]
+
+ACTION_TYPES = ("URL", "Application", "Shell Command", "AppleScript", "Keystroke", "Python")
+
+# Spellings accepted in config files, mapped to the types above
+TYPE_ALIASES = {
+    "url": "URL",
+    "app": "Application",
+    "application": "Application",
+    "shell": "Shell Command",
+    "shell command": "Shell Command",
+    "applescript": "AppleScript",
+    "keystroke": "Keystroke",
+    "keys": "Keystroke",
+    "python": "Python",
+}
+
+# Characters that make a command line need a real shell. Quotes are fine,
+# shlex handles those.
+SHELL_SYNTAX = frozenset("|&;<>()$`\\*?[]{}~#!\n")
+SHELL_BUILTINS = frozenset({
+    ".", ":", "alias", "case", "cd", "eval", "exec", "exit", "export", "for", "function",
+    "if", "read", "set", "source", "time", "trap", "ulimit", "umask", "unset", "until",
+    "wait", "while",
+})
+
+
+class LaunchPlan(NamedTuple):
+    kind: str  # one of ACTION_TYPES
+    value: str
+    args: Union[Tuple[str, ...], str]  # argv, or a command line when shell is True
+    shell: bool
+    script: Optional[str] = None  # source a warm interpreter of this kind can run
+    timeout: Optional[float] = None  # seconds; None means the executor's default
+    wait: bool = False  # start only after the actions before it have finished
+    kwargs: Tuple[Tuple[str, object], ...] = ()  # Python arguments, or the parsed key
+
+
+def command_for(action_type: str, value: str) -> Optional[Command]:
+    """Return (args, shell) for an action, or None for an unknown type"""
+    if action_type == "URL":
+        return ["open", value], False
+    elif action_type == "Application":
+        return ["open", "-a", value], False
+    elif action_type == "Shell Command":
+        return value, True
+    elif action_type == "AppleScript":
+        return ["osascript", "-e", value], False
+    return None
+
+
+def split_command(command: str) -> Optional[Tuple[str, ...]]:
+    """argv for a shell command line that needs no shell, or None"""
+    if SHELL_SYNTAX.intersection(command):
+        return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    if not argv or argv[0] in SHELL_BUILTINS or "=" in argv[0]:
+        return None
+    return tuple(argv)
+
+
+def normalize_action(action, base: Optional[str] = None,
+                     checked: Optional[Dict[str, bool]] = None) -> Dict:
+    """Rewrite one configured action in the canonical vocabulary.
+
+    Relative "script" paths are looked up in ``base``, the config file's
+    folder; without one they are not looked up. Each path looked up goes
+    into ``checked`` with whether it named a file. Raises ValueError if it
+    is not a usable action.
+    """
+    if not isinstance(action, dict):
+        raise ValueError("action must be an object with a type and a value")
+    action_type = action.get("type")
+    value = action.get("value")
+    if not action_type or not isinstance(action_type, str):
+        raise ValueError("action has no type")
+    if not value or not isinstance(value, str):
+        raise ValueError("action has no value")
+    normalized = dict(action)
+    if action_type == "script":
+        # A path to a script file, as test_config.py runs it, or AppleScript source
+        path = None
+        if value.startswith(("/", "~")):
+            path = os.path.abspath(os.path.expanduser(value))
+            if not os.path.isfile(path):
+                logger.warning("Script not found: %s", path)
+        elif base is not None and "\n" not in value:
+            candidate = os.path.abspath(os.path.join(base, value))
+            exists = os.path.isfile(candidate)
+            if checked is not None:
+                checked[candidate] = exists
+            if exists:
+                path = candidate
+        if path is not None:
+            normalized["type"] = "Shell Command"
+            normalized["value"] = shlex.quote(path)
+        else:
+            if os.sep in value and "\n" not in value:
+                logger.warning("Running script %r as AppleScript: no such file", value)
+            normalized["type"] = "AppleScript"
+    elif action_type not in ACTION_TYPES:
+        if action_type.lower() not in TYPE_ALIASES:
+            raise ValueError(f"unknown action type {action_type!r}")
+        normalized["type"] = TYPE_ALIASES[action_type.lower()]
+    return normalized
+
+
+def scripts_unchanged(checked: Iterable[Tuple[str, bool]]) -> bool:
+    """Whether each (path, existed) that normalize_action checked still holds"""
+    return all(os.path.isfile(path) == existed for path, existed in checked)
+
+
+def normalize_actions(entry, corner: str = "", base: Optional[str] = None,
+                      checked: Optional[Dict[str, bool]] = None) -> List[Dict]:
+    """A corner's configured actions as a list of canonical actions.
+
+    Accepts a list of actions, a single action object or nothing; invalid
+    actions are logged and skipped. ``base`` and ``checked`` are as for
+    normalize_action.
+    """
+    if not entry:
+        return []
+    if isinstance(entry, dict):
+        entry = [entry]
+    elif not isinstance(entry, list):
+        logger.warning("Ignoring actions of %s: expected a list, got %r", corner, entry)
+        return []
+    actions = []
+    for i, action in enumerate(entry):
+        try:
+            actions.append(normalize_action(action, base, checked))
+        except ValueError as e:
+            logger.warning("Ignoring action %d of %s: %s", i, corner, e)
+    return actions
+
+
+def compile_action(action: Dict, catalog=None, plugins=None) -> LaunchPlan:
+    """Build the launch plan for one canonical action; raises ValueError if invalid"""
+    action_type = action["type"]
+    value = action["value"]
+    timeout = action.get("timeout")
+    if timeout is not None:
+        timeout = float(timeout)
+        if timeout <= 0:
+            raise ValueError(f"timeout must be positive, got {timeout}")
+    wait = bool(action.get("wait", False))
+
+    if action_type == "Shell Command":
+        argv = split_command(value)
+        args, shell = (argv, False) if argv else (value, True)
+        return LaunchPlan(action_type, value, args, shell, value, timeout, wait)
+    if action_type == "AppleScript":
+        return LaunchPlan(action_type, value, ("osascript", "-e", value), False, value,
+                          timeout, wait)
+    if action_type == "Keystroke":
+        combo = parse_key_combo(value)
+        source = combo.applescript()
+        return LaunchPlan(action_type, value, ("osascript", "-e", source), False, source,
+                          timeout, wait, (("code", combo.code), ("modifiers", combo.modifiers)))
+    if action_type == "Python":
+        kwargs = action.get("args", {})
+        if not isinstance(kwargs, dict):
+            raise ValueError("args of a Python action must be an object")
+        if plugins is not None and not plugins.known(value):
+            logger.warning("Python action not found: %s", value)
+        return LaunchPlan(action_type, value, (value,), False, None, timeout, wait,
+                          tuple(sorted(kwargs.items())))
+    if action_type == "Application" and catalog is not None:
+        args = catalog.application_args(value)
+        if args[-1] == value and not os.path.isdir(value):
+            logger.warning("Application not found: %s", value)
+        return LaunchPlan(action_type, value, args, False, None, timeout, wait)
+    args, shell = command_for(action_type, value)
+    return LaunchPlan(action_type, value, tuple(args), shell, None, timeout, wait)
+
+
+def compile_actions(entry, corner: str = "", catalog=None, plugins=None,
+                    base: Optional[str] = None,
+                    checked: Optional[Dict[str, bool]] = None) -> Tuple[LaunchPlan, ...]:
+    """Launch plans for a corner's configured actions, skipping invalid ones"""
+    plans = []
+    for i, action in enumerate(normalize_actions(entry, corner, base, checked)):
+        try:
+            plans.append(compile_action(action, catalog, plugins))
+        except (TypeError, ValueError) as e:
+            logger.warning("Ignoring action %d of %s: %s", i, corner, e)
+    return batch_plans(plans)
+
+
+# AppleScript that cannot go inside a try block: handlers, declarations
+APPLESCRIPT_TOP_LEVEL = ("on ", "to ", "property ", "global ", "use ", "script ")
+
+
+def _mergeable_applescript(plan: LaunchPlan) -> bool:
+    return plan.kind == "AppleScript" and not any(
+        line.strip().lower().startswith(APPLESCRIPT_TOP_LEVEL)
+        for line in plan.value.splitlines())
+
+
+def merge_urls(plans: Sequence[LaunchPlan]) -> LaunchPlan:
+    """One plan that opens every URL of ``plans`` with a single `open`"""
+    urls = [plan.value for plan in plans]
+    return plans[0]._replace(value=" ".join(urls), args=("open",) + tuple(urls))
+
+
+def merge_applescripts(plans: Sequence[LaunchPlan]) -> LaunchPlan:
+    """One plan that runs the AppleScripts of ``plans`` in order.
+
+    Each snippet runs in its own try block, so a failing one does not stop
+    the rest; the merged script fails if any of them did.
+    """
+    lines = ["set fcErrors to {}"]
+    for plan in plans:
+        lines.append("try")
+        lines.extend("    " + line for line in plan.value.splitlines())
+        lines.extend(["on error fcMessage", "    set end of fcErrors to fcMessage", "end try"])
+    lines.append("if fcErrors is not {} then error (fcErrors as text)")
+    source = "\n".join(lines)
+    timeouts = [plan.timeout for plan in plans]
+    timeout = None if None in timeouts else sum(timeouts)
+    return plans[0]._replace(value=source, args=("osascript", "-e", source), script=source,
+                             timeout=timeout)
+
+
+def batch_plans(plans: Sequence[LaunchPlan]) -> Tuple[LaunchPlan, ...]:
+    """Merge compatible plans of each stage into fewer launches.
+
+    URLs with the same timeout become one plan at the position of the
+    first of them; runs of consecutive AppleScripts become one script.
+    """
+    batched = []
+    stage: List[LaunchPlan] = []
+    for plan in list(plans) + [None]:
+        if plan is None or (plan.wait and stage):
+            batched.extend(_batch_stage(stage))
+            stage = []
+        if plan is not None:
+            stage.append(plan)
+    return tuple(batched)
+
+
+def _batch_stage(stage: List[LaunchPlan]) -> List[LaunchPlan]:
+    urls: Dict[Optional[float], List[LaunchPlan]] = {}
+    for plan in stage:
+        if plan.kind == "URL":
+            urls.setdefault(plan.timeout, []).append(plan)
+
+    merged = []
+    for plan in stage:
+        if plan.kind == "URL":
+            group = urls.get(plan.timeout)
+            if group is None:
+                continue  # merged into the first URL of its group
+            merged.append(merge_urls(group) if len(group) > 1 else plan)
+            del urls[plan.timeout]
+        elif (merged and _mergeable_applescript(plan)
+              and isinstance(merged[-1], list)):
+            merged[-1].append(plan)
+        elif _mergeable_applescript(plan):
+            merged.append([plan])
+        else:
+            merged.append(plan)
+
+    result = [(merge_applescripts(item) if len(item) > 1 else item[0])
+              if isinstance(item, list) else item for item in merged]
+    if result:
+        # Only the stage's first plan waits for the previous stage
+        result = [plan._replace(wait=i == 0 and stage[0].wait) for i, plan in enumerate(result)]
+    return result
+
+
+def compile_config(config: Dict, zones: Sequence = (), catalog=None,
+                   plugins=None) -> Dict[str, Tuple[LaunchPlan, ...]]:
+    """Launch plans for every corner and zone that has actions.
+
+    ``zones`` are parsed ZoneSpecs; a zone's actions take precedence over
+    a corner of the same name. ``catalog`` is an ApplicationCatalog and
+    ``plugins`` a PluginRegistry; both are only used to report missing
+    applications and Python actions early.
+    """
+    plans = {}
+    for corner in CORNERS:
+        compiled = compile_actions(config.get(corner), corner, catalog, plugins)
+        if compiled:
+            plans[corner] = compiled
+    for zone in zones:
+        compiled = compile_actions(list(zone.actions), zone.name, catalog, plugins)
+        if compiled:
+            plans[zone.name] = compiled
+    return plans
+
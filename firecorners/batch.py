@@ -0,0 +1,249 @@
+"""
+FireCorners Batch Detection
+
+Vectorized counterpart of CornerDetector for replaying recorded traces with
+what-if settings. Given arrays of timestamps and coordinates it returns, in
+one pass, the zone of every sample, the zone entry and exit events and the
+samples at which actions would fire, exactly as ZoneStateMachine decides
+them for the live detector.
+
+Classification and entry/exit detection are pure NumPy. Cooldown makes
+triggers depend on each other, so those are resolved with a Python loop,
+but only over the visits that last long enough to satisfy the dwell time.
+Each step jumps straight to the next eligible sample by binary search.
+Timestamps must not decrease.
+
+Traces can be processed in chunks: pass the ``state`` of one result into
+the next call and the results match a single pass over the whole trace.
+
+NumPy is an optional dependency (``pip install firecorners[analysis]``).
+"""
+
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+from .state import INF
+from .zones import ZoneTable
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Batch detection needs NumPy: pip install firecorners[analysis]")
+    return numpy
+
+
+class BatchState(NamedTuple):
+    """Detector state carried between chunks"""
+    zone: Optional[str] = None
+    enter_time: float = 0.0
+    last_trigger_time: float = 0.0
+    exit_at: float = INF  # when leaving ``zone`` becomes final; INF while inside
+    ready: Tuple[Tuple[str, float], ...] = ()  # (zone, end of its cooldown) pairs
+
+
+class BatchResult(NamedTuple):
+    names: Tuple[str, ...]  # zone names; entries of ``zones`` index into this
+    zones: "numpy.ndarray"  # zone index per sample, -1 outside every zone
+    entries: "numpy.ndarray"  # sample indices where a zone is entered
+    exits: "numpy.ndarray"  # sample indices of the first sample after leaving a zone
+    triggers: "numpy.ndarray"  # sample indices at which actions fire
+    trigger_zones: "numpy.ndarray"  # zone index of each trigger
+    state: BatchState
+
+
+def classify_batch(table: ZoneTable, xs, ys) -> Tuple[Tuple[str, ...], "numpy.ndarray"]:
+    """Zone of every sample as (names, zone index array), -1 for no zone.
+
+    Fractional coordinates count as the pixel they fall in, as in
+    ZoneTable.classify.
+    """
+    np = _numpy()
+    xs = np.floor(np.asarray(xs)).astype(np.int64)
+    ys = np.floor(np.asarray(ys)).astype(np.int64)
+    names = []
+    ids = {}
+    zones = np.full(xs.shape, -1, dtype=np.int32)
+    unassigned = np.ones(xs.shape, dtype=bool)
+    for x0, y0, x1, y1, cx, cy, r2, name in table.shapes:
+        inside = unassigned & (xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)
+        if r2 >= 0:
+            dx = xs - cx
+            dy = ys - cy
+            inside &= dx * dx + dy * dy <= r2
+        if not inside.any():
+            continue
+        if name not in ids:
+            ids[name] = len(names)
+            names.append(name)
+        zones[inside] = ids[name]
+        unassigned &= ~inside
+    return tuple(names), zones
+
+
+def detect_batch(ts, xs, ys, table: ZoneTable, cooldown: float, dwell: float,
+                 state: Optional[BatchState] = None, hysteresis: float = 0.0) -> BatchResult:
+    """Run the ZoneStateMachine rules over whole arrays"""
+    np = _numpy()
+    ts = np.asarray(ts, dtype=np.float64)
+    state = state or BatchState()
+    names, zones = classify_batch(table, xs, ys)
+    n = len(zones)
+    empty = np.empty(0, dtype=np.int64)
+    if n == 0:
+        return BatchResult(names, zones, empty, empty, empty, empty, state)
+
+    # Runs of samples in the same zone; -1 runs are gaps outside every zone
+    changed = np.ones(n, dtype=bool)
+    changed[1:] = zones[1:] != zones[:-1]
+    starts = np.flatnonzero(changed)
+    ends = np.append(starts[1:], n)
+    labels = zones[starts]
+    runs = len(starts)
+
+    # Zone of the visit the previous chunk left open: -1 for none, -2 for
+    # a zone this chunk never touches
+    if state.zone is None:
+        carried = -1
+    else:
+        carried = names.index(state.zone) if state.zone in names else -2
+
+    # Time at which leaving through each gap becomes final
+    gap_exit = ts[starts] + hysteresis
+    if carried != -1 and state.exit_at != INF and labels[0] == -1:
+        gap_exit[0] = state.exit_at
+
+    # A zone run continues the visit before a gap if it returns to the same
+    # zone before the exit became final
+    continues = np.zeros(runs, dtype=bool)
+    if runs > 2:
+        continues[2:] = ((labels[2:] >= 0) & (labels[1:-1] == -1) &
+                         (labels[2:] == labels[:-2]) & (ts[starts[2:]] < gap_exit[1:-1]))
+    if carried >= 0:
+        if labels[0] == carried:
+            continues[0] = state.exit_at == INF or ts[0] < state.exit_at
+        elif labels[0] == -1 and runs > 1 and labels[1] == carried:
+            continues[1] = ts[starts[1]] < gap_exit[0]
+    carried_continues = bool(continues[0] or (runs > 1 and continues[1]))
+
+    # Visits: zone runs joined across short gaps. A visit continuing the
+    # previous chunk keeps that chunk's entry time and may fire on its
+    # first sample.
+    zone_runs = np.flatnonzero(labels >= 0)
+    visit_start = ~continues[zone_runs]
+    if carried_continues:
+        visit_start[0] = True
+    first_runs = zone_runs[visit_start]
+    last_runs = zone_runs[np.append(np.flatnonzero(visit_start)[1:], len(zone_runs)) - 1
+                          if len(zone_runs) else empty]
+    visit_zone = labels[first_runs]
+    first = starts[first_runs]
+    visit_end = ends[last_runs]
+    enter_times = ts[first]
+    entries = first
+    first = first + 1
+    if carried_continues:
+        enter_times[0] = state.enter_time
+        first[0] -= 1
+        entries = entries[1:]
+
+    # Where each visit ends: the next zone run, or the first gap sample
+    # after its exit became final
+    closing = last_runs
+    if carried != -1 and not carried_continues:
+        closing = np.concatenate(([-1], closing))
+    after = closing + 1
+    after = after[after < runs]
+    exits = starts[after]
+    in_gap = labels[after] == -1
+    gaps = after[in_gap]
+    released = np.maximum(np.searchsorted(ts, gap_exit[gaps], side="left"), starts[gaps])
+    reentry = np.append(starts, -1)[gaps + 1]
+    exits[in_gap] = np.where(released < ends[gaps], released, reentry)
+    exits = exits[exits >= 0]
+
+    # Earliest dwell-satisfying sample of each visit, vectorized; visits
+    # that end before then can never fire and are dropped up front
+    dwell_at = enter_times + dwell
+    dwell_index = np.searchsorted(ts, dwell_at, side="left")
+    candidates = np.flatnonzero(np.maximum(dwell_index, first) < visit_end)
+
+    triggers = []
+    trigger_zones = []
+    ready = dict(state.ready)
+    last = state.last_trigger_time
+    for v in candidates:
+        zone = int(visit_zone[v])
+        name = names[zone]
+        hi = int(visit_end[v])
+        at = max(float(dwell_at[v]), ready.get(name, cooldown))
+        i = max(int(first[v]), int(np.searchsorted(ts, at, side="left")))
+        while i < hi:
+            if zones[i] != zone:
+                # Inside a gap of the visit: skip to where the cursor is back
+                i = int(starts[np.searchsorted(starts, i, side="right")])
+                continue
+            triggers.append(i)
+            trigger_zones.append(zone)
+            last = float(ts[i])
+            ready[name] = last + cooldown
+            i = max(i + 1, int(np.searchsorted(ts, ready[name], side="left")))
+
+    ready_pairs = tuple(sorted(ready.items()))
+    final_state = BatchState(None, 0.0, last, INF, ready_pairs)
+    if labels[-1] >= 0:
+        final_state = BatchState(names[labels[-1]], float(enter_times[-1]), last, INF,
+                                 ready_pairs)
+    elif ts[-1] < gap_exit[-1]:
+        # Ended in a gap whose exit is not final yet
+        if runs > 1:
+            final_state = BatchState(names[labels[-2]], float(enter_times[-1]), last,
+                                     float(gap_exit[-1]), ready_pairs)
+        elif carried != -1:
+            final_state = BatchState(state.zone, state.enter_time, last,
+                                     float(gap_exit[0]), ready_pairs)
+
+    return BatchResult(names, zones, entries, exits,
+                       np.asarray(triggers, dtype=np.int64),
+                       np.asarray(trigger_zones, dtype=np.int32), final_state)
+
+
+def trace_arrays(trace) -> Tuple["numpy.ndarray", "numpy.ndarray", "numpy.ndarray"]:
+    """(timestamps in seconds, xs, ys) arrays for a mapped trace, across all its layouts.
+
+    The arrays are copies, so they outlive the trace and do not keep
+    close() from releasing the mapping. detect_trace works on the mapping
+    directly, for traces too large to copy.
+    """
+    np = _numpy()
+    segments = trace.segments
+    xs = np.concatenate([np.asarray(segment.xs) for segment in segments])
+    ys = np.concatenate([np.asarray(segment.ys) for segment in segments])
+    stamps = np.concatenate([np.asarray(segment.timestamps_us) for segment in segments])
+    return stamps.astype(np.float64) / 1e6, xs, ys
+
+
+def detect_trace(trace, table: ZoneTable, cooldown: float, dwell: float,
+                 chunk: int = 1 << 24, hysteresis: float = 0.0) -> Sequence[BatchResult]:
+    """Run detect_batch over a mapped trace in chunks of ``chunk`` samples.
+
+    Samples recorded after a display layout change are classified against
+    that layout, with the threshold and zones of ``table``. Trigger and
+    entry indices are relative to the start of each result's chunk.
+    """
+    np = _numpy()
+    results = []
+    state = None
+    for segment in trace.segments:
+        if list(segment.displays) != list(table.displays):
+            table = ZoneTable(segment.displays, table.threshold, table.zones)
+        xs = np.asarray(segment.xs)
+        ys = np.asarray(segment.ys)
+        stamps = np.asarray(segment.timestamps_us)
+        for start in range(0, len(xs), chunk):
+            ts = stamps[start:start + chunk].astype(np.float64) / 1e6
+            result = detect_batch(ts, xs[start:start + chunk], ys[start:start + chunk],
+                                  table, cooldown, dwell, state, hysteresis)
+            state = result.state
+            results.append(result)
+    return results
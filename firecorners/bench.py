@@ -0,0 +1,1228 @@
+#!/usr/bin/env python3
+"""
+FireCorners Benchmarks
+
+Measures the detection and dispatch hot path without Quartz or Qt, so it
+runs on any machine with Python.
+
+Suites:
+  hotpath    synthetic workloads (random walks, Fitts-law flicks into
+             corners, jitter along edges) or a recorded trace through the
+             corner classifier, the trigger state machine and action
+             executor with launches stubbed out
+  zones      zone lookup cost as the number of configured zones grows
+  batch      vectorized batch detection against the per-sample detector
+             (needs NumPy)
+  scheduler  missed and late triggers, latency and wakeups of the fixed and
+             adaptive polling schedulers on a replay
+  pipelines  trigger latency and idle wakeups of the polling and
+             event-driven pipelines, in real time
+  interpreters
+             per-trigger latency of script actions on warm interpreter
+             workers against one-shot launches, for /bin/sh and a fake
+             AppleScript interpreter
+  spawn      launch latency and peak child RSS for bursts of triggers,
+             through subprocess, posix_spawn, the spawn helper and an
+             in-process launcher, from a process inflated to a daemon-like
+             size
+  config     config reload latency and idle wakeups of the change
+             notification watcher against mtime polling, for in-place and
+             rename-over saves, the cost of rebuilding a config snapshot
+             from scratch against after a one-zone edit, of loading
+             it from JSON against from a compiled artifact, and of
+             switching profiles against rewriting the config
+  session    wakeups per hour of the polling pipeline while the user is
+             active, idle, locked out or the display is asleep, with and
+             without a session provider, on a virtual clock
+
+Usage:
+  firecorners-bench [--suite=all] [--samples=200000] [--trace=PATH] [--json=PATH]
+"""
+
+import json
+import math
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from . import __version__
+from .actions import compile_config
+from .compiler import artifact_path, load_snapshot
+from .detector import CornerDetector
+from .executor import ActionExecutor
+from .geometry import Display, single_display
+from .interpreters import InterpreterPool, driver_worker, shell_worker
+from .launchers import RecordingLauncher
+from .pipeline import EventPipeline, PollingPipeline
+from .pointer import PointerSource, Sample, SyntheticEventSource
+from .scheduler import AdaptiveScheduler, FixedScheduler
+from .session import FakeSessionProvider
+from .profiles import profile_config
+from .snapshot import build_snapshot, switch_diff
+from .spawner import maxrss_kib, posix_spawn_popen, start_spawn_helper
+from .state import ZoneStateMachine
+from .watcher import ConfigWatcher
+from .zones import ZoneSpec, ZoneTable
+
+SCREEN_WIDTH = 1920
+SCREEN_HEIGHT = 1080
+CENTER = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+# The last pixel of the screen is one short of its size
+RIGHT = SCREEN_WIDTH - 1
+BOTTOM = SCREEN_HEIGHT - 1
+CORNERS = ((0, 0), (RIGHT, 0), (0, BOTTOM), (RIGHT, BOTTOM))
+SAMPLE_INTERVAL = 1 / 125.0  # a typical mouse report rate
+THRESHOLD = 5
+DWELL = 0.1
+COOLDOWN = 0.5
+
+BENCH_CONFIG = {
+    corner: [
+        {"type": "URL", "value": "https://example.com/" + corner},
+        {"type": "Shell Command", "value": "true"},
+    ]
+    for corner in ("top_left", "top_right", "bottom_left", "bottom_right")
+}
+BENCH_PLANS = compile_config(BENCH_CONFIG)
+
+
+def _clamp(x, y):
+    return min(max(x, 0), RIGHT), min(max(y, 0), BOTTOM)
+
+
+def workload_random_walk(samples: int, seed: int = 0) -> List[Sample]:
+    """Random walk over the whole screen with momentum, so the cursor drifts
+    and comes to rest against the edges and in the corners like a hand does"""
+    rng = random.Random(seed)
+    x, y = CENTER
+    vx = vy = 0.0
+    out = []
+    for i in range(samples):
+        vx = 0.98 * vx + rng.gauss(0, 1)
+        vy = 0.98 * vy + rng.gauss(0, 1)
+        x, y = _clamp(x + vx, y + vy)
+        out.append((i * SAMPLE_INTERVAL, int(x), int(y)))
+    return out
+
+
+def _flick(rng: random.Random, out: List[Sample], t: float, x: float, y: float):
+    """Append one aimed movement into a random corner, a short rest there and a
+    jump back towards the middle; returns the final (t, x, y).
+
+    Movement time follows Fitts' law, MT = a + b * log2(D / W + 1), with the
+    corner threshold as target width, and positions follow a minimum-jerk
+    profile that overshoots and is clamped at the screen edge like a real
+    cursor.
+    """
+    tx, ty = rng.choice(CORNERS)
+    # Aim a little past the corner; the screen edge stops the cursor
+    tx += -40 if tx == 0 else 40
+    ty += -40 if ty == 0 else 40
+    distance = math.hypot(tx - x, ty - y)
+    duration = 0.1 + 0.15 * math.log2(distance / (2 * THRESHOLD) + 1)
+    steps = max(1, int(duration / SAMPLE_INTERVAL))
+    sx, sy = x, y
+    for step in range(1, steps + 1):
+        s = step / steps
+        s = 10 * s ** 3 - 15 * s ** 4 + 6 * s ** 5
+        x, y = _clamp(sx + (tx - sx) * s, sy + (ty - sy) * s)
+        t += SAMPLE_INTERVAL
+        out.append((t, int(x), int(y)))
+    for _ in range(rng.randint(5, 60)):
+        t += SAMPLE_INTERVAL
+        out.append((t, int(x), int(y)))
+    x, y = rng.uniform(200, SCREEN_WIDTH - 200), rng.uniform(200, SCREEN_HEIGHT - 200)
+    t += SAMPLE_INTERVAL
+    out.append((t, int(x), int(y)))
+    return t, x, y
+
+
+def workload_fitts_flicks(samples: int, seed: int = 0) -> List[Sample]:
+    """Back-to-back fast aimed movements into random corners"""
+    rng = random.Random(seed)
+    out = []
+    t, x, y = 0.0, CENTER[0], CENTER[1]
+    while len(out) < samples:
+        t, x, y = _flick(rng, out, t, x, y)
+    return out[:samples]
+
+
+def workload_edge_jitter(samples: int, seed: int = 0) -> List[Sample]:
+    """Slides along the top and bottom edges with jitter around the threshold.
+
+    The slide has momentum and the jitter drifts rather than jumping each
+    sample, so the cursor both hovers at the threshold and rests in corners.
+    """
+    rng = random.Random(seed)
+    out = []
+    x = float(CENTER[0])
+    vx = jitter = 0.0
+    for i in range(samples):
+        edge = 0 if (i // 2000) % 2 == 0 else BOTTOM
+        vx = 0.98 * vx + rng.gauss(0, 4)
+        x = min(max(x + vx, 0), RIGHT)
+        jitter = 0.9 * jitter + rng.gauss(0, THRESHOLD * 1.5 * math.sqrt(1 - 0.9 ** 2))
+        y = edge + abs(jitter) if edge == 0 else edge - abs(jitter)
+        out.append((i * SAMPLE_INTERVAL, int(x), int(y)))
+    return out
+
+
+def workload_desk_session(samples: int, seed: int = 0) -> List[Sample]:
+    """Mostly parked cursor with an occasional flick into a corner.
+
+    The pointer rests mid-screen for 2-20 s between flicks, which is closer
+    to real desk use than continuous motion.
+    """
+    rng = random.Random(seed)
+    out = []
+    t, x, y = 0.0, CENTER[0], CENTER[1]
+    while len(out) < samples:
+        for _ in range(int(rng.uniform(2, 20) / SAMPLE_INTERVAL)):
+            t += SAMPLE_INTERVAL
+            out.append((t, int(x), int(y)))
+        t, x, y = _flick(rng, out, t, x, y)
+    return out[:samples]
+
+
+WORKLOADS = {
+    "random_walk": workload_random_walk,
+    "fitts_flicks": workload_fitts_flicks,
+    "edge_jitter": workload_edge_jitter,
+    "desk_session": workload_desk_session,
+}
+
+
+class _StubProcess:
+    """A process that has already exited successfully"""
+
+    stdout = None
+
+    def wait(self, timeout=None):
+        return 0
+
+
+class _StubLaunches(RecordingLauncher):
+    """Carries out every plan the executor hands over by counting it.
+
+    Plans the launcher does not handle come back through ``popen``, so
+    shell commands are counted without starting a process either.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.launched = threading.Event()
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _launched(self):
+        with self._lock:
+            self.count += 1
+        self.launched.set()
+
+    def launch(self, kind, args, options):
+        self._launched()
+        return True
+
+    def popen(self, args, **kwargs):
+        self._launched()
+        return _StubProcess()
+
+
+def _stub_executor(launches: _StubLaunches) -> ActionExecutor:
+    # No rate limit or single-flight: replayed samples fire far faster than a hand
+    return ActionExecutor(popen=launches.popen, clock=time.perf_counter, launcher=launches,
+                          single_flight=None, rate=None, max_pending=1 << 16)
+
+
+def _detector() -> CornerDetector:
+    return CornerDetector(single_display(SCREEN_WIDTH, SCREEN_HEIGHT), THRESHOLD, COOLDOWN, DWELL)
+
+
+def _alloc_bytes_per_sample(step, samples: List[Sample], limit: int = 20000) -> float:
+    """Mean transient heap growth while processing one sample.
+
+    CPython has no cumulative allocation counter, so this traces the peak
+    allocated memory within each step; an allocation-free step reports 0.
+    """
+    subset = samples[:limit]
+    if not subset:
+        return 0.0
+
+    def measure(fn):
+        total = 0
+        get_traced_memory = tracemalloc.get_traced_memory
+        reset_peak = tracemalloc.reset_peak
+        for sample in subset:
+            # Read before resetting, so the result tuple is already freed
+            current = get_traced_memory()[0]
+            reset_peak()
+            fn(sample)
+            total += get_traced_memory()[1] - current
+        return total
+
+    tracemalloc.start()
+    try:
+        # Subtract what the measurement itself allocates
+        baseline = measure(lambda sample: None)
+        total = measure(step)
+    finally:
+        tracemalloc.stop()
+    return max(0.0, (total - baseline) / len(subset))
+
+
+def bench_hotpath(name: str, samples: List[Sample]) -> Dict:
+    """Throughput of each hot-path stage plus entry-to-dispatch latency"""
+    result = {"workload": name, "samples": len(samples)}
+
+    # Stage 1: classification only
+    classify = _detector().classify
+    start = time.perf_counter()
+    for _, x, y in samples:
+        classify(x, y)
+    result["classify_samples_per_sec"] = len(samples) / (time.perf_counter() - start)
+
+    # Stage 2: the trigger state machine alone, over pre-classified samples
+    classify = _detector().classify
+    stream = [(t, classify(x, y)) for t, x, y in samples]
+    machine = ZoneStateMachine(COOLDOWN, DWELL)
+    machine_update = machine.update
+    start = time.perf_counter()
+    for t, zone in stream:
+        machine_update(t, zone)
+    result["machine_samples_per_sec"] = len(samples) / (time.perf_counter() - start)
+    machine_update = ZoneStateMachine(COOLDOWN, DWELL).update
+    result["machine_alloc_bytes_per_sample"] = _alloc_bytes_per_sample(
+        lambda item: machine_update(item[0], item[1]), stream)
+
+    # Stage 3: classification plus dwell/cooldown
+    update = _detector().update
+    start = time.perf_counter()
+    for t, x, y in samples:
+        update(t, x, y)
+    result["detect_samples_per_sec"] = len(samples) / (time.perf_counter() - start)
+
+    # Stage 4: detection plus handing triggers to the action executor, as
+    # the daemon does, with launches stubbed out
+    detector = _detector()
+    launches = _StubLaunches()
+    executor = _stub_executor(launches)
+    submit = executor.submit
+    clock = time.perf_counter
+    overheads = []
+    start = clock()
+    for t, x, y in samples:
+        before = clock()
+        corner = detector.update(t, x, y)
+        if corner:
+            submit(corner, BENCH_PLANS[corner])
+            overheads.append(clock() - before)
+    elapsed = clock() - start
+    executor.shutdown(wait=True)
+    result["dispatch_samples_per_sec"] = len(samples) / elapsed
+    result["triggers"] = len(overheads)
+    result["launches"] = launches.count
+    result["dispatch_overhead_us_p50"] = _percentile(overheads, 50) * 1e6
+    result["dispatch_overhead_us_p99"] = _percentile(overheads, 99) * 1e6
+
+    # Entry-to-dispatch latency: from the sample that entered the corner to
+    # the return of the executor submit its trigger led to. The time spent
+    # waiting for samples (dwell, cooldown, the report rate) comes from the
+    # sample clock, the time spent handling the triggering sample from the
+    # wall clock; entries are found in an untimed pass beside the detector
+    detector = _detector()
+    classify = detector.classify
+    launches = _StubLaunches()
+    executor = _stub_executor(launches)
+    zone = None
+    entered = 0.0
+    latencies = []
+    corners = {}
+    for t, x, y in samples:
+        here = classify(x, y)
+        if here != zone:
+            zone, entered = here, t
+        before = clock()
+        corner = detector.update(t, x, y)
+        if corner:
+            submit(corner, BENCH_PLANS[corner])
+            latencies.append(t - entered + clock() - before)
+            corners[corner] = corners.get(corner, 0) + 1
+    executor.shutdown(wait=True)
+    result["corner_triggers"] = corners
+    result["entry_to_dispatch_ms_p50"] = _percentile(latencies, 50) * 1000
+    result["entry_to_dispatch_ms_p99"] = _percentile(latencies, 99) * 1000
+
+    # Wall-clock time from a trigger to the start of its first launch on a
+    # worker thread, one trigger at a time
+    launches = _StubLaunches()
+    executor = _stub_executor(launches)
+    latencies = []
+    for _ in range(min(len(overheads), 200) or 1):
+        launches.launched.clear()
+        start = clock()
+        executor.submit("top_left", BENCH_PLANS["top_left"])
+        launches.launched.wait(1.0)
+        latencies.append(clock() - start)
+    executor.shutdown(wait=True)
+    result["trigger_to_launch_ms_p50"] = _percentile(latencies, 50) * 1000
+    result["trigger_to_launch_ms_p99"] = _percentile(latencies, 99) * 1000
+
+    update = _detector().update
+    launches = _StubLaunches()
+    executor = _stub_executor(launches)
+    submit = executor.submit
+
+    def step(sample):
+        corner = update(sample[0], sample[1], sample[2])
+        if corner:
+            submit(corner, BENCH_PLANS[corner])
+
+    result["alloc_bytes_per_sample"] = _alloc_bytes_per_sample(step, samples)
+    executor.shutdown(wait=True)
+    return result
+
+
+ZONE_DISPLAYS = [
+    Display(1, 0, 0, 2560, 1440),
+    Display(2, 2560, 0, 1920, 1080),
+    Display(3, -1440, -400, 1440, 2560),
+]
+
+
+def _random_zones(count: int, rng: random.Random) -> List[ZoneSpec]:
+    zones = []
+    for i in range(count):
+        display = rng.randrange(len(ZONE_DISPLAYS))
+        kind = i % 3
+        if kind == 0:
+            start = rng.uniform(0, 0.9)
+            zones.append(ZoneSpec(f"edge{i}", "edge", side=rng.choice(("top", "bottom", "left", "right")),
+                                  display=display, start=start, end=start + 0.1,
+                                  threshold=rng.randint(1, 10)))
+        elif kind == 1:
+            d = ZONE_DISPLAYS[display]
+            zones.append(ZoneSpec(f"rect{i}", "rect", display=display,
+                                  rect=(rng.randrange(d.width - 100), rng.randrange(d.height - 100),
+                                        rng.randint(10, 100), rng.randint(10, 100))))
+        else:
+            zones.append(ZoneSpec(f"arc{i}", "arc", side=rng.choice(("top_left", "top_right",
+                                                                        "bottom_left", "bottom_right")),
+                                  display=display, radius=rng.randint(10, 80)))
+    return zones
+
+
+def bench_zones(samples: int, seed: int = 0, counts=(0, 10, 100, 1000)) -> List[Dict]:
+    """Zone lookup cost on a three-display layout as the zone count grows"""
+    rng = random.Random(seed)
+    points = []
+    for _ in range(samples):
+        d = rng.choice(ZONE_DISPLAYS)
+        points.append((d.x + rng.randrange(d.width), d.y + rng.randrange(d.height)))
+    rows = []
+    for count in counts:
+        start = time.perf_counter()
+        table = ZoneTable(ZONE_DISPLAYS, THRESHOLD, _random_zones(count, rng))
+        build = time.perf_counter() - start
+        classify = table.classify
+        hits = 0
+        start = time.perf_counter()
+        for x, y in points:
+            if classify(x, y) is not None:
+                hits += 1
+        elapsed = time.perf_counter() - start
+        rows.append({
+            "zones": count,
+            "regions": len(table.regions),
+            "build_ms": build * 1000,
+            "ns_per_lookup": elapsed / len(points) * 1e9,
+            "hit_rate": hits / len(points),
+        })
+    return rows
+
+
+def bench_batch(name: str, samples: List[Sample]) -> Optional[Dict]:
+    """Vectorized batch detection against the per-sample detector"""
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    from .batch import detect_batch
+
+    ts = np.array([t for t, _, _ in samples], dtype=np.float64)
+    xs = np.array([x for _, x, _ in samples], dtype=np.int32)
+    ys = np.array([y for _, _, y in samples], dtype=np.int32)
+
+    detector = _detector()
+    update = detector.update
+    start = time.perf_counter()
+    loop_triggers = sum(1 for t, x, y in samples if update(t, x, y))
+    loop_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = detect_batch(ts, xs, ys, _detector().table, COOLDOWN, DWELL)
+    batch_elapsed = time.perf_counter() - start
+    return {
+        "workload": name,
+        "samples": len(samples),
+        "loop_samples_per_sec": len(samples) / loop_elapsed,
+        "batch_samples_per_sec": len(samples) / batch_elapsed,
+        "speedup": loop_elapsed / batch_elapsed,
+        "triggers_match": loop_triggers == len(result.triggers),
+    }
+
+
+def _simulate_polling(samples: List[Sample], scheduler):
+    """Poll a sample-and-hold replay of ``samples`` on a virtual clock.
+
+    Returns (trigger times, wakeups).
+    """
+    detector = _detector()
+    triggers = []
+    wakeups = 0
+    index = 0
+    last_index = len(samples) - 1
+    now = samples[0][0]
+    end = samples[-1][0]
+    while now <= end:
+        while index < last_index and samples[index + 1][0] <= now:
+            index += 1
+        _, x, y = samples[index]
+        if detector.update(now, x, y):
+            triggers.append(now)
+        wakeups += 1
+        now += scheduler.next_interval(now, x, y, detector)
+    return triggers, wakeups
+
+
+def _visits(samples: List[Sample]):
+    """(enter, exit, first trigger) times of each triggering visit, sampling every sample"""
+    detector = _detector()
+    visits = []
+    current = None
+    for t, x, y in samples:
+        corner = detector.update(t, x, y)
+        if detector.last_corner != current:
+            if current is not None:
+                visits[-1][1] = t
+            current = detector.last_corner
+            if current is not None:
+                visits.append([t, float("inf"), None])
+        if corner and visits[-1][2] is None:
+            visits[-1][2] = t
+    return [v for v in visits if v[2] is not None]
+
+
+def bench_scheduler(name: str, samples: List[Sample], late_ms: float = 100.0) -> List[Dict]:
+    """Missed and late triggers of fixed vs adaptive polling against every-sample detection"""
+    from .scheduler import AdaptiveScheduler, FixedScheduler
+
+    visits = _visits(samples)
+    duration = samples[-1][0] - samples[0][0]
+    rows = []
+    for label, scheduler in (("fixed", FixedScheduler()), ("adaptive", AdaptiveScheduler())):
+        triggers, wakeups = _simulate_polling(samples, scheduler)
+        latencies = []
+        missed = 0
+        j = 0
+        for enter, leave, first in visits:
+            while j < len(triggers) and triggers[j] < enter:
+                j += 1
+            if j < len(triggers) and triggers[j] < leave:
+                latencies.append(triggers[j] - first)
+            else:
+                missed += 1
+        rows.append({
+            "workload": name,
+            "scheduler": label,
+            "visits": len(visits),
+            "missed": missed,
+            "late": sum(1 for lat in latencies if lat * 1000 > late_ms),
+            "latency_ms_p50": _percentile(latencies, 50) * 1000,
+            "latency_ms_p99": _percentile(latencies, 99) * 1000,
+            "wakeups_per_minute": wakeups * 60.0 / duration if duration else 0.0,
+        })
+    return rows
+
+
+class _LivePosition(PointerSource):
+    """Polling source over a position that the benchmark moves directly"""
+
+    def __init__(self):
+        self.position = CENTER
+
+    def sample(self):
+        x, y = self.position
+        return time.time(), x, y
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _run_trials(move, triggered, trials: int, reset: float):
+    """Move into a corner ``trials`` times and collect entry-to-trigger latency"""
+    latencies = []
+    for _ in range(trials):
+        move(*CENTER)
+        # Land at a random phase relative to any polling interval
+        time.sleep(reset + random.uniform(0, 0.1))
+        triggered.clear()
+        entered = time.time()
+        move(0, 0)
+        if triggered.wait(2.0):
+            latencies.append(triggered.at - entered)
+    move(*CENTER)
+    return latencies
+
+
+class _Trigger(threading.Event):
+    at = 0.0
+
+    def __call__(self, corner, timestamp):
+        self.at = time.time()
+        self.set()
+
+
+def _summarize(name, latencies, wakeups, idle_seconds) -> Dict:
+    return {
+        "pipeline": name,
+        "trials": len(latencies),
+        "latency_ms_p50": statistics.median(latencies) * 1000 if latencies else None,
+        "latency_ms_p99": _percentile(latencies, 99) * 1000 if latencies else None,
+        "latency_ms_max": max(latencies) * 1000 if latencies else None,
+        "wakeups_per_idle_minute": wakeups * 60.0 / idle_seconds,
+    }
+
+
+def bench_polling(trials: int = 20, idle_seconds: float = 2.0) -> Dict:
+    """Trigger latency and idle wakeups of the fixed-interval poller"""
+    source = _LivePosition()
+    triggered = _Trigger()
+    detector = CornerDetector(single_display(SCREEN_WIDTH, SCREEN_HEIGHT), cooldown=0.0)
+    pipeline = PollingPipeline(detector, triggered)
+    thread = threading.Thread(target=pipeline.run, args=(source,), daemon=True)
+    thread.start()
+
+    def move(x, y):
+        source.position = (x, y)
+
+    time.sleep(0.2)
+    before = pipeline.wakeups
+    time.sleep(idle_seconds)
+    wakeups = pipeline.wakeups - before
+
+    latencies = _run_trials(move, triggered, trials, reset=0.2)
+    pipeline.stop()
+    thread.join()
+    return _summarize("polling", latencies, wakeups, idle_seconds)
+
+
+def bench_event(trials: int = 20, idle_seconds: float = 2.0) -> Dict:
+    """Trigger latency and idle wakeups of the event-driven pipeline"""
+    source = SyntheticEventSource()
+    triggered = _Trigger()
+    detector = CornerDetector(single_display(SCREEN_WIDTH, SCREEN_HEIGHT), cooldown=0.0)
+    pipeline = EventPipeline(detector, triggered)
+    thread = threading.Thread(target=pipeline.run, args=(source,), daemon=True)
+    thread.start()
+    time.sleep(0.05)
+    source.move(*CENTER)
+
+    time.sleep(0.2)
+    before = pipeline.wakeups
+    time.sleep(idle_seconds)
+    wakeups = pipeline.wakeups - before
+
+    latencies = _run_trials(source.move, triggered, trials, reset=0.05)
+    pipeline.stop()
+    thread.join()
+    return _summarize("event", latencies, wakeups, idle_seconds)
+
+
+def _latency_row(name: str, mode: str, run, trials: int) -> Dict:
+    latencies = []
+    for _ in range(trials):
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    return {
+        "interpreter": name,
+        "mode": mode,
+        "trials": trials,
+        "latency_ms_p50": _percentile(latencies, 50) * 1000,
+        "latency_ms_p99": _percentile(latencies, 99) * 1000,
+    }
+
+
+def bench_interpreters(trials: int = 50) -> List[Dict]:
+    """Per-trigger latency of warm interpreter workers against one-shot launches.
+
+    The fake driver stands in for AppleScript: like osascript, a one-shot
+    launch pays for starting an interpreter before running the script.
+    """
+    rows = []
+    cases = [
+        ("sh", shell_worker, "true", lambda script: ["/bin/sh", "-c", script]),
+        ("fake", lambda: driver_worker("fake"), "exit 0",
+         lambda script: [sys.executable, "-m", "firecorners.interpreters", "fake", "-e", script]),
+    ]
+    for name, factory, script, one_shot in cases:
+        pool = InterpreterPool(name, factory, size=1)
+        pool.start()
+        try:
+            # No warm row where workers cannot start, e.g. a /bin/sh without job control
+            if pool.run(script, 10.0) is not None:
+                rows.append(_latency_row(name, "warm", lambda: pool.run(script, 10.0), trials))
+        finally:
+            pool.stop()
+        env = factory().env
+        rows.append(_latency_row(name, "one-shot",
+                                 lambda: subprocess.run(one_shot(script), env=env), trials))
+    return rows
+
+
+def _burst(popen, size: int) -> List[float]:
+    """Launch ``size`` commands back to back, then reap them; return launch latencies"""
+    latencies = []
+    processes = []
+    for _ in range(size):
+        start = time.perf_counter()
+        processes.append(popen(["true"], stdin=subprocess.DEVNULL, start_new_session=True))
+        latencies.append(time.perf_counter() - start)
+    for process in processes:
+        process.wait(10.0)
+    return latencies
+
+
+def bench_spawn(bursts: int = 20, size: int = 10, ballast_mb: int = 256) -> List[Dict]:
+    """Launch latency and peak child RSS of each launch path.
+
+    The helper is forked first, like the daemon's entry point does before
+    importing Quartz and PyQt6; then ``ballast_mb`` of touched memory stands
+    in for the heap Qt and pyobjc build up once running. The helper is
+    forked from this process, not the daemon's entry point, so its RSS and
+    modules are the benchmark's and only approximate the daemon's.
+    Peak child RSS is a high-water mark over the process lifetime, so the
+    paths are measured from the one expected to be smallest.
+    """
+    helper = start_spawn_helper()
+    ballast = bytearray(ballast_mb << 20)
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1
+    launchers = [("posix_spawn", posix_spawn_popen), ("subprocess", subprocess.Popen)]
+    if helper is not None:
+        launchers.insert(0, ("helper", helper.popen))
+    rows = []
+    try:
+        for name, popen in launchers:
+            latencies = []
+            for _ in range(bursts):
+                latencies.extend(_burst(popen, size))
+            if name == "helper":
+                stats = helper.stats()
+                child_rss = stats.get("children_maxrss", 0)
+                helper_rss = stats.get("helper_maxrss", 0)
+                helper_modules = len(stats.get("modules", ()))
+            else:
+                child_rss = maxrss_kib(resource.RUSAGE_CHILDREN)
+                helper_rss = 0
+                helper_modules = None
+            rows.append({
+                "launcher": name,
+                "spawns": len(latencies),
+                "latency_ms_p50": _percentile(latencies, 50) * 1000,
+                "latency_ms_p99": _percentile(latencies, 99) * 1000,
+                "child_peak_rss_mb": child_rss / 1024,
+                "helper_rss_mb": helper_rss / 1024,
+                "helper_modules": helper_modules,
+                "parent_rss_mb": maxrss_kib(resource.RUSAGE_SELF) / 1024,
+            })
+        # What NativeLauncher saves: the dispatch layer without a process
+        recorder = RecordingLauncher()
+        latencies = []
+        for i in range(bursts * size):
+            start = time.perf_counter()
+            recorder.launch("URL", ("open", "https://example.com/"), {})
+            latencies.append(time.perf_counter() - start)
+        rows.append({"launcher": "in-process", "spawns": 0,
+                     "latency_ms_p50": _percentile(latencies, 50) * 1000,
+                     "latency_ms_p99": _percentile(latencies, 99) * 1000,
+                     "child_peak_rss_mb": 0.0, "helper_rss_mb": 0.0,
+                     "parent_rss_mb": maxrss_kib(resource.RUSAGE_SELF) / 1024})
+    finally:
+        del ballast
+        if helper is not None:
+            helper.close()
+    return rows
+
+
+class _ParkedPointer(PointerSource):
+    """A cursor resting mid-screen, sampled on a virtual clock"""
+
+    def __init__(self, session: FakeSessionProvider):
+        self.session = session
+
+    def sample(self):
+        return self.session.now, CENTER[0], CENTER[1]
+
+
+class _TimedSession(FakeSessionProvider):
+    """Virtual-clock session that stops a pipeline once ``end`` is reached"""
+
+    def __init__(self, end: float, **state):
+        super().__init__(virtual=True, **state)
+        self.end = end
+        self.pipeline = None
+
+    def wait_for_activity(self, timeout: float) -> bool:
+        woke = super().wait_for_activity(timeout)
+        if self.now >= self.end:
+            self.pipeline.stop()
+        return woke
+
+
+SESSION_STATES = {
+    "active": {},
+    "idle": {"idle_seconds": 3600.0},
+    "locked": {"locked": True},
+    "asleep": {"display_asleep": True},
+}
+
+
+def bench_session(hours: float = 1.0) -> List[Dict]:
+    """Wakeups per hour of the polling pipeline in each session state"""
+    rows = []
+    schedulers = {"fixed": FixedScheduler, "adaptive": AdaptiveScheduler}
+    for state_name, state in SESSION_STATES.items():
+        for scheduler_name, scheduler in schedulers.items():
+            row = {"state": state_name, "scheduler": scheduler_name}
+            for column, aware in (("unaware_wakeups_per_hour", False),
+                                  ("aware_wakeups_per_hour", True)):
+                # The unaware run shares the virtual clock but always sees an
+                # active session, like a pipeline without a provider
+                session = _TimedSession(hours * 3600, **(state if aware else {}))
+                pipeline = session.pipeline = PollingPipeline(
+                    _detector(), lambda corner, timestamp: None, scheduler(), session=session)
+                pipeline.run(_ParkedPointer(session))
+                row[column] = pipeline.wakeups / hours
+            rows.append(row)
+    return rows
+
+
+def bench_config_watch(trials: int = 20, idle_seconds: float = 2.0,
+                       interval: float = 5.0) -> List[Dict]:
+    """Save-to-reload latency and idle wakeups of the config watcher's backends.
+
+    Saves alternate between rewriting the file in place and renaming a new
+    file over it, the way many editors save.
+    """
+    rows = []
+    folder = tempfile.mkdtemp(prefix="firecorners-bench-")
+    path = os.path.join(folder, "config.json")
+    with open(path, "w") as f:
+        f.write("{}")
+    try:
+        for backend in ("auto", "poll"):
+            reloaded = _Trigger()
+            watcher = ConfigWatcher(path, lambda: reloaded(None, None), interval=interval,
+                                    backend="poll" if backend == "poll" else "auto")
+            watcher.start()
+            # Long enough to see a polling watcher wake up at all
+            idle = idle_seconds if watcher.backend != "poll" else max(idle_seconds, interval * 2)
+            time.sleep(0.2)
+            before = watcher.wakeups
+            time.sleep(idle)
+            wakeups = watcher.wakeups - before
+            # Polling needs up to an interval per save; a few saves show it
+            count = trials if watcher.backend != "poll" else min(trials, 3)
+            latencies = []
+            for i in range(count):
+                reloaded.clear()
+                saved = time.time()
+                if i % 2:
+                    with open(path + ".tmp", "w") as f:
+                        f.write(json.dumps({"trial": i}))
+                    os.replace(path + ".tmp", path)
+                else:
+                    with open(path, "w") as f:
+                        f.write(json.dumps({"trial": i}))
+                if reloaded.wait(interval * 2 + 1):
+                    latencies.append(reloaded.at - saved)
+            watcher.stop()
+            rows.append({
+                "watcher": watcher.backend,
+                "saves": count,
+                "reloads": len(latencies),
+                "latency_ms_p50": statistics.median(latencies) * 1000 if latencies else None,
+                "latency_ms_max": max(latencies) * 1000 if latencies else None,
+                "wakeups_per_idle_minute": wakeups * 60.0 / idle,
+            })
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return rows
+
+
+def _zone_config(count: int, rng: random.Random) -> Dict:
+    config = {corner: [{"type": "url", "value": f"https://example.com/{corner}"}]
+              for corner in ("top_left", "top_right", "bottom_left", "bottom_right")}
+    config["zones"] = [
+        {"name": f"zone{i}", "rect": [rng.randrange(1800), rng.randrange(1000), 40, 40],
+         "actions": [{"type": "shell", "value": f"echo zone {i}"},
+                     {"type": "url", "value": f"https://example.com/{i}"}]}
+        for i in range(count)]
+    return config
+
+
+def bench_reload(counts=(10, 100, 1000), trials: int = 5, seed: int = 0) -> List[Dict]:
+    """Snapshot build time for a whole config against one with a single edited zone"""
+    rng = random.Random(seed)
+    rows = []
+    for count in counts:
+        config = _zone_config(count, rng)
+        full = []
+        for _ in range(trials):
+            start = time.perf_counter()
+            snapshot, _ = build_snapshot(config)
+            full.append(time.perf_counter() - start)
+        incremental = []
+        for i in range(trials):
+            edited = json.loads(json.dumps(config))
+            edited["zones"][0]["actions"][0]["value"] = f"echo edit {i}"
+            start = time.perf_counter()
+            edited_snapshot, diff = build_snapshot(edited, snapshot)
+            incremental.append(time.perf_counter() - start)
+        rows.append({
+            "zones": count,
+            "full_ms": statistics.median(full) * 1000,
+            "incremental_ms": statistics.median(incremental) * 1000,
+            "compiled": diff.compiled,
+        })
+    return rows
+
+
+def bench_artifact(counts=(10, 100, 1000), trials: int = 5, seed: int = 0) -> List[Dict]:
+    """Cold load of a config file by parsing and compiling it against from its artifact"""
+    rng = random.Random(seed)
+    rows = []
+    folder = tempfile.mkdtemp(prefix="firecorners-bench-")
+    try:
+        for count in counts:
+            source = os.path.join(folder, f"config{count}.json")
+            with open(source, "w") as f:
+                json.dump(_zone_config(count, rng), f, indent=2)
+            parsed = []
+            for _ in range(trials):
+                start = time.perf_counter()
+                load_snapshot(source, write=False)
+                parsed.append(time.perf_counter() - start)
+            load_snapshot(source)  # writes the artifact, as the daemon does
+            loaded = []
+            for _ in range(trials):
+                start = time.perf_counter()
+                _, _, fresh = load_snapshot(source)
+                loaded.append(time.perf_counter() - start)
+            rows.append({
+                "zones": count,
+                "json_kb": os.path.getsize(source) / 1024,
+                "parse_ms": statistics.median(parsed) * 1000,
+                "artifact_ms": statistics.median(loaded) * 1000 if fresh else None,
+                "artifact_kb": os.path.getsize(artifact_path(source)) / 1024,
+            })
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return rows
+
+
+def bench_profiles(counts=(10, 100, 1000), profiles: int = 3, trials: int = 5,
+                   seed: int = 0) -> List[Dict]:
+    """Switching to a precompiled profile against reloading the config rewritten for it"""
+    rng = random.Random(seed)
+    rows = []
+    for count in counts:
+        config = _zone_config(count, rng)
+        config["profiles"] = {
+            f"profile{i}": {"top_left": [{"type": "shell", "value": f"echo profile {i}"}],
+                            "settings": {"dwell": 0.1 * i}}
+            for i in range(profiles)}
+        plain = {key: value for key, value in config.items() if key != "profiles"}
+        base, _ = build_snapshot(plain)
+        builds = []
+        for _ in range(trials):
+            start = time.perf_counter()
+            snapshot, _ = build_snapshot(config)
+            builds.append(time.perf_counter() - start)
+        # What the daemon does: compare the snapshots and assign a reference
+        names = list(snapshot.profiles)
+        switches = []
+        current = snapshot
+        for i in range(trials * 100):
+            start = time.perf_counter()
+            target = snapshot.profiles[names[i % len(names)]]
+            switch_diff(current, target)
+            current = target
+            switches.append(time.perf_counter() - start)
+        rewrites = []
+        for i in range(trials):
+            rewritten = profile_config(config, config["profiles"][names[i % len(names)]])
+            start = time.perf_counter()
+            build_snapshot(json.loads(json.dumps(rewritten)), base)
+            rewrites.append(time.perf_counter() - start)
+        rows.append({
+            "zones": count,
+            "profiles": len(names),
+            "build_ms": statistics.median(builds) * 1000,
+            "switch_us": statistics.median(switches) * 1e6,
+            "rewrite_ms": statistics.median(rewrites) * 1000,
+        })
+    return rows
+
+
+def _print_table(title, rows, columns):
+    print(f"\n{title}")
+    print("  ".join(f"{label:>{width}}" for label, _, width, _ in columns))
+    for row in rows:
+        cells = []
+        for _, key, width, fmt in columns:
+            value = row.get(key)
+            cells.append(f"{'-' if value is None else format(value, fmt):>{width}}")
+        print("  ".join(cells))
+
+
+HOTPATH_COLUMNS = [
+    ("workload", "workload", 14, ""),
+    ("classify/s", "classify_samples_per_sec", 12, ",.0f"),
+    ("machine/s", "machine_samples_per_sec", 12, ",.0f"),
+    ("machine B", "machine_alloc_bytes_per_sample", 9, ".1f"),
+    ("detect/s", "detect_samples_per_sec", 12, ",.0f"),
+    ("dispatch/s", "dispatch_samples_per_sec", 12, ",.0f"),
+    ("triggers", "triggers", 8, "d"),
+    ("entry p50 ms", "entry_to_dispatch_ms_p50", 12, ".1f"),
+    ("entry p99 ms", "entry_to_dispatch_ms_p99", 12, ".1f"),
+    ("launch p50 ms", "trigger_to_launch_ms_p50", 13, ".3f"),
+    ("launch p99 ms", "trigger_to_launch_ms_p99", 13, ".3f"),
+    ("ovh p99 us", "dispatch_overhead_us_p99", 10, ".1f"),
+    ("B/sample", "alloc_bytes_per_sample", 9, ".1f"),
+]
+
+ZONE_COLUMNS = [
+    ("zones", "zones", 6, "d"),
+    ("regions", "regions", 8, "d"),
+    ("build ms", "build_ms", 9, ".2f"),
+    ("ns/lookup", "ns_per_lookup", 10, ".1f"),
+    ("hit rate", "hit_rate", 9, ".3f"),
+]
+
+BATCH_COLUMNS = [
+    ("workload", "workload", 14, ""),
+    ("loop/s", "loop_samples_per_sec", 12, ",.0f"),
+    ("batch/s", "batch_samples_per_sec", 14, ",.0f"),
+    ("speedup", "speedup", 8, ".1f"),
+    ("match", "triggers_match", 6, ""),
+]
+
+SCHEDULER_COLUMNS = [
+    ("workload", "workload", 14, ""),
+    ("scheduler", "scheduler", 9, ""),
+    ("visits", "visits", 7, "d"),
+    ("missed", "missed", 7, "d"),
+    ("late", "late", 5, "d"),
+    ("p50 ms", "latency_ms_p50", 8, ".1f"),
+    ("p99 ms", "latency_ms_p99", 8, ".1f"),
+    ("wakeups/min", "wakeups_per_minute", 12, ".1f"),
+]
+
+PIPELINE_COLUMNS = [
+    ("pipeline", "pipeline", 10, ""),
+    ("p50 ms", "latency_ms_p50", 8, ".2f"),
+    ("p99 ms", "latency_ms_p99", 8, ".2f"),
+    ("max ms", "latency_ms_max", 8, ".2f"),
+    ("wakeups/idle min", "wakeups_per_idle_minute", 18, ".1f"),
+]
+
+
+INTERPRETER_COLUMNS = [
+    ("interpreter", "interpreter", 11, ""),
+    ("mode", "mode", 9, ""),
+    ("p50 ms", "latency_ms_p50", 8, ".2f"),
+    ("p99 ms", "latency_ms_p99", 8, ".2f"),
+]
+
+SPAWN_COLUMNS = [
+    ("launcher", "launcher", 11, ""),
+    ("spawns", "spawns", 7, "d"),
+    ("p50 ms", "latency_ms_p50", 8, ".2f"),
+    ("p99 ms", "latency_ms_p99", 8, ".2f"),
+    ("child RSS MB", "child_peak_rss_mb", 13, ".1f"),
+    ("helper MB", "helper_rss_mb", 10, ".1f"),
+    ("modules", "helper_modules", 8, "d"),
+    ("parent MB", "parent_rss_mb", 10, ".1f"),
+]
+
+CONFIG_COLUMNS = [
+    ("watcher", "watcher", 8, ""),
+    ("saves", "saves", 6, "d"),
+    ("reloads", "reloads", 8, "d"),
+    ("p50 ms", "latency_ms_p50", 8, ".1f"),
+    ("max ms", "latency_ms_max", 8, ".1f"),
+    ("wakeups/idle min", "wakeups_per_idle_minute", 18, ".1f"),
+]
+
+RELOAD_COLUMNS = [
+    ("zones", "zones", 6, "d"),
+    ("full ms", "full_ms", 9, ".2f"),
+    ("1-edit ms", "incremental_ms", 10, ".2f"),
+    ("compiled", "compiled", 9, "d"),
+]
+
+ARTIFACT_COLUMNS = [
+    ("zones", "zones", 6, "d"),
+    ("JSON KB", "json_kb", 8, ".0f"),
+    ("parse ms", "parse_ms", 9, ".2f"),
+    ("artifact ms", "artifact_ms", 12, ".2f"),
+    ("artifact KB", "artifact_kb", 12, ".0f"),
+]
+
+PROFILE_COLUMNS = [
+    ("zones", "zones", 6, "d"),
+    ("profiles", "profiles", 9, "d"),
+    ("build ms", "build_ms", 9, ".2f"),
+    ("switch us", "switch_us", 10, ".1f"),
+    ("rewrite ms", "rewrite_ms", 11, ".2f"),
+]
+
+SESSION_COLUMNS = [
+    ("state", "state", 8, ""),
+    ("scheduler", "scheduler", 9, ""),
+    ("unaware/h", "unaware_wakeups_per_hour", 11, ",.0f"),
+    ("aware/h", "aware_wakeups_per_hour", 9, ",.0f"),
+]
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="FireCorners detection and dispatch benchmarks")
+    parser.add_argument("--suite", choices=["all", "hotpath", "zones", "batch", "scheduler", "pipelines",
+                                            "interpreters", "spawn", "config",
+                                            "session"], default="all",
+                        help="Which benchmarks to run")
+    parser.add_argument("--samples", type=int, default=200000, help="Samples per synthetic workload")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic workloads")
+    parser.add_argument("--trace", type=str, metavar="PATH",
+                        help="Also replay a trace recorded with --record-trace")
+    parser.add_argument("--trials", type=int, default=20, help="Corner entries per pipeline")
+    parser.add_argument("--idle-seconds", type=float, default=2.0,
+                        help="Idle period used to count wakeups")
+    parser.add_argument("--ballast-mb", type=int, default=256,
+                        help="Memory the spawn suite allocates to stand in for Qt and pyobjc")
+    parser.add_argument("--json", type=str, metavar="PATH", help="Write results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the selected benchmark suites"""
+    args = parse_args(argv)
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+    }
+
+    if args.suite in ("all", "hotpath"):
+        rows = []
+        for name, generate in WORKLOADS.items():
+            rows.append(bench_hotpath(name, generate(args.samples, args.seed)))
+        if args.trace:
+            from .tracefile import open_trace
+            with open_trace(args.trace) as trace:
+                rows.append(bench_hotpath("trace", list(trace.samples())))
+        results["hotpath"] = rows
+        _print_table("Detection and dispatch hot path", rows, HOTPATH_COLUMNS)
+
+    if args.suite in ("all", "zones"):
+        rows = bench_zones(args.samples, args.seed)
+        results["zones"] = rows
+        _print_table("Zone lookup on three displays", rows, ZONE_COLUMNS)
+
+    if args.suite in ("all", "batch"):
+        rows = [bench_batch(name, generate(args.samples, args.seed))
+                for name, generate in WORKLOADS.items()]
+        if None in rows:
+            print("\nSkipping batch benchmarks: NumPy is not installed")
+        else:
+            results["batch"] = rows
+            _print_table("Vectorized batch detection", rows, BATCH_COLUMNS)
+
+    if args.suite in ("all", "scheduler"):
+        rows = []
+        for name, generate in WORKLOADS.items():
+            rows.extend(bench_scheduler(name, generate(args.samples, args.seed)))
+        if args.trace:
+            from .tracefile import open_trace
+            with open_trace(args.trace) as trace:
+                rows.extend(bench_scheduler("trace", list(trace.samples())))
+        results["scheduler"] = rows
+        _print_table("Polling schedulers against every-sample detection", rows, SCHEDULER_COLUMNS)
+
+    if args.suite in ("all", "pipelines"):
+        rows = [
+            bench_polling(args.trials, args.idle_seconds),
+            bench_event(args.trials, args.idle_seconds),
+        ]
+        results["pipelines"] = rows
+        _print_table("Trigger latency and idle wakeups", rows, PIPELINE_COLUMNS)
+
+    if args.suite in ("all", "interpreters"):
+        rows = bench_interpreters(max(args.trials, 50))
+        results["interpreters"] = rows
+        _print_table("Script action latency per trigger", rows, INTERPRETER_COLUMNS)
+
+    if args.suite in ("all", "spawn"):
+        rows = bench_spawn(ballast_mb=args.ballast_mb)
+        results["spawn"] = rows
+        _print_table("Action launch latency and memory", rows, SPAWN_COLUMNS)
+        print("  The helper is forked from this benchmark process, not from the daemon's\n"
+              "  entry point; its RSS, modules and latency only approximate the daemon's.")
+
+    if args.suite in ("all", "config"):
+        rows = bench_config_watch(args.trials, args.idle_seconds)
+        results["config"] = rows
+        _print_table("Config reload latency and idle wakeups", rows, CONFIG_COLUMNS)
+        rows = bench_reload()
+        results["reload"] = rows
+        _print_table("Config snapshot build", rows, RELOAD_COLUMNS)
+        rows = bench_artifact()
+        results["artifact"] = rows
+        _print_table("Config load from JSON and from a compiled artifact", rows,
+                     ARTIFACT_COLUMNS)
+        rows = bench_profiles()
+        results["profiles"] = rows
+        _print_table("Profile switch against rewriting the config", rows, PROFILE_COLUMNS)
+
+    if args.suite in ("all", "session"):
+        rows = bench_session()
+        results["session"] = rows
+        _print_table("Polling wakeups per hour by session state", rows, SESSION_COLUMNS)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+FireCorners Application Catalog
+
+Resolves the value of an "Application" action, a name such as "Safari" or
+a bundle path, to the bundle's path, so that launching does not leave
+LaunchServices to search for it on every trigger and a missing application
+shows up when the config is loaded rather than when its corner fires.
+
+The catalog indexes the .app bundles in a list of roots, one level of
+subfolders deep (/Applications/Utilities), by file name, bundle name,
+display name and bundle identifier. Names are matched case-insensitively;
+earlier roots win.
+
+Refreshing is incremental: the catalog remembers the mtime of every folder
+it scanned and only rescans folders whose mtime changed, which is what
+installing, removing or renaming an application does. A refresh that
+finds nothing new costs one stat() per folder.
+
+The daemon refreshes the catalog when a FolderWatcher (see watcher.py)
+reports a change to one of its folders(). A lookup that misses refreshes
+it too, at most every ``min_interval`` seconds, for a root that did not
+exist when the watch was set up.
+"""
+
+import hashlib
+import logging
+import os
+import plistlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOTS = (
+    "/Applications",
+    "~/Applications",
+    "/System/Applications",
+)
+
+PLIST_KEYS = ("CFBundleName", "CFBundleDisplayName", "CFBundleIdentifier")
+
+
+class _Bundle:
+    __slots__ = ("path", "names")
+
+    def __init__(self, path: str, names: Tuple[str, ...]):
+        self.path = path
+        self.names = names
+
+
+def _bundle_names(path: str) -> Tuple[str, ...]:
+    """Names an application is known by, from its Info.plist"""
+    try:
+        with open(os.path.join(path, "Contents", "Info.plist"), "rb") as f:
+            info = plistlib.load(f)
+    except (OSError, ValueError, plistlib.InvalidFileException):
+        return ()
+    return tuple(info[key] for key in PLIST_KEYS if isinstance(info.get(key), str))
+
+
+def _key(name: str) -> str:
+    name = name.strip().lower()
+    return name[:-4] if name.endswith(".app") else name
+
+
+class ApplicationCatalog:
+    """Index of the applications under a set of folders"""
+
+    def __init__(self, roots: Sequence[str] = DEFAULT_ROOTS, depth: int = 1,
+                 min_interval: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.roots = [os.path.expanduser(root) for root in roots]
+        self.depth = depth
+        self.min_interval = min_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._folders: Dict[str, Tuple[int, List[_Bundle], List[str]]] = {}
+        self._index: Dict[str, str] = {}
+        self._fingerprint = hashlib.sha256(repr([]).encode()).digest()
+        self._refreshed = None
+        self.rescans = 0
+        self.hits = 0
+        self.misses = 0
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Rescan the folders that changed since the last refresh; True if any did"""
+        with self._lock:
+            self._refreshed = self.clock()
+            changed = False
+            seen = set()
+            for root in self.roots:
+                changed |= self._visit(root, 0, seen)
+            for folder in list(self._folders):
+                if folder not in seen:
+                    del self._folders[folder]
+                    changed = True
+            if changed:
+                self._index = self._build_index()
+                self._fingerprint = hashlib.sha256(
+                    repr(sorted(self._index.items())).encode()).digest()
+            return changed
+
+    def _visit(self, folder: str, depth: int, seen: set) -> bool:
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            return False  # dropped from the index by refresh()
+        seen.add(folder)
+        cached = self._folders.get(folder)
+        changed = False
+        if cached is None or cached[0] != mtime:
+            self._folders[folder] = (mtime,) + self._scan(folder, depth)
+            self.rescans += 1
+            changed = True
+        for subfolder in self._folders[folder][2]:
+            changed |= self._visit(subfolder, depth + 1, seen)
+        return changed
+
+    def _scan(self, folder: str, depth: int) -> Tuple[List[_Bundle], List[str]]:
+        bundles = []
+        subfolders = []
+        try:
+            entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+        except OSError as e:
+            logger.debug("Cannot scan %s: %s", folder, e)
+            return bundles, subfolders
+        for entry in entries:
+            try:
+                if not entry.is_dir():
+                    continue
+            except OSError:
+                continue
+            if entry.name.endswith(".app"):
+                bundles.append(_Bundle(entry.path, _bundle_names(entry.path)))
+            elif depth < self.depth and not entry.name.startswith("."):
+                subfolders.append(entry.path)
+        return bundles, subfolders
+
+    def _build_index(self) -> Dict[str, str]:
+        bundles = []
+        for root in self.roots:
+            self._collect(root, bundles)
+        index = {}
+        # File names first, so that "Notes" is the bundle called Notes.app
+        # even if another bundle's Info.plist also calls itself Notes
+        for bundle in bundles:
+            index.setdefault(_key(os.path.basename(bundle.path)), bundle.path)
+        for bundle in bundles:
+            for name in bundle.names:
+                index.setdefault(_key(name), bundle.path)
+        return index
+
+    def _collect(self, folder: str, bundles: List[_Bundle]):
+        cached = self._folders.get(folder)
+        if cached is None:
+            return
+        bundles.extend(cached[1])
+        for subfolder in cached[2]:
+            self._collect(subfolder, bundles)
+
+    def resolve(self, value: str) -> Optional[str]:
+        """Path of the application a name or bundle path refers to, or None.
+
+        A miss, or a hit on a bundle that is gone, triggers a refresh, at
+        most once every ``min_interval`` seconds, in case the application
+        was installed or moved since.
+        """
+        if os.path.isabs(value) or value.startswith("~"):
+            path = os.path.expanduser(value)
+            if os.path.isdir(path):
+                self.hits += 1
+                return path
+            value = os.path.basename(path.rstrip("/"))  # moved? look it up by name
+        key = _key(value)
+        path = self._index.get(key)
+        if path is not None and not os.path.isdir(path):
+            path = None  # moved or deleted since the last refresh
+        if path is None and self.clock() - self._refreshed >= self.min_interval:
+            if self.refresh():
+                path = self._index.get(key)
+        if path is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return path
+
+    def application_args(self, value: str) -> Tuple[str, ...]:
+        """argv that opens an application, by path when the catalog knows it"""
+        return ("open", "-a", self.resolve(value) or value)
+
+    def launch_args(self, args: Sequence[str], value: str) -> Sequence[str]:
+        """Check argv compiled by application_args before launching it.
+
+        Keeps the compiled path while the bundle is still there, and
+        resolves the name again if it has moved or was not found before.
+        """
+        path = args[-1]
+        if os.path.isabs(path) and os.path.isdir(path):
+            return args
+        return self.application_args(value)
+
+    def fingerprint(self) -> bytes:
+        """SHA-256 of the index, which changes whenever a name would resolve differently"""
+        return self._fingerprint
+
+    def folders(self) -> List[str]:
+        """The folders the last refresh scanned: the roots that exist and their subfolders"""
+        with self._lock:
+            return list(self._folders)
+
+    def applications(self) -> Dict[str, str]:
+        """Every indexed name, lowercased, and the bundle path it resolves to"""
+        return dict(self._index)
+
+    def counters(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "rescans": self.rescans}
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+FireCorners Config Compiler
+
+Validates config.json and compiles it into an artifact next to it,
+config.fcc, holding the normalized config and everything the daemon
+derives from it: parsed zones, compiled launch plans, roots and limits
+(see snapshot.py), for the config and for each of its profiles. Starting
+or reloading from a fresh artifact skips JSON parsing, zone parsing and
+action compilation, which is most of the cost of a large generated config.
+
+The artifact is keyed by the SHA-256 of the config file's bytes. Hashing
+the file is far cheaper than parsing it, and it catches every edit,
+whatever the file's mtime says. Compiled plans also depend on what the
+application catalog and the plugin registry knew when they were built,
+so the artifact stores a second key, the SHA-256 of both (see
+resolution_key). A "script" action with a relative path runs the file if
+it exists in the config's folder and is AppleScript otherwise, so the
+artifact also lists every such path and whether it existed; it is stale
+once one of them appears or disappears. The daemon loads an artifact only
+when all of that matches and it was written by the same FireCorners and
+Python version. Otherwise the daemon parses the config as before and
+writes a new artifact.
+
+The daemon writes the artifact of a config it had to parse. The
+configuration window compiles the config on a worker thread every time it
+saves it (see BackgroundCompiler), and firecorners-compile writes it too.
+All of them compute the resolution key the way the daemon does, from an
+ApplicationCatalog of the config's application roots and the installed
+plugins, so the daemon loads whichever artifact was written last. The
+profile command only reads the config from it, for which the first key is
+enough.
+
+File layout:
+
+  header, 76 bytes:
+    magic           8s   b"FCCONF\\0\\0"
+    version         u32  artifact format
+    source hash     32s  SHA-256 of the config file
+    resolution hash 32s  SHA-256 of the catalog's index and the plugin names
+  body: marshal dump of (tag, config, zones, plans, sources, roots, limits,
+        scripts, {profile: (config, zones, plans, sources, roots, limits,
+        scripts)}, corner scripts), where scripts map a corner or zone to
+        the (path, existed) pairs of its relative script paths and corner
+        scripts are those checked while normalizing the config's corners
+
+marshal only handles built-in types and cannot run code while loading.
+NamedTuples are stored as plain tuples and rebuilt on load.
+
+To compile a config by hand, or to check one pushed from elsewhere, run:
+
+  firecorners-compile [--check] [PATH]
+"""
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+import struct
+import sys
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import __version__
+from .actions import LaunchPlan, normalize_actions, scripts_unchanged
+from .geometry import CORNERS
+from .profiles import parse_schedule
+from .snapshot import (ConfigSnapshot, DetectionSettings, SnapshotDiff, application_roots,
+                       build_snapshot, detection_settings, diff_snapshots, renumber,
+                       shared_detection)
+from .store import atomic_write
+from .zones import ZoneSpec
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FCCONF\0\0"
+VERSION = 5
+HEADER = struct.Struct("<8sI32s32s")
+SUFFIX = ".fcc"
+
+# marshal's format and the layout of the stored tuples
+TAG = (f"{__version__}/{sys.implementation.cache_tag}"
+       f"/{len(LaunchPlan._fields)}/{len(ZoneSpec._fields)}")
+
+
+def artifact_path(source: str) -> str:
+    """Where the artifact of a config file goes"""
+    return os.path.splitext(os.fspath(source))[0] + SUFFIX
+
+
+def config_folder(source: str) -> str:
+    """Where relative script paths of a config file are looked up"""
+    return os.path.dirname(os.path.abspath(source))
+
+
+def parse_config(data: bytes, base: Optional[str] = None,
+                 checked: Optional[Dict[str, bool]] = None) -> Dict:
+    """Parse and normalize a config file's contents; raises ValueError if invalid.
+
+    ``base`` and ``checked`` are as for actions.normalize_action.
+    """
+    config = json.loads(data) if data.strip() else {}
+    if not isinstance(config, dict):
+        raise ValueError("config must be a JSON object")
+    for corner in CORNERS:
+        if corner in config:
+            config[corner] = normalize_actions(config[corner], corner, base, checked)
+    return config
+
+
+def _read(source: str) -> bytes:
+    try:
+        with open(source, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return b""
+
+
+def _pack(snapshot: ConfigSnapshot) -> tuple:
+    return (
+        snapshot.config,
+        tuple(tuple(zone) for zone in snapshot.detection.zones),
+        {name: tuple(tuple(plan) for plan in plans) for name, plans in snapshot.plans.items()},
+        dict(snapshot.sources),
+        snapshot.roots,
+        snapshot.limits,
+        dict(snapshot.scripts),
+    )
+
+
+def _unpack(packed, defaults: DetectionSettings, generation: int) -> ConfigSnapshot:
+    config, zones, plans, sources, roots, limits, scripts = packed
+    zones = tuple(map(ZoneSpec._make, zones))
+    make = LaunchPlan._make
+    plans = {name: tuple(map(make, name_plans)) for name, name_plans in plans.items()}
+    # Settings the config leaves out come from the command line, so they
+    # are filled in here rather than stored
+    return ConfigSnapshot(config, detection_settings(config, defaults, zones),
+                          MappingProxyType(plans), MappingProxyType(sources), tuple(roots),
+                          tuple(limits), generation, scripts=MappingProxyType(scripts))
+
+
+def resolution_key(catalog=None, plugins=None) -> bytes:
+    """SHA-256 of what compiled plans depend on besides the config.
+
+    That is the index of the ApplicationCatalog that resolved Application
+    actions and the names in the PluginRegistry that Python actions were
+    checked against; either may be None.
+    """
+    digest = hashlib.sha256()
+    digest.update(catalog.fingerprint() if catalog is not None else b"")
+    digest.update(plugins.fingerprint() if plugins is not None else b"")
+    return digest.digest()
+
+
+def dump_snapshot(snapshot: ConfigSnapshot, digest: bytes,
+                  resolution: Optional[bytes] = None,
+                  checked: Optional[Dict[str, bool]] = None) -> bytes:
+    """The artifact of a snapshot built from a file whose SHA-256 is ``digest``.
+
+    ``resolution`` is the resolution_key of what it was compiled against
+    and ``checked`` the script paths parse_config looked up.
+    """
+    profiles = {name: _pack(profile) for name, profile in snapshot.profiles.items()}
+    body = (TAG,) + _pack(snapshot) + (profiles, tuple(sorted((checked or {}).items())))
+    header = HEADER.pack(MAGIC, VERSION, digest, resolution or resolution_key())
+    return header + marshal.dumps(body)
+
+
+def load_artifact(data: bytes, digest: bytes, defaults: DetectionSettings,
+                  generation: int = 0,
+                  resolution: Optional[Callable[[Tuple[str, ...]], bytes]] = None
+                  ) -> Optional[ConfigSnapshot]:
+    """The snapshot stored in an artifact, or None if it is stale or unreadable.
+
+    ``resolution`` returns the resolution_key for the stored application
+    roots; without it, the plans are not checked, only the config.
+    """
+    if len(data) < HEADER.size:
+        return None
+    magic, version, stored, stored_resolution = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or stored != digest:
+        return None
+    try:
+        tag, *packed, stored_profiles, checked = marshal.loads(data[HEADER.size:])
+        if tag != TAG:
+            return None
+        snapshot = _unpack(packed, defaults, generation)
+        profiles = {}
+        for name, packed_profile in stored_profiles.items():
+            profile = _unpack(packed_profile, defaults, generation)
+            # Shared as when they were built, so switching compares references
+            profiles[name] = profile._replace(
+                detection=shared_detection(profile.detection, snapshot.detection))
+    except (EOFError, ValueError, TypeError) as e:
+        logger.debug("Ignoring unreadable config artifact: %s", e)
+        return None
+    checks = [checked]
+    for stored_snapshot in (snapshot, *profiles.values()):
+        checks.extend(stored_snapshot.scripts.values())
+    if not all(scripts_unchanged(pairs) for pairs in checks):
+        logger.debug("Ignoring config artifact: a script it names was added or removed")
+        return None
+    if resolution is not None and resolution(snapshot.roots) != stored_resolution:
+        logger.debug("Ignoring config artifact: applications or plugins changed since")
+        return None
+    return snapshot._replace(profiles=MappingProxyType(profiles))
+
+
+def write_artifact(path: str, snapshot: ConfigSnapshot, digest: bytes,
+                   resolution: Optional[bytes] = None,
+                   checked: Optional[Dict[str, bool]] = None):
+    """Write an artifact, replacing any previous one atomically"""
+    atomic_write(path, dump_snapshot(snapshot, digest, resolution, checked))
+
+
+def read_snapshot(source: str, data: bytes, defaults: DetectionSettings = DetectionSettings(),
+                  generation: int = 0,
+                  resolution: Optional[Callable[[Tuple[str, ...]], bytes]] = None
+                  ) -> Optional[ConfigSnapshot]:
+    """The snapshot in the artifact of ``source`` if it was compiled from ``data``"""
+    try:
+        with open(artifact_path(source), "rb") as f:
+            artifact = f.read()
+    except OSError:
+        return None
+    return load_artifact(artifact, hashlib.sha256(data).digest(), defaults, generation,
+                         resolution)
+
+
+def load_snapshot(source: str, previous: Optional[ConfigSnapshot] = None,
+                  defaults: DetectionSettings = DetectionSettings(),
+                  catalog_for: Optional[Callable] = None, plugins=None,
+                  write: bool = True) -> Tuple[ConfigSnapshot, SnapshotDiff, bool]:
+    """Snapshot of a config file, from its artifact when that is fresh.
+
+    Returns (snapshot, diff against ``previous``, whether the artifact was
+    used). Otherwise parses the file and compiles it, incrementally against
+    ``previous``, with the catalog ``catalog_for`` returns for the config's
+    application roots, and writes a new artifact unless ``write`` is False.
+    Raises ValueError if the file is not a valid config.
+    """
+    def resolution(roots):
+        return resolution_key(catalog_for(roots) if catalog_for is not None else None, plugins)
+
+    data = _read(source)
+    generation = previous.generation + 1 if previous is not None else 0
+    snapshot = read_snapshot(source, data, defaults, generation, resolution)
+    if snapshot is not None:
+        return snapshot, diff_snapshots(previous, snapshot), True
+
+    folder = config_folder(source)
+    checked = {}
+    config = parse_config(data, folder, checked)
+    roots = application_roots(config)
+    catalog = catalog_for(roots) if catalog_for is not None else None
+    # Plans compiled against other roots may resolve applications differently
+    base = previous if previous is not None and previous.roots == roots else None
+    snapshot, diff = build_snapshot(config, base, defaults, catalog, plugins, folder)
+    snapshot = renumber(snapshot, generation)
+    if write and data:
+        try:
+            write_artifact(artifact_path(source), snapshot, hashlib.sha256(data).digest(),
+                           resolution_key(catalog, plugins), checked)
+        except OSError as e:
+            logger.warning("Cannot write %s: %s", artifact_path(source), e)
+    return snapshot, diff_snapshots(previous, snapshot, diff.compiled), False
+
+
+def read_config(source: str) -> Dict:
+    """The normalized config of a file, from its artifact when that is fresh.
+
+    Raises ValueError if the file is not a valid config.
+    """
+    data = _read(source)
+    snapshot = read_snapshot(source, data)
+    if snapshot is not None:
+        return snapshot.config
+    return parse_config(data, config_folder(source))
+
+
+def compile_file(source: str, catalog=None, plugins=None, write: bool = True) -> ConfigSnapshot:
+    """Compile a config file and write its artifact; raises ValueError or OSError.
+
+    Without a ``catalog``, one is built for the config's application roots
+    so Application actions compile to bundle paths, as in the daemon; with
+    the daemon's ``plugins`` too, the daemon loads the artifact as fresh.
+    """
+    data = _read(source)
+    if not data:
+        raise ValueError("not found or empty")
+    folder = config_folder(source)
+    checked = {}
+    config = parse_config(data, folder, checked)
+    if catalog is None:
+        from .catalog import ApplicationCatalog
+        catalog = ApplicationCatalog(application_roots(config))
+    snapshot, _ = build_snapshot(config, catalog=catalog, plugins=plugins, base=folder)
+    if write:
+        write_artifact(artifact_path(source), snapshot, hashlib.sha256(data).digest(),
+                       resolution_key(catalog, plugins), checked)
+    return snapshot
+
+
+class BackgroundCompiler:
+    """Compiles a config file on a worker thread, one compile at a time.
+
+    Compiling scans the application folders, so callers on a GUI thread
+    hand it over with request(). Requests made while a compile runs lead to
+    one more compile after it, so the last saved config is compiled last.
+    """
+
+    def __init__(self, source: str, plugins=None):
+        self.source = source
+        self.plugins = plugins
+        self._lock = threading.Lock()
+        self._pending = False
+        self._thread: Optional[threading.Thread] = None
+
+    def request(self):
+        """Compile the file soon; returns at once"""
+        with self._lock:
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="firecorners-compile",
+                                                daemon=True)
+                self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no compile is running or requested; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                thread = self._thread
+            if thread is None:
+                return True
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                return False
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                self._pending = False
+            if self.plugins is None:
+                from .plugins import PluginRegistry
+                self.plugins = PluginRegistry()
+            try:
+                compile_file(self.source, plugins=self.plugins)
+            except (OSError, ValueError) as e:
+                logger.warning("Could not compile %s: %s", self.source, e)
+
+
+class _Problems(logging.Handler):
+    """Collects the warnings logged while compiling"""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages: List[str] = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Validate a FireCorners config and compile it for fast loading")
+    parser.add_argument("config", nargs="?",
+                        default=os.path.expanduser("~/.firecorners/config.json"),
+                        help="Config file (default: ~/.firecorners/config.json)")
+    parser.add_argument("--check", action="store_true",
+                        help="Only validate the config, without writing the artifact")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Compile a config; exit status 1 if it is invalid or has invalid entries"""
+    args = parse_args(argv)
+    from .plugins import PluginRegistry
+
+    problems = _Problems()
+    package_logger = logging.getLogger("firecorners")
+    package_logger.addHandler(problems)
+    start = time.perf_counter()
+    try:
+        snapshot = compile_file(args.config, plugins=PluginRegistry(), write=not args.check)
+        parse_schedule(snapshot.config, snapshot.profiles)  # to report invalid entries
+    except (ValueError, OSError) as e:
+        print(f"{args.config}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        package_logger.removeHandler(problems)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for message in problems.messages:
+        print(f"{args.config}: {message}", file=sys.stderr)
+    plans = sum(len(plans) for plans in snapshot.plans.values())
+    print(f"{args.config}: {len(snapshot.plans)} corners and zones, {plans} launches, "
+          f"{len(snapshot.profiles)} profiles, {len(problems.messages)} problems "
+          f"({elapsed:.1f} ms)")
+    if not args.check:
+        print(f"Wrote {artifact_path(args.config)}")
+    return 1 if problems.messages else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
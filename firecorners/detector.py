@@ -0,0 +1,151 @@
+"""
+FireCorners Corner Detection
+
+Classifies pointer samples into display corners and zones and feeds them to
+the state machine that decides when their actions fire. This module
+has no Quartz or Qt dependency so it can be driven by any pointer source.
+"""
+
+import time
+from typing import Callable, Optional, Sequence, Tuple
+
+from .geometry import Display
+from .pointer import PointerSource
+from .state import ZoneStateMachine
+from .zones import ZoneSpec, ZoneTable
+
+
+class CornerDetector:
+    """Turns pointer samples into corner trigger decisions.
+
+    The zone table classifies each sample and a ZoneStateMachine applies
+    the dwell, cooldown and hysteresis rules.
+
+    Other threads change the settings through ``configure``, which hands
+    them over as one object that ``update`` applies between two samples.
+    """
+
+    def __init__(self, displays: Sequence[Display], threshold: int = 5,
+                 cooldown: float = 1.0, dwell: float = 0.0, zones: Sequence[ZoneSpec] = (),
+                 hysteresis: float = 0.0):
+        self.table = ZoneTable(displays, threshold, zones)
+        self.state = ZoneStateMachine(cooldown, dwell, hysteresis)
+        self._pending = None  # (settings, table) waiting for the detection thread
+
+    @property
+    def threshold(self) -> int:
+        return self.table.threshold
+
+    @threshold.setter
+    def threshold(self, threshold: int):
+        if threshold != self.table.threshold:
+            self.table = ZoneTable(self.table.displays, threshold, self.table.zones)
+
+    @property
+    def cooldown(self) -> float:
+        return self.state.cooldown
+
+    @cooldown.setter
+    def cooldown(self, cooldown: float):
+        self.state.cooldown = cooldown
+
+    @property
+    def dwell(self) -> float:
+        return self.state.dwell
+
+    @dwell.setter
+    def dwell(self, dwell: float):
+        self.state.dwell = dwell
+
+    @property
+    def hysteresis(self) -> float:
+        return self.state.hysteresis
+
+    @hysteresis.setter
+    def hysteresis(self, hysteresis: float):
+        self.state.hysteresis = hysteresis
+
+    @property
+    def last_corner(self) -> Optional[str]:
+        """Corner or zone the cursor is in, counting the exit hysteresis"""
+        return self.state.zone
+
+    @property
+    def last_trigger_time(self) -> float:
+        return self.state.last_trigger_time
+
+    def set_displays(self, displays: Sequence[Display]):
+        """Swap in the zone table for a new display layout"""
+        self.table = ZoneTable(displays, self.table.threshold, self.table.zones)
+
+    def set_zones(self, zones: Sequence[ZoneSpec]):
+        """Swap in the zone table for a new set of configured zones"""
+        self.table = ZoneTable(self.table.displays, self.table.threshold, zones)
+
+    def configure(self, settings, rebuild: bool = True):
+        """Switch to new DetectionSettings at the next sample; safe from any thread.
+
+        The zone table for them is built here, on the caller's thread, unless
+        ``rebuild`` is False because the threshold and zone shapes are the
+        same as before.
+        """
+        table = None
+        if rebuild:
+            table = ZoneTable(self.table.displays, settings.threshold, settings.zones)
+        self._pending = (settings, table)
+
+    def _apply(self):
+        pending, self._pending = self._pending, None
+        settings, table = pending
+        if table is not None:
+            if table.displays is not self.table.displays:
+                # The displays changed while it was being built
+                table = ZoneTable(self.table.displays, table.threshold, table.zones)
+            self.table = table
+        state = self.state
+        state.cooldown = settings.cooldown
+        state.dwell = settings.dwell
+        state.hysteresis = settings.hysteresis
+
+    def classify(self, x: float, y: float) -> Optional[str]:
+        """Return the corner or zone containing (x, y), or None"""
+        return self.table.classify(x, y)
+
+    def update(self, timestamp: float, x: float, y: float) -> Optional[str]:
+        """Feed one sample; return the corner or zone whose actions should fire"""
+        if self._pending is not None:
+            self._apply()
+        return self.state.update(timestamp, self.table.classify(x, y))
+
+    def reset(self):
+        """Forget the occupied corner, so the next sample counts as a fresh entry"""
+        self.state.reset()
+
+    def next_deadline(self) -> Optional[float]:
+        """Time at which the occupied corner becomes eligible to fire.
+
+        Event-driven callers use this to re-evaluate a parked cursor, since
+        no further move events arrive while it sits in a corner.
+        """
+        return self.state.next_deadline()
+
+
+def replay(source: PointerSource, detector: CornerDetector,
+           on_trigger: Optional[Callable[[str, float], None]] = None) -> Tuple[int, int, float]:
+    """Drain a pointer source through a detector as fast as possible.
+
+    Returns (samples, triggers, elapsed_seconds).
+    """
+    samples = triggers = 0
+    update = detector.update
+    start = time.perf_counter()
+    sample = source.sample()
+    while sample is not None:
+        samples += 1
+        corner = update(*sample)
+        if corner:
+            triggers += 1
+            if on_trigger:
+                on_trigger(corner, sample[0])
+        sample = source.sample()
+    return samples, triggers, time.perf_counter() - start
@@ -0,0 +1,471 @@
+"""
+FireCorners Action Executor
+
+Runs corner actions off the detection thread. A trigger is queued and
+returns at once; a bounded pool of worker threads launches the actions,
+waits for each with its own timeout and kills the ones that overrun, so a
+hanging script can tie up a worker but never corner detection.
+
+Actions of one trigger run concurrently, except that an action with
+"wait": true starts only after every action before it has finished:
+
+  "top_left": [
+    {"type": "Shell Command", "value": "make-coffee", "timeout": 120},
+    {"type": "Application", "value": "Mail"},
+    {"type": "AppleScript", "value": "...", "wait": true}
+  ]
+
+"timeout" is in seconds. Without one an action runs as long as it takes,
+unless the executor was given a default timeout. The executor
+takes the LaunchPlans that actions.compile_config builds when the config
+is loaded.
+
+"Application" plans are checked against the ApplicationCatalog, if the
+executor has one, right before launching, in case the application moved
+since the config was compiled.
+
+Plans of the kinds the executor's Launcher handles (URLs, applications
+and keystrokes with the NativeLauncher) are carried out in-process; the
+rest, and any the launcher turns down, are launched as processes.
+
+"Python" plans call their function through the executor's PluginRegistry
+and wait for it up to the timeout.
+
+Script actions go to a warm interpreter worker when the executor has a
+pool for their type, and are launched one-shot otherwise.
+
+The output of launched actions, stdout and stderr together, is read into a
+bounded buffer per run (see output.py) and kept in ``outputs``; failures
+are logged with the tail of their output.
+
+Three limits keep slow actions from piling up when corners fire often:
+
+- Single-flight. With "action", an action whose identical twin from the
+  same corner is still running is not started again: it counts as done
+  when its twin is, so a "wait": true action after it still waits for
+  the twin. With "corner", a trigger is dropped while the corner's
+  previous trigger is still running. Both count as coalesced.
+- A token bucket per corner: ``burst`` triggers at once, refilled at
+  ``rate`` per second. Triggers beyond it are counted as rate limited.
+- A cap on child processes running at once, across corners; actions
+  wait for a slot in their worker thread. Python actions start no process
+  and do not count.
+"""
+
+import logging
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .actions import LaunchPlan
+from .catalog import ApplicationCatalog
+from .interpreters import InterpreterPool
+from .launchers import Launcher
+from .output import DEFAULT_LIMIT, OutputCapture, OutputLog, stream_output
+from .plugins import PluginError, PluginRegistry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_CHILDREN = 4
+DEFAULT_RATE = 1.0  # triggers per second per corner, once the burst is spent
+DEFAULT_BURST = 5
+SINGLE_FLIGHT = ("action", "corner", None)
+LOG_LINES = 10  # lines of a failed action's output that go to the log
+DEFAULT_TIMEOUT = None  # seconds before an action is killed; None never kills
+KILL_GRACE = 1.0  # seconds between SIGTERM and SIGKILL
+
+# Kinds whose scripts run on another kind's interpreter pool
+INTERPRETER_FOR = {"Keystroke": "AppleScript"}
+
+_STOP = object()
+
+
+def stages(plans: Sequence[LaunchPlan]) -> List[List[LaunchPlan]]:
+    """Split a corner's plans into groups that may run concurrently"""
+    groups = []
+    for plan in plans:
+        if not groups or plan.wait:
+            groups.append([])
+        groups[-1].append(plan)
+    return groups
+
+
+class _Trigger:
+    """Progress of one trigger through its stages"""
+
+    def __init__(self, corner: str, groups: List[List[LaunchPlan]], submitted: float):
+        self.corner = corner
+        self.groups = groups
+        self.submitted = submitted
+        self.stage = 0
+        self.remaining = 0
+
+
+class TokenBucket:
+    """Allows ``burst`` events at once and ``rate`` per second on average"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class ActionExecutor:
+    """Bounded worker pool that launches actions with per-action timeouts"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, timeout: Optional[float] = DEFAULT_TIMEOUT,
+                 max_pending: int = 64, popen: Callable = subprocess.Popen,
+                 clock: Callable[[], float] = time.monotonic,
+                 interpreters: Optional[Dict[str, InterpreterPool]] = None,
+                 catalog: Optional[ApplicationCatalog] = None,
+                 plugins: Optional[PluginRegistry] = None,
+                 single_flight: Optional[str] = "action", rate: Optional[float] = DEFAULT_RATE,
+                 burst: float = DEFAULT_BURST, max_children: int = DEFAULT_MAX_CHILDREN,
+                 output_limit: int = DEFAULT_LIMIT, launcher: Optional[Launcher] = None):
+        self.timeout = timeout
+        self.popen = popen
+        self.interpreters = interpreters or {}
+        self.catalog = catalog
+        self.plugins = plugins
+        self.launcher = launcher
+        self.output_limit = output_limit
+        self.outputs = OutputLog()
+        self.clock = clock
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=512)
+        self._children = threading.BoundedSemaphore(max_children)
+        # (corner, kind, value) of the actions in flight, and the triggers
+        # whose identical action was coalesced onto each
+        self._running: Dict[tuple, List[_Trigger]] = {}
+        self._busy: Dict[str, int] = {}  # corner -> triggers not yet finished
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stopping = False
+        self.set_limits(single_flight, rate, burst)
+        self.in_flight = 0
+        self.children = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.throttled = 0
+        self.in_process = 0
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name=f"firecorners-action-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def set_limits(self, single_flight: Optional[str] = "action",
+                   rate: Optional[float] = DEFAULT_RATE, burst: float = DEFAULT_BURST):
+        """Change the single-flight mode and the per-corner rate limit; None disables"""
+        if single_flight not in SINGLE_FLIGHT:
+            raise ValueError(f"single_flight must be one of {SINGLE_FLIGHT}, got {single_flight!r}")
+        with self._lock:
+            self.single_flight = single_flight
+            self.rate = rate
+            self.burst = max(1.0, burst)
+            self._buckets.clear()
+
+    def submit(self, corner: str, plans: Sequence[LaunchPlan]) -> bool:
+        """Queue a corner's plans; never blocks. False if they were dropped."""
+        groups = stages(plans)
+        if not groups:
+            return True
+        now = self.clock()
+        with self._lock:
+            if self.single_flight == "corner" and self._busy.get(corner):
+                self.coalesced += 1
+                return False
+            if self.rate is not None:
+                bucket = self._buckets.get(corner)
+                if bucket is None:
+                    bucket = self._buckets[corner] = TokenBucket(self.rate, self.burst, now)
+                if not bucket.take(now):
+                    self.rate_limited += 1
+                    return False
+            self._busy[corner] = self._busy.get(corner, 0) + 1
+            self.submitted += 1
+        return self._enqueue(_Trigger(corner, groups, now))
+
+    def _enqueue(self, trigger: _Trigger) -> bool:
+        group = trigger.groups[trigger.stage]
+        # Under the lock, so nothing is queued once shutdown() has started
+        with self._lock:
+            trigger.remaining = len(group)
+            for i, plan in enumerate(group):
+                if self._stopping:
+                    reason = "Executor stopped"
+                else:
+                    try:
+                        self._queue.put_nowait((trigger, plan))
+                        continue
+                    except queue.Full:
+                        reason = "Action queue full"
+                # Drop the rest of this trigger, including later stages
+                dropped = len(group) - i + sum(len(g) for g in trigger.groups[trigger.stage + 1:])
+                self.dropped += dropped
+                trigger.groups = trigger.groups[:trigger.stage + 1]
+                trigger.remaining -= len(group) - i
+                if trigger.remaining == 0:
+                    self._done(trigger)
+                break
+            else:
+                return True
+        logger.warning("%s, dropping %d actions for %s", reason, dropped, trigger.corner)
+        return False
+
+    def _done(self, trigger: _Trigger):
+        """Mark a trigger's corner as no longer busy; call with the lock held"""
+        busy = self._busy.get(trigger.corner, 0) - 1
+        if busy > 0:
+            self._busy[trigger.corner] = busy
+        else:
+            self._busy.pop(trigger.corner, None)
+
+    def _finished(self, trigger: _Trigger):
+        """Count one action of the current stage as done; start the next stage"""
+        with self._lock:
+            trigger.remaining -= 1
+            if trigger.remaining > 0:
+                return
+            trigger.stage += 1
+            more = trigger.stage < len(trigger.groups)
+            if not more:
+                self._done(trigger)
+        if more:
+            self._enqueue(trigger)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                # Pass it on to the next worker
+                try:
+                    self._queue.put_nowait(_STOP)
+                except queue.Full:
+                    pass  # shutdown() was called again and queued another
+                break
+            trigger, plan = item
+            key = (trigger.corner, plan.kind, plan.value)
+            with self._lock:
+                twin = self._running.get(key) if self.single_flight is not None else None
+                if twin is not None:
+                    # Done when the twin is; later stages wait for it
+                    twin.append(trigger)
+                    self.coalesced += 1
+                else:
+                    self._running.setdefault(key, [])
+                    self.in_flight += 1
+            if twin is not None:
+                logger.info("%s action still running, skipping it: %s", plan.kind, plan.value)
+                continue
+            try:
+                ok = self._run(trigger.corner, plan)
+            except Exception as e:
+                logger.error("Error executing %s action: %s", plan.kind, e, exc_info=True)
+                ok = False
+            with self._lock:
+                coalesced = self._running.pop(key, [])
+                self.in_flight -= 1
+                self.completed += 1
+                if not ok:
+                    self.failed += 1
+                self._latencies.append(self.clock() - trigger.submitted)
+            self._finished(trigger)
+            for waiting in coalesced:
+                self._finished(waiting)
+
+    def _run(self, corner: str, plan: LaunchPlan) -> bool:
+        """Launch one plan and wait for it; return whether it succeeded"""
+        timeout = self.timeout if plan.timeout is None else plan.timeout
+        logger.info("Executing %s action: %s", plan.kind, plan.value)
+        if plan.kind == "Python":
+            return self._call(plan, timeout)
+        if self.launcher is not None and plan.kind in self.launcher.kinds:
+            ok = self.launcher.launch(plan.kind, self._args(plan), dict(plan.kwargs))
+            if ok is not None:
+                with self._lock:
+                    self.in_process += 1
+                if not ok:
+                    logger.warning("%s action failed: %s", plan.kind, plan.value)
+                    return False
+                logger.info("Action executed successfully")
+                return True
+        if not self._children.acquire(blocking=False):
+            with self._lock:
+                self.throttled += 1
+            self._children.acquire()
+        with self._lock:
+            self.children += 1
+        try:
+            return self._launch(corner, plan, timeout)
+        finally:
+            with self._lock:
+                self.children -= 1
+            self._children.release()
+
+    def _launch(self, corner: str, plan: LaunchPlan, timeout: Optional[float]) -> bool:
+        capture = OutputCapture(self.output_limit)
+        pool = None
+        if plan.script is not None:
+            pool = self.interpreters.get(INTERPRETER_FOR.get(plan.kind, plan.kind))
+        if pool is not None:
+            try:
+                code = pool.run(plan.script, timeout, capture)
+            except subprocess.TimeoutExpired:
+                self._timed_out(plan.kind, plan.value, timeout)
+                self.outputs.record(corner, plan.kind, plan.value, None, capture)
+                return False
+            if code is not None:
+                return self._check(corner, plan, code, capture)
+
+        args = self._args(plan)
+        # A session of its own, so a timeout kills the whole process group
+        process = self.popen(args if plan.shell else list(args), shell=plan.shell,
+                             stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, start_new_session=True)
+        stdout = getattr(process, "stdout", None)
+        try:
+            if stdout is None:
+                code = process.wait(timeout=timeout)
+            else:
+                code = stream_output(process, capture, timeout)
+        except subprocess.TimeoutExpired:
+            self._timed_out(plan.kind, plan.value, timeout)
+            _kill(process)
+            self.outputs.record(corner, plan.kind, plan.value, None, capture)
+            return False
+        finally:
+            if stdout is not None:
+                stdout.close()
+        return self._check(corner, plan, code, capture)
+
+    def _args(self, plan: LaunchPlan):
+        if plan.kind == "Application" and self.catalog is not None:
+            return self.catalog.launch_args(plan.args, plan.value)
+        return plan.args
+
+    def _call(self, plan: LaunchPlan, timeout: Optional[float]) -> bool:
+        if self.plugins is None:
+            logger.warning("Python actions are not enabled: %s", plan.value)
+            return False
+        try:
+            ok = self.plugins.call(plan.value, dict(plan.kwargs), timeout)
+        except PluginError as e:
+            logger.warning("%s", e)
+            return False
+        if ok is None:
+            # A thread cannot be killed; the call is abandoned, not stopped
+            logger.warning("Python action timed out after %.1f s, abandoning it: %s",
+                           timeout, plan.value)
+            with self._lock:
+                self.timed_out += 1
+            return False
+        if not ok:
+            logger.warning("Python action failed: %s", plan.value)
+            return False
+        logger.info("Action executed successfully")
+        return True
+
+    def _timed_out(self, action_type: str, value: str, timeout: float):
+        logger.warning("%s action timed out after %.1f s, killing it: %s",
+                       action_type, timeout, value)
+        with self._lock:
+            self.timed_out += 1
+
+    def _check(self, corner: str, plan: LaunchPlan, code: int, capture: OutputCapture) -> bool:
+        output = self.outputs.record(corner, plan.kind, plan.value, code, capture)
+        if code != 0:
+            if output.output:
+                tail = "\n".join(output.output.rstrip("\n").splitlines()[-LOG_LINES:])
+                logger.warning("%s action exited with status %s: %s\n%s", plan.kind, code,
+                               plan.value, tail)
+            else:
+                logger.warning("%s action exited with status %s: %s", plan.kind, code, plan.value)
+            return False
+        logger.info("Action executed successfully (%d bytes of output)", capture.total)
+        return True
+
+    def counters(self) -> Dict[str, int]:
+        return {"submitted": self.submitted, "completed": self.completed,
+                "failed": self.failed, "timed_out": self.timed_out, "dropped": self.dropped,
+                "coalesced": self.coalesced, "rate_limited": self.rate_limited,
+                "throttled": self.throttled, "in_process": self.in_process}
+
+    def gauges(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        gauges = {"queue_depth": self._queue.qsize(), "in_flight": self.in_flight,
+                  "children": self.children}
+        if latencies:
+            gauges["latency_ms_p50"] = latencies[len(latencies) // 2] * 1000
+            gauges["latency_ms_p99"] = latencies[min(len(latencies) - 1,
+                                                     int(len(latencies) * 0.99))] * 1000
+        return gauges
+
+    def shutdown(self, wait: bool = False):
+        """Stop the workers; nothing is queued afterwards.
+
+        With ``wait``, the queued actions are started first and this returns
+        once the workers have finished. Without it, queued actions are
+        dropped and this returns at once, even while every worker is stuck
+        on an action that never times out.
+        """
+        with self._lock:
+            self._stopping = True
+            if not wait:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        continue
+                    trigger, _ = item
+                    self.dropped += 1
+                    trigger.remaining -= 1
+                    if trigger.remaining == 0:
+                        self._done(trigger)
+                # Room for it: the queue is empty and nothing else is queued now
+                self._queue.put_nowait(_STOP)
+        if wait:
+            self._queue.put(_STOP)
+            for thread in self._threads:
+                thread.join()
+        for pool in self.interpreters.values():
+            pool.stop()
+
+
+def _kill(process):
+    """Terminate a process group, escalating to SIGKILL after a grace period"""
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        try:
+            process.wait(timeout=KILL_GRACE)
+            return
+        except subprocess.TimeoutExpired:
+            continue
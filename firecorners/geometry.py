@@ -0,0 +1,154 @@
+"""
+FireCorners Display Geometry
+
+Describes the display layout that hot corners and zones are placed on, and
+reports layout changes (docking, resolution changes) through a Quartz
+reconfiguration callback so the zone table is rebuilt only when needed.
+
+Coordinates are Quartz global display coordinates in whole pixels: the main
+display's top-left is (0, 0), y grows downwards, and displays placed left
+of or above the main display have negative origins.
+"""
+
+import logging
+import threading
+from typing import Callable, List, NamedTuple, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CORNERS = ("top_left", "top_right", "bottom_left", "bottom_right")
+
+
+class Display(NamedTuple):
+    display_id: int
+    x: int
+    y: int
+    width: int
+    height: int
+
+    def contains(self, x: int, y: int) -> bool:
+        return self.x <= x < self.x + self.width and self.y <= y < self.y + self.height
+
+
+def covered(displays: Sequence[Display], x: int, y: int) -> bool:
+    """Whether any display contains the pixel (x, y)"""
+    return any(d.contains(x, y) for d in displays)
+
+
+def corner_point(display: Display, corner: str) -> Tuple[int, int, int, int]:
+    """Return (x, y, dx, dy): a display's corner pixel and its outward direction"""
+    right = corner.endswith("right")
+    bottom = corner.startswith("bottom")
+    x = display.x + display.width - 1 if right else display.x
+    y = display.y + display.height - 1 if bottom else display.y
+    return x, y, 1 if right else -1, 1 if bottom else -1
+
+
+def corner_pinned(displays: Sequence[Display], display: Display, corner: str) -> bool:
+    """Whether the cursor is stopped at this corner in both directions.
+
+    A display that continues past the corner horizontally or vertically
+    (such as the seam between two side-by-side monitors) lets the cursor
+    move on, so that corner cannot act as a hot corner.
+    """
+    x, y, dx, dy = corner_point(display, corner)
+    return not covered(displays, x + dx, y) and not covered(displays, x, y + dy)
+
+
+def single_display(width: int, height: int) -> List[Display]:
+    """Layout with one display at the origin"""
+    return [Display(0, 0, 0, width, height)]
+
+
+def quartz_displays() -> List[Display]:
+    """Read the active display layout from Quartz"""
+    import Quartz
+    err, display_ids, count = Quartz.CGGetActiveDisplayList(32, None, None)
+    if err:
+        raise RuntimeError(f"CGGetActiveDisplayList failed with error {err}")
+    displays = []
+    for display_id in display_ids[:count]:
+        bounds = Quartz.CGDisplayBounds(display_id)
+        displays.append(Display(int(display_id), int(bounds.origin.x), int(bounds.origin.y),
+                                int(bounds.size.width), int(bounds.size.height)))
+    return displays
+
+
+class DisplayMonitor:
+    """Reports the display layout and notifies listeners when it changes"""
+
+    def __init__(self):
+        self._listeners: List[Callable[[List[Display]], None]] = []
+
+    def displays(self) -> List[Display]:
+        raise NotImplementedError
+
+    def add_listener(self, listener: Callable[[List[Display]], None]):
+        self._listeners.append(listener)
+
+    def _notify(self):
+        displays = self.displays()
+        for listener in self._listeners:
+            try:
+                listener(displays)
+            except Exception as e:
+                logger.error("Error handling display change: %s", e, exc_info=True)
+
+    def stop(self):
+        """Stop watching for changes"""
+
+
+class QuartzDisplayMonitor(DisplayMonitor):
+    """Listens for CGDisplay reconfiguration callbacks.
+
+    Quartz calls back once per affected display, before and after the
+    change; listeners run once per completed reconfiguration.
+    """
+
+    def __init__(self):
+        super().__init__()
+        import Quartz
+        self._quartz = Quartz
+        self._pending = False
+        self._lock = threading.Lock()
+        Quartz.CGDisplayRegisterReconfigurationCallback(self._on_reconfigure, None)
+
+    def displays(self) -> List[Display]:
+        return quartz_displays()
+
+    def _on_reconfigure(self, display_id, flags, user_info):
+        if flags & self._quartz.kCGDisplayBeginConfigurationFlag:
+            return
+        with self._lock:
+            if self._pending:
+                return
+            self._pending = True
+        # Let the remaining per-display callbacks of this change arrive first
+        timer = threading.Timer(0.1, self._flush)
+        timer.daemon = True
+        timer.start()
+
+    def _flush(self):
+        with self._lock:
+            self._pending = False
+        logger.info("Display configuration changed, rebuilding zone table")
+        self._notify()
+
+    def stop(self):
+        self._quartz.CGDisplayRemoveReconfigurationCallback(self._on_reconfigure, None)
+
+
+class FakeDisplayMonitor(DisplayMonitor):
+    """In-memory display layout for tests and benchmarks"""
+
+    def __init__(self, displays: Sequence[Display]):
+        super().__init__()
+        self._displays = list(displays)
+
+    def displays(self) -> List[Display]:
+        return list(self._displays)
+
+    def set_displays(self, displays: Sequence[Display]):
+        """Simulate a reconfiguration such as a dock, undock or resolution change"""
+        self._displays = list(displays)
+        self._notify()
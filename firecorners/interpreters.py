@@ -0,0 +1,421 @@
+"""
+FireCorners Interpreter Workers
+
+Keeps AppleScript and shell interpreters running so that an action does not
+pay for a process launch. Each worker is a long-lived child process that
+reads scripts from a pipe and writes the script's output to stdout,
+followed by a "\\n<token> <status>\\n" trailer. Everything before the
+trailer is handed to the caller's OutputCapture as it arrives, so output
+is never buffered whole.
+
+- Shell workers are a plain /bin/sh with job control on. Each script runs
+  in a subshell, a fork of the already running shell, so scripts do not
+  share state, and as a job of its own, in its own process group.
+- AppleScript workers run this module as a driver that compiles and runs
+  scripts in-process with NSAppleScript.
+
+A pool hands out idle workers, pings workers that have been idle for a
+while, replaces dead ones and, when no warm worker can be had, tells the
+caller to fall back to a one-shot launch. A shell script that overruns
+its timeout is killed together with whatever it started, by signalling its
+job's process group; work that earlier scripts left running in the
+background is not touched. A shell that cannot turn job control on fails
+its ping, so its scripts are launched one-shot instead. An AppleScript
+that overruns takes its worker down with it.
+
+Run as ``python -m firecorners.interpreters ENGINE`` to serve requests, or
+``python -m firecorners.interpreters ENGINE -e SCRIPT`` to run one script
+and exit. ENGINE is "applescript" or "fake"; the fake engine understands
+"sleep SECONDS", "print TEXT", "exit STATUS" and "crash", and lets the
+benchmarks run on machines without AppleScript.
+"""
+
+import logging
+import os
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PING_TIMEOUT = 5.0  # seconds a fresh or idle worker has to answer a ping
+STOP_GRACE = 1.0
+
+
+class WorkerError(RuntimeError):
+    """The worker died or broke protocol. ``sent`` tells whether the script reached it."""
+
+    def __init__(self, message: str, sent: bool = False):
+        super().__init__(message)
+        self.sent = sent
+
+
+def frame_shell(script: str, token: str) -> bytes:
+    """A shell request: run ``script`` as a job, then report its status.
+
+    The job's pid, which with job control is also its process group, is
+    reported as "<token>+<pid>\\n" as soon as it starts. That line is one
+    write, but may land in the middle of a line of the script's output.
+    """
+    quoted = "'" + script.replace("'", "'\\''") + "'"
+    return (f"set -m 2>/dev/null; ( eval {quoted} ) </dev/null 2>&1 & "
+            f"printf '{token}+%d\\n' $!; wait $! 2>/dev/null; "
+            f"printf '\\n{token} %d\\n' $?\n").encode()
+
+
+# Fails unless the shell runs each job in a process group of its own
+SHELL_PING = "case $- in *m*) ;; *) exit 1 ;; esac"
+
+
+def frame_driver(script: str, token: str) -> bytes:
+    """A driver request: a "<token> <length>" header followed by the script"""
+    data = script.encode()
+    return f"{token} {len(data)}\n".encode() + data
+
+
+class InterpreterWorker:
+    """One long-lived interpreter process"""
+
+    def __init__(self, argv: List[str], frame: Callable[[str, str], bytes],
+                 ping_script: str = "", popen: Callable = subprocess.Popen,
+                 env: Optional[Dict[str, str]] = None):
+        self.argv = argv
+        self.env = env
+        self.frame = frame
+        self.ping_script = ping_script
+        self.popen = popen
+        self.process = None
+        self.job = None  # process group of the running shell script, if any
+        self.last_used = 0.0
+        self._buffer = b""
+        self._seq = 0
+
+    def start(self):
+        # A session of its own, so killing the worker also kills its scripts
+        self.process = self.popen(self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                  env=self.env, start_new_session=True)
+        self.last_used = time.monotonic()
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, script: str, timeout: Optional[float], output=None) -> int:
+        """Run a script and return its exit status.
+
+        The script's output goes to ``output.write`` if given and is
+        discarded otherwise. ``timeout`` None waits as long as it takes.
+        Raises subprocess.TimeoutExpired if it overruns, after killing its
+        job if it runs as one (the worker must then be killed too), and
+        WorkerError if the worker died.
+        """
+        self._seq += 1
+        self.job = None
+        token = f"fc{os.getpid()}.{self._seq}"
+        try:
+            self.process.stdin.write(self.frame(script, token))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerError(f"worker is gone: {e}")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        marker = b"\n" + token.encode() + b" "
+        job_marker = token.encode() + b"+"
+        fd = self.process.stdout.fileno()
+        while True:
+            pending = -1
+            if self.job is None:
+                pending = self._buffer.find(job_marker)
+                if pending >= 0:
+                    end = self._buffer.find(b"\n", pending + len(job_marker))
+                    if end >= 0:
+                        self.job = int(self._buffer[pending + len(job_marker):end])
+                        self._buffer = self._buffer[:pending] + self._buffer[end + 1:]
+                        pending = -1
+            start = self._buffer.find(marker)
+            if start >= 0:
+                end = self._buffer.find(b"\n", start + len(marker))
+                if end >= 0:
+                    if output is not None and start:
+                        output.write(self._buffer[:start])
+                    status = int(self._buffer[start + len(marker):end])
+                    self._buffer = self._buffer[end + 1:]
+                    self.last_used = time.monotonic()
+                    return status
+            elif len(self._buffer) > len(marker):
+                # Pass on all but what could be the start of the trailer
+                # or of an unfinished job line
+                cut = len(self._buffer) - (len(marker) - 1)
+                if pending >= 0:
+                    cut = min(cut, pending)
+                if output is not None and cut:
+                    output.write(self._buffer[:cut])
+                self._buffer = self._buffer[cut:]
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if (remaining is not None and remaining <= 0 or
+                    not select.select([fd], [], [], remaining)[0]):
+                self.kill_job()
+                raise subprocess.TimeoutExpired(self.argv, timeout)
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                raise WorkerError("worker exited", sent=True)
+            self._buffer += chunk
+
+    def ping(self, timeout: float = PING_TIMEOUT) -> bool:
+        try:
+            return self.run(self.ping_script, timeout) == 0
+        except (WorkerError, subprocess.TimeoutExpired):
+            return False
+
+    def kill_job(self):
+        """Kill the running shell script's process group, if it has one of its own"""
+        job, self.job = self.job, None
+        if job is None:
+            return
+        try:
+            if os.getpgid(job) == job:
+                os.killpg(job, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def kill(self):
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+
+    def stop(self):
+        """Close the pipe and wait for the worker to exit, killing it if it doesn't"""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=STOP_GRACE)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+def shell_worker(shell: str = "/bin/sh") -> InterpreterWorker:
+    return InterpreterWorker([shell], frame_shell, ping_script=SHELL_PING)
+
+
+def driver_worker(engine: str) -> InterpreterWorker:
+    # Make this package importable even when the daemon runs from a checkout
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.environ.get("PYTHONPATH")
+    env = dict(os.environ, PYTHONPATH=package_root + (os.pathsep + path if path else ""))
+    return InterpreterWorker([sys.executable, "-m", "firecorners.interpreters", engine],
+                             frame_driver, env=env)
+
+
+def applescript_worker() -> InterpreterWorker:
+    return driver_worker("applescript")
+
+
+class InterpreterPool:
+    """Warm workers of one kind, up to ``size`` at a time"""
+
+    def __init__(self, name: str, factory: Callable[[], InterpreterWorker], size: int = 2,
+                 health_interval: float = 60.0, max_failures: int = 3,
+                 retry_after: float = 60.0):
+        self.name = name
+        self.factory = factory
+        self.size = size
+        self.health_interval = health_interval
+        self.max_failures = max_failures
+        self.retry_after = retry_after
+        self._idle: List[InterpreterWorker] = []
+        self._live = 0
+        self._failures = 0
+        self._disabled_until = 0.0
+        self._lock = threading.Lock()
+        self.starts = 0
+        self.crashes = 0
+        self.timeouts = 0
+        self.warm_runs = 0
+        self.fallbacks = 0
+
+    def start(self):
+        """Warm up one worker ahead of the first trigger"""
+        with self._lock:
+            if self._live >= self.size:
+                return
+            self._live += 1
+        worker = self._spawn()
+        if worker is not None:
+            self._checkin(worker)
+
+    def _spawn(self) -> Optional[InterpreterWorker]:
+        worker = self.factory()
+        try:
+            worker.start()
+            ok = worker.ping()
+        except OSError as e:
+            logger.warning("Could not start %s worker: %s", self.name, e)
+            ok = False
+        with self._lock:
+            self.starts += 1
+            if ok:
+                self._failures = 0
+                return worker
+            self._live -= 1
+            self._failures += 1
+            if self._failures >= self.max_failures:
+                logger.warning("%s workers keep failing, launching scripts one-shot for %.0f s",
+                               self.name, self.retry_after)
+                self._disabled_until = time.monotonic() + self.retry_after
+                self._failures = 0
+        worker.kill()
+        return None
+
+    def _checkout(self) -> Optional[InterpreterWorker]:
+        with self._lock:
+            if time.monotonic() < self._disabled_until:
+                return None
+            if self._idle:
+                worker = self._idle.pop()
+            elif self._live < self.size:
+                self._live += 1
+                worker = None
+            else:
+                return None
+        if worker is None:
+            return self._spawn()
+        if not worker.alive() or (time.monotonic() - worker.last_used > self.health_interval
+                                  and not worker.ping()):
+            logger.warning("%s worker failed its health check, restarting it", self.name)
+            self.crashes += 1
+            self._discard(worker)
+            with self._lock:
+                self._live += 1
+            return self._spawn()
+        return worker
+
+    def _checkin(self, worker: InterpreterWorker):
+        with self._lock:
+            self._idle.append(worker)
+
+    def _discard(self, worker: InterpreterWorker):
+        worker.kill()
+        with self._lock:
+            self._live -= 1
+
+    def run(self, script: str, timeout: Optional[float], output=None) -> Optional[int]:
+        """Run a script on a warm worker and return its exit status.
+
+        Returns None when no worker is available or the worker died before
+        receiving the script, in which case the caller should launch it
+        one-shot. Raises subprocess.TimeoutExpired after killing a worker
+        that overran.
+        """
+        worker = self._checkout()
+        if worker is None:
+            self.fallbacks += 1
+            return None
+        try:
+            status = worker.run(script, timeout, output)
+        except subprocess.TimeoutExpired:
+            self.timeouts += 1
+            self._discard(worker)
+            raise
+        except WorkerError as e:
+            logger.warning("%s worker crashed: %s", self.name, e)
+            self.crashes += 1
+            self._discard(worker)
+            if e.sent:
+                return -1
+            self.fallbacks += 1
+            return None
+        self.warm_runs += 1
+        self._checkin(worker)
+        return status
+
+    def counters(self) -> Dict[str, int]:
+        return {"starts": self.starts, "crashes": self.crashes, "timeouts": self.timeouts,
+                "warm_runs": self.warm_runs, "fallbacks": self.fallbacks}
+
+    def stop(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._live -= len(idle)
+        for worker in idle:
+            worker.stop()
+
+
+def _applescript_engine() -> Callable[[str], int]:
+    from Foundation import NSAppleScript
+
+    def run(source: str) -> int:
+        script = NSAppleScript.alloc().initWithSource_(source)
+        result, error = script.executeAndReturnError_(None)
+        if result is None:
+            sys.stdout.write(f"{error}\n")
+            return 1
+        text = result.stringValue()
+        if text:
+            sys.stdout.write(f"{text}\n")
+        return 0
+
+    return run
+
+
+def _fake_engine() -> Callable[[str], int]:
+    def run(script: str) -> int:
+        command, _, argument = script.strip().partition(" ")
+        if command == "sleep":
+            time.sleep(float(argument))
+        elif command == "print":
+            sys.stdout.write(argument.replace("\\n", "\n"))
+        elif command == "exit":
+            return int(argument)
+        elif command == "crash":
+            os._exit(70)
+        return 0
+
+    return run
+
+
+ENGINES = {"applescript": _applescript_engine, "fake": _fake_engine}
+
+
+def serve(engine: str):
+    """Answer driver requests on stdin until it is closed"""
+    run = ENGINES[engine]()
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    while True:
+        header = stdin.readline()
+        if not header:
+            break
+        token, length = header.split()
+        script = stdin.read(int(length)).decode()
+        try:
+            status = run(script) if script else 0
+        except Exception as e:
+            sys.stdout.write(f"{e}\n")
+            status = 1
+        sys.stdout.flush()
+        stdout.write(b"\n" + token + b" " + str(status).encode() + b"\n")
+        stdout.flush()
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="FireCorners interpreter worker")
+    parser.add_argument("engine", choices=sorted(ENGINES))
+    parser.add_argument("-e", dest="script", help="Run one script and exit")
+    args = parser.parse_args(argv)
+    if args.script is not None:
+        return ENGINES[args.engine]()(args.script)
+    serve(args.engine)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
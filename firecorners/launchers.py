@@ -0,0 +1,175 @@
+"""
+FireCorners Launchers
+
+Backends that carry out actions inside the daemon process instead of
+launching `open` or `osascript`:
+
+- NativeLauncher opens URLs and applications through NSWorkspace and
+  posts keystrokes with CGEventPost.
+- RecordingLauncher records what it was asked to do, so the dispatch
+  layer can be tested and benchmarked without a Mac.
+
+The executor offers each plan to its launcher first. ``launch`` returns
+True or False for a plan it carried out and None for one it cannot
+handle, which the executor then launches as a process the usual way.
+
+A "Keystroke" action sends a key combination, such as "cmd+shift+4" or
+"ctrl+left". Without a launcher that handles it, it runs as an AppleScript
+that tells System Events to press the key. Both need the accessibility
+permission.
+"""
+
+import logging
+import os
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# macOS virtual key codes (ANSI layout)
+KEY_CODES = {
+    "a": 0, "s": 1, "d": 2, "f": 3, "h": 4, "g": 5, "z": 6, "x": 7, "c": 8, "v": 9,
+    "b": 11, "q": 12, "w": 13, "e": 14, "r": 15, "y": 16, "t": 17, "1": 18, "2": 19,
+    "3": 20, "4": 21, "6": 22, "5": 23, "=": 24, "9": 25, "7": 26, "-": 27, "8": 28,
+    "0": 29, "]": 30, "o": 31, "u": 32, "[": 33, "i": 34, "p": 35, "return": 36,
+    "l": 37, "j": 38, "'": 39, "k": 40, ";": 41, "\\": 42, ",": 43, "/": 44, "n": 45,
+    "m": 46, ".": 47, "tab": 48, "space": 49, "`": 50, "delete": 51, "escape": 53,
+    "f17": 64, "f18": 79, "f19": 80, "f20": 90, "f5": 96, "f6": 97, "f7": 98, "f3": 99,
+    "f8": 100, "f9": 101, "f11": 103, "f13": 105, "f16": 106, "f14": 107, "f10": 109,
+    "f12": 111, "f15": 113, "help": 114, "home": 115, "pageup": 116,
+    "forwarddelete": 117, "f4": 118, "end": 119, "f2": 120, "pagedown": 121, "f1": 122,
+    "left": 123, "right": 124, "down": 125, "up": 126,
+}
+KEY_ALIASES = {"enter": "return", "esc": "escape", "backspace": "delete", "del": "forwarddelete"}
+
+# Modifier name -> (AppleScript name, CGEventFlags mask)
+MODIFIERS = {
+    "command": ("command down", 1 << 20),
+    "shift": ("shift down", 1 << 17),
+    "option": ("option down", 1 << 19),
+    "control": ("control down", 1 << 18),
+    "fn": ("fn down", 1 << 23),
+}
+MODIFIER_ALIASES = {"cmd": "command", "alt": "option", "opt": "option", "ctrl": "control"}
+
+
+class KeyCombo(NamedTuple):
+    code: int
+    modifiers: Tuple[str, ...]  # keys of MODIFIERS
+
+    @property
+    def flags(self) -> int:
+        mask = 0
+        for modifier in self.modifiers:
+            mask |= MODIFIERS[modifier][1]
+        return mask
+
+    def applescript(self) -> str:
+        source = f'tell application "System Events" to key code {self.code}'
+        if self.modifiers:
+            source += " using {" + ", ".join(MODIFIERS[m][0] for m in self.modifiers) + "}"
+        return source
+
+
+def parse_key_combo(text: str) -> KeyCombo:
+    """Parse "cmd+shift+4"; raises ValueError"""
+    *modifiers, key = [part.strip().lower() for part in text.split("+")]
+    key = KEY_ALIASES.get(key, key)
+    if key not in KEY_CODES:
+        raise ValueError(f"unknown key {key!r} in {text!r}")
+    names = []
+    for modifier in modifiers:
+        name = MODIFIER_ALIASES.get(modifier, modifier)
+        if name not in MODIFIERS:
+            raise ValueError(f"unknown modifier {modifier!r} in {text!r}")
+        if name not in names:
+            names.append(name)
+    return KeyCombo(KEY_CODES[key], tuple(names))
+
+
+class Launcher:
+    """Carries out plans in-process. Subclasses handle the kinds they list."""
+
+    kinds: Tuple[str, ...] = ()
+
+    def launch(self, kind: str, args: Sequence[str], options: Dict) -> Optional[bool]:
+        """Carry out a plan; True or False if handled, None to launch it as a process.
+
+        ``args`` is the plan's argv (`open` and its arguments for URL and
+        Application plans), ``options`` its keyword arguments.
+        """
+        return None
+
+
+class NativeLauncher(Launcher):
+    """NSWorkspace and CGEventPost; macOS only"""
+
+    kinds = ("URL", "Application", "Keystroke")
+
+    def __init__(self):
+        from AppKit import NSWorkspace
+        from Foundation import NSURL
+        import Quartz
+        self._workspace = NSWorkspace.sharedWorkspace()
+        self._url = NSURL
+        self._quartz = Quartz
+
+    @classmethod
+    def create(cls) -> Optional["NativeLauncher"]:
+        """A NativeLauncher, or None where pyobjc's AppKit is not available"""
+        try:
+            return cls()
+        except ImportError as e:
+            logger.info("Native launching unavailable (%s), using subprocesses", e)
+            return None
+
+    def launch(self, kind: str, args: Sequence[str], options: Dict) -> Optional[bool]:
+        try:
+            if kind == "URL":
+                return self._open_urls(args[1:])
+            if kind == "Application":
+                return self._open_application(args[-1])
+            if kind == "Keystroke":
+                return self._post_keys(KeyCombo(options["code"], tuple(options["modifiers"])))
+        except Exception as e:
+            logger.warning("Native %s launch failed, falling back to a process: %s", kind, e)
+        return None
+
+    def _open_urls(self, urls: Sequence[str]) -> bool:
+        ok = True
+        for text in urls:
+            url = self._url.URLWithString_(text)
+            if url is None:
+                logger.warning("Invalid URL: %s", text)
+                ok = False
+            elif not self._workspace.openURL_(url):
+                ok = False
+        return ok
+
+    def _open_application(self, app: str) -> bool:
+        if os.path.isabs(app):
+            return bool(self._workspace.openURL_(self._url.fileURLWithPath_(app)))
+        return bool(self._workspace.launchApplication_(app))
+
+    def _post_keys(self, combo: KeyCombo) -> bool:
+        quartz = self._quartz
+        for down in (True, False):
+            event = quartz.CGEventCreateKeyboardEvent(None, combo.code, down)
+            if event is None:
+                return False
+            quartz.CGEventSetFlags(event, combo.flags)
+            quartz.CGEventPost(quartz.kCGHIDEventTap, event)
+        return True
+
+
+class RecordingLauncher(Launcher):
+    """Records launches instead of carrying them out; for tests and benchmarks"""
+
+    kinds = ("URL", "Application", "Keystroke")
+
+    def __init__(self, result: Optional[bool] = True):
+        self.result = result
+        self.launches: List[Tuple[str, Tuple[str, ...], Dict]] = []
+
+    def launch(self, kind: str, args: Sequence[str], options: Dict) -> Optional[bool]:
+        self.launches.append((kind, tuple(args), options))
+        return self.result
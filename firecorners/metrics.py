@@ -0,0 +1,82 @@
+"""
+FireCorners Metrics
+
+What the daemon costs while it runs: wakeups, samples, suspensions, action
+launches. Each component keeps its own plain integer counters and exposes
+them through a ``counters()`` method; the Metrics registry only reads them
+when a snapshot is taken, so the hot paths never touch a lock or a shared
+dict. Gauges, such as a queue depth, are read the same way.
+
+Snapshots report every counter as a total, as a rate per hour since start
+and as a rate per hour since the previous snapshot, plus the current value
+of every gauge. The daemon writes one to ~/.firecorners/metrics.json every
+minute.
+"""
+
+import json
+import logging
+import time
+from typing import Callable, Dict
+
+from .store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    """Registry of counter sources"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.started = clock()
+        self._sources: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._previous = (self.started, {})
+
+    def register(self, name: str, source: Callable[[], Dict[str, float]]):
+        """Add (or replace) a source; its counters are reported as "name.counter" """
+        self._sources[name] = source
+
+    def register_gauges(self, name: str, source: Callable[[], Dict[str, float]]):
+        """Add (or replace) a source of values that are reported as is"""
+        self._gauges[name] = source
+
+    def counters(self) -> Dict[str, float]:
+        return _collect(self._sources)
+
+    def gauges(self) -> Dict[str, float]:
+        return _collect(self._gauges)
+
+    def snapshot(self) -> Dict:
+        now = self.clock()
+        counters = self.counters()
+        uptime = now - self.started
+        previous_time, previous = self._previous
+        window = now - previous_time
+        self._previous = (now, counters)
+        return {
+            "timestamp": now,
+            "uptime_seconds": uptime,
+            "counters": counters,
+            "per_hour": {k: v * 3600 / uptime for k, v in counters.items()} if uptime > 0 else {},
+            "recent_per_hour": ({k: (v - previous.get(k, 0)) * 3600 / window
+                                 for k, v in counters.items()} if window > 0 else {}),
+            "gauges": self.gauges(),
+        }
+
+    def write(self, path: str) -> Dict:
+        """Write a snapshot as JSON, replacing the file atomically"""
+        snapshot = self.snapshot()
+        atomic_write(path, json.dumps(snapshot, indent=2, sort_keys=True).encode())
+        return snapshot
+
+
+def _collect(sources: Dict[str, Callable[[], Dict[str, float]]]) -> Dict[str, float]:
+    values = {}
+    for name, source in list(sources.items()):
+        try:
+            for key, value in source().items():
+                values[f"{name}.{key}"] = value
+        except Exception as e:
+            logger.error("Error reading %s metrics: %s", name, e)
+    return values
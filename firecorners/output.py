@@ -0,0 +1,133 @@
+"""
+FireCorners Action Output
+
+Actions used to write straight to the daemon's stdout and stderr, which the
+launch agent sends to log files that only ever grow. Now each action's
+output goes to a pipe that is read as it arrives into an OutputCapture, a
+ring buffer that keeps the last ``limit`` bytes and counts the rest, so a
+chatty command costs a fixed amount of memory however much it prints.
+
+When an action ends, its exit status and the captured tail are recorded in
+an OutputLog, which keeps the latest result of each action, and failures
+are logged with their tail. The daemon writes the log to
+~/.firecorners/output.json along with its metrics, for the configuration
+window and other tools to show.
+"""
+
+import json
+import os
+import select
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+from .store import atomic_write
+
+DEFAULT_LIMIT = 4096  # bytes of output kept per action run
+DEFAULT_ENTRIES = 64  # actions whose latest output is kept
+READ_SIZE = 4096
+
+
+class OutputCapture:
+    """The last ``limit`` bytes written to it, and a count of all of them"""
+
+    __slots__ = ("limit", "total", "_tail")
+
+    def __init__(self, limit: int = DEFAULT_LIMIT):
+        self.limit = limit
+        self.total = 0
+        self._tail = bytearray()
+
+    def write(self, data: bytes):
+        self.total += len(data)
+        if len(data) >= self.limit:
+            self._tail[:] = data[-self.limit:]
+            return
+        self._tail += data
+        excess = len(self._tail) - self.limit
+        if excess > 0:
+            del self._tail[:excess]
+
+    @property
+    def truncated(self) -> int:
+        """Bytes dropped from the front"""
+        return self.total - len(self._tail)
+
+    def text(self) -> str:
+        text = self._tail.decode("utf-8", "replace")
+        if self.truncated:
+            text = f"[{self.truncated} bytes truncated]\n{text}"
+        return text
+
+
+def stream_output(process, capture: OutputCapture, timeout: Optional[float]) -> int:
+    """Read a process's stdout pipe into ``capture`` until it exits; return its status.
+
+    Raises subprocess.TimeoutExpired if it runs longer than ``timeout``;
+    None waits as long as it takes. Stops reading once the process has
+    exited, even if something it started in the background still holds
+    the pipe open.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    remaining = 0.1
+    fd = process.stdout.fileno()
+    while True:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(getattr(process, "args", None), timeout)
+        if select.select([fd], [], [], min(remaining, 0.1))[0]:
+            data = os.read(fd, READ_SIZE)
+            if not data:
+                break
+            capture.write(data)
+        elif process.poll() is not None:
+            break
+    if deadline is None:
+        return process.wait()
+    return process.wait(max(deadline - time.monotonic(), 0.001))
+
+
+class ActionOutput(NamedTuple):
+    corner: str
+    kind: str
+    value: str
+    finished: float  # time.time() when it ended
+    status: Optional[int]  # exit status; None if it timed out
+    output: str  # the captured tail
+    truncated: int  # bytes of output dropped from the front
+
+
+class OutputLog:
+    """The latest output of each action, for at most ``entries`` actions"""
+
+    def __init__(self, entries: int = DEFAULT_ENTRIES):
+        self.entries = entries
+        self._outputs: "OrderedDict[tuple, ActionOutput]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, corner: str, kind: str, value: str, status: Optional[int],
+               capture: OutputCapture) -> ActionOutput:
+        output = ActionOutput(corner, kind, value, time.time(), status, capture.text(),
+                              capture.truncated)
+        key = (corner, kind, value)
+        with self._lock:
+            self._outputs.pop(key, None)
+            self._outputs[key] = output
+            while len(self._outputs) > self.entries:
+                self._outputs.popitem(last=False)
+        return output
+
+    def recent(self, corner: Optional[str] = None) -> List[ActionOutput]:
+        """Latest outputs, oldest first, optionally only those of one corner"""
+        with self._lock:
+            outputs = list(self._outputs.values())
+        return [o for o in outputs if corner is None or o.corner == corner]
+
+    def write(self, path: str) -> List[Dict]:
+        """Write the recent outputs as JSON, replacing the file atomically"""
+        outputs = [o._asdict() for o in self.recent()]
+        atomic_write(path, json.dumps(outputs, indent=2).encode())
+        return outputs
@@ -0,0 +1,189 @@
+"""
+FireCorners Detection Pipelines
+
+Drives a CornerDetector from a pointer source. The event pipeline runs the
+detector only when a sample arrives: event sources push samples from their
+own thread into a queue, and the detection thread blocks on that queue until
+either a new sample or the dwell/cooldown deadline of a corner the cursor is
+parked in. The polling pipeline is the fallback for when no event source is
+available; its sleep between samples comes from a scheduler.
+
+Both pipelines optionally consult a SessionProvider. While the screen is
+locked or asleep the polling pipeline stops sampling until the session
+comes back, and after ``idle_after`` seconds without input it samples at
+most every ``idle_interval``. The event pipeline needs no back-off, since
+no events arrive while nobody is using the pointer, but it stops
+re-evaluating a parked cursor once the session goes inactive.
+"""
+
+import logging
+import queue
+import time
+from typing import Callable, Optional
+
+from .detector import CornerDetector
+from .pointer import EventPointerSource, PointerSource
+from .scheduler import FixedScheduler
+from .session import SessionProvider
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class PollingPipeline:
+    """Samples a polling source at intervals chosen by a scheduler"""
+
+    def __init__(self, detector: CornerDetector, on_trigger: Callable[[str, float], None],
+                 scheduler=None, session: Optional[SessionProvider] = None,
+                 idle_after: float = 300.0, idle_interval: float = 1.0,
+                 suspend_interval: float = 5.0, session_check: float = 1.0):
+        self.detector = detector
+        self.on_trigger = on_trigger
+        self.scheduler = scheduler or FixedScheduler()
+        self.session = session
+        self.idle_after = idle_after
+        self.idle_interval = idle_interval
+        self.suspend_interval = suspend_interval
+        self.session_check = session_check
+        self.wakeups = 0
+        self.samples = 0
+        self.suspensions = 0
+        self.running = True
+
+    def counters(self):
+        return {"wakeups": self.wakeups, "samples": self.samples,
+                "suspensions": self.suspensions}
+
+    def run(self, source: PointerSource):
+        """Poll until stop() is called or the source is exhausted"""
+        detector = self.detector
+        session = self.session
+        sleep = session.wait_for_activity if session is not None else time.sleep
+        suspended = backed_off = False
+        next_check = float("-inf")
+        while self.running:
+            try:
+                if suspended:
+                    if not session.state().active:
+                        sleep(self.suspend_interval)
+                        self.wakeups += 1
+                        continue
+                    suspended = False
+                    next_check = float("-inf")
+                    logger.info("Session active again, resuming pointer sampling")
+
+                sample = source.sample()
+                if sample is None:
+                    logger.info("Pointer source exhausted, stopping detection")
+                    break
+                self.samples += 1
+
+                corner = detector.update(*sample)
+                if corner:
+                    self.on_trigger(corner, sample[0])
+
+                interval = self.scheduler.next_interval(sample[0], sample[1], sample[2], detector)
+                if session is not None and (backed_off or sample[0] >= next_check):
+                    next_check = sample[0] + self.session_check
+                    state = session.state()
+                    if not state.active:
+                        logger.info("Screen locked or asleep, suspending pointer sampling")
+                        suspended = True
+                        self.suspensions += 1
+                        detector.reset()
+                        continue
+                    backed_off = state.idle_seconds >= self.idle_after
+                    if backed_off:
+                        interval = max(interval, self.idle_interval)
+
+                sleep(interval)
+                self.wakeups += 1
+            except Exception as e:
+                logger.error("Error in mouse monitoring: %s", e, exc_info=True)
+                time.sleep(1)
+
+    def stop(self):
+        self.running = False
+        if self.session is not None:
+            # Cut short a suspension
+            self.session.notify_activity()
+
+
+class EventPipeline:
+    """Push-based driver for a CornerDetector.
+
+    Sample timestamps must come from the same clock as ``clock``, which is
+    used to time out dwell and cooldown deadlines.
+    """
+
+    def __init__(self, detector: CornerDetector, on_trigger: Callable[[str, float], None],
+                 clock: Callable[[], float] = time.time, min_repeat: float = 0.05,
+                 session: Optional[SessionProvider] = None):
+        self.detector = detector
+        self.on_trigger = on_trigger
+        self.clock = clock
+        self.min_repeat = min_repeat
+        self.session = session
+        self.wakeups = 0
+        self.samples = 0
+        self.suspensions = 0
+        self._queue = queue.SimpleQueue()
+        self._source = None
+
+    def counters(self):
+        return {"wakeups": self.wakeups, "samples": self.samples,
+                "suspensions": self.suspensions}
+
+    def push(self, timestamp: float, x: float, y: float):
+        """Deliver a sample; safe to call from any thread"""
+        self._queue.put((timestamp, x, y))
+
+    def run(self, source: Optional[EventPointerSource] = None):
+        """Process samples until stop() is called"""
+        self._source = source
+        if source is not None:
+            source.start(self.push)
+
+        detector = self.detector
+        get = self._queue.get
+        last = None
+        while True:
+            deadline = detector.next_deadline() if last is not None else None
+            if deadline is None:
+                item = get()
+            else:
+                # Never re-fire a parked cursor faster than the old poller did
+                deadline = max(deadline, detector.last_trigger_time + self.min_repeat)
+                try:
+                    item = get(timeout=max(0.0, deadline - self.clock()))
+                except queue.Empty:
+                    item = None
+            self.wakeups += 1
+
+            if item is _STOP:
+                break
+            if item is None:
+                # Deadline reached with the cursor still parked
+                if self.session is not None and not self.session.state().active:
+                    # Nobody is there; wait for the next real event
+                    self.suspensions += 1
+                    detector.reset()
+                    last = None
+                    continue
+                sample = (self.clock(), last[1], last[2])
+            else:
+                sample = last = item
+                self.samples += 1
+
+            try:
+                corner = detector.update(*sample)
+                if corner:
+                    self.on_trigger(corner, sample[0])
+            except Exception as e:
+                logger.error("Error in mouse monitoring: %s", e, exc_info=True)
+
+    def stop(self):
+        if self._source is not None:
+            self._source.stop()
+        self._queue.put(_STOP)
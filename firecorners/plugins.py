@@ -0,0 +1,177 @@
+"""
+FireCorners Python Actions
+
+A "Python" action calls a function inside the daemon instead of launching
+a process:
+
+  {"type": "Python", "value": "morning_dashboards", "args": {"screen": 2}}
+
+The value names a plugin registered by an installed package under the
+"firecorners.actions" entry point group:
+
+  entry_points={"firecorners.actions": [
+      "morning_dashboards = mytools.corners:open_dashboards"]}
+
+or is a "module:function" reference. The function is called with "args" as
+keyword arguments. It fails the action by raising or by returning False or
+a non-zero number; anything else counts as success.
+
+Entry points are listed the first time a Python action is compiled, and a
+plugin's module is imported the first time it is called, so plugins cost
+nothing until they are used.
+
+Calls run on a thread of their own, started by an executor worker, which
+waits for it up to the action's timeout. A thread cannot be killed: an
+overrunning call is abandoned and keeps running, and a function that
+accepts a ``cancel`` keyword receives a threading.Event that is set when
+that happens, so it can stop on its own.
+"""
+
+import hashlib
+import importlib
+import inspect
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "firecorners.actions"
+
+
+class PluginError(Exception):
+    """A Python action's plugin could not be found or loaded"""
+
+
+def _entry_points(group: str) -> Dict[str, object]:
+    from importlib import metadata
+    try:
+        found = metadata.entry_points(group=group)
+    except TypeError:  # Python < 3.10 returns a dict of groups
+        found = metadata.entry_points().get(group, [])
+    return {entry_point.name: entry_point for entry_point in found}
+
+
+def _import_reference(reference: str) -> Callable:
+    module_name, _, attribute = reference.partition(":")
+    target = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        target = getattr(target, name)
+    return target
+
+
+class _Plugin:
+    __slots__ = ("function", "cancellable")
+
+    def __init__(self, function: Callable):
+        self.function = function
+        try:
+            parameters = inspect.signature(function).parameters
+        except (TypeError, ValueError):
+            parameters = {}
+        self.cancellable = "cancel" in parameters or any(
+            p.kind == inspect.Parameter.VAR_KEYWORD for p in parameters.values())
+
+
+class PluginRegistry:
+    """Python action functions by name, loaded on first use"""
+
+    def __init__(self, group: str = ENTRY_POINT_GROUP):
+        self.group = group
+        self._entry_points = None
+        self._loaded: Dict[str, _Plugin] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.running = 0
+
+    def register(self, name: str, function: Callable):
+        """Add a plugin directly, without an entry point"""
+        with self._lock:
+            self._loaded[name] = _Plugin(function)
+
+    def names(self):
+        """Every registered plugin name; lists entry points but imports nothing"""
+        if self._entry_points is None:
+            self._entry_points = _entry_points(self.group)
+        return sorted(set(self._entry_points) | set(self._loaded))
+
+    def fingerprint(self) -> bytes:
+        """SHA-256 of the plugin names, which compiling Python actions checks against"""
+        return hashlib.sha256("\n".join(self.names()).encode()).digest()
+
+    def known(self, name: str) -> bool:
+        return ":" in name or name in self.names()
+
+    def load(self, name: str) -> _Plugin:
+        """Import a plugin, once; raises PluginError"""
+        plugin = self._loaded.get(name)
+        if plugin is not None:
+            return plugin
+        with self._lock:
+            plugin = self._loaded.get(name)
+            if plugin is not None:
+                return plugin
+            try:
+                if ":" in name:
+                    function = _import_reference(name)
+                else:
+                    if self._entry_points is None:
+                        self._entry_points = _entry_points(self.group)
+                    if name not in self._entry_points:
+                        raise PluginError(f"no Python action named {name!r}")
+                    function = self._entry_points[name].load()
+            except PluginError:
+                raise
+            except Exception as e:
+                raise PluginError(f"cannot load Python action {name!r}: {e}") from e
+            if not callable(function):
+                raise PluginError(f"Python action {name!r} is not callable")
+            plugin = self._loaded[name] = _Plugin(function)
+            logger.info("Loaded Python action %s", name)
+            return plugin
+
+    def call(self, name: str, kwargs: Dict, timeout: Optional[float]) -> Optional[bool]:
+        """Run a plugin; return whether it succeeded, or None if it overran ``timeout``"""
+        plugin = self.load(name)
+        cancel = threading.Event()
+        if plugin.cancellable:
+            kwargs = dict(kwargs, cancel=cancel)
+        outcome = []
+
+        def run():
+            try:
+                result = plugin.function(**kwargs)
+                outcome.append(result is not False and not (
+                    isinstance(result, (int, float)) and not isinstance(result, bool)
+                    and result != 0))
+            except Exception as e:
+                logger.error("Python action %s failed: %s", name, e, exc_info=True)
+                outcome.append(False)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+        thread = threading.Thread(target=run, name=f"firecorners-python-{name}", daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            cancel.set()
+            with self._lock:
+                self.timeouts += 1
+            return None
+        if not outcome[0]:
+            with self._lock:
+                self.failures += 1
+        return outcome[0]
+
+    def counters(self) -> Dict[str, int]:
+        return {"calls": self.calls, "failures": self.failures, "timeouts": self.timeouts}
+
+    def gauges(self) -> Dict[str, int]:
+        # Calls still running, including ones abandoned after a timeout
+        return {"running": self.running}
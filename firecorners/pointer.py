@@ -0,0 +1,172 @@
+"""
+FireCorners Pointer Sources
+
+A pointer source produces (timestamp, x, y) samples for the corner detector.
+Polling sources are asked for a sample; event sources push one per pointer
+move. The Quartz sources read the live cursor, while the replay and
+synthetic sources feed recorded or scripted samples so detection can be
+exercised on machines without Quartz.
+"""
+
+import threading
+import time
+from typing import Callable, Iterable, Optional, Tuple
+
+Sample = Tuple[float, float, float]
+
+
+class PointerSource:
+    """Base class for pointer sample providers"""
+
+    def sample(self) -> Optional[Sample]:
+        """Return the next (timestamp, x, y) sample, or None when exhausted"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the source"""
+
+
+class QuartzPointerSource(PointerSource):
+    """Reads the live cursor position from Quartz"""
+
+    def __init__(self):
+        import Quartz
+        self._get_location = Quartz.CGEventGetLocation
+        self._create_event = Quartz.CGEventCreate
+
+    def sample(self) -> Optional[Sample]:
+        loc = self._get_location(self._create_event(None))
+        return time.time(), int(loc.x), int(loc.y)
+
+
+class ReplayPointerSource(PointerSource):
+    """Replays recorded or synthetic samples as fast as they are consumed"""
+
+    def __init__(self, samples: Iterable[Sample]):
+        self._samples = iter(samples)
+        self.exhausted = False
+
+    def sample(self) -> Optional[Sample]:
+        try:
+            return next(self._samples)
+        except StopIteration:
+            self.exhausted = True
+            return None
+
+
+class EventPointerSource:
+    """Base class for push-based sources that deliver samples as they happen.
+
+    ``start`` is given a ``push(timestamp, x, y)`` callable which the source
+    invokes from its own thread for every pointer move.
+    """
+
+    def start(self, push: Callable[[float, float, float], None]):
+        raise NotImplementedError
+
+    def stop(self):
+        """Stop delivering samples; no sample is pushed once this returns"""
+
+
+def _join(thread: Optional[threading.Thread]):
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(1.0)
+
+
+class QuartzEventTapSource(EventPointerSource):
+    """Listen-only CGEventTap delivering mouse-moved and drag events"""
+
+    def __init__(self):
+        import Quartz
+        self._quartz = Quartz
+        self._run_loop = None
+        self._thread = None
+
+    def start(self, push: Callable[[float, float, float], None]):
+        Q = self._quartz
+        mask = 0
+        for event_type in (Q.kCGEventMouseMoved, Q.kCGEventLeftMouseDragged,
+                           Q.kCGEventRightMouseDragged, Q.kCGEventOtherMouseDragged):
+            mask |= Q.CGEventMaskBit(event_type)
+
+        def callback(proxy, event_type, event, refcon):
+            if event_type in (Q.kCGEventTapDisabledByTimeout, Q.kCGEventTapDisabledByUserInput):
+                Q.CGEventTapEnable(tap, True)
+                return event
+            loc = Q.CGEventGetLocation(event)
+            push(time.time(), int(loc.x), int(loc.y))
+            return event
+
+        tap = Q.CGEventTapCreate(Q.kCGSessionEventTap, Q.kCGHeadInsertEventTap,
+                                 Q.kCGEventTapOptionListenOnly, mask, callback, None)
+        if tap is None:
+            raise RuntimeError("Could not create mouse event tap (is Input Monitoring allowed?)")
+        run_loop_source = Q.CFMachPortCreateRunLoopSource(None, tap, 0)
+        started = threading.Event()
+
+        def run():
+            self._run_loop = Q.CFRunLoopGetCurrent()
+            Q.CFRunLoopAddSource(self._run_loop, run_loop_source, Q.kCFRunLoopCommonModes)
+            Q.CGEventTapEnable(tap, True)
+            started.set()
+            Q.CFRunLoopRun()
+
+        self._thread = threading.Thread(target=run, name="firecorners-event-tap", daemon=True)
+        self._thread.start()
+        started.wait()
+
+        # Seed the pipeline with the current position so a parked cursor counts
+        loc = Q.CGEventGetLocation(Q.CGEventCreate(None))
+        push(time.time(), int(loc.x), int(loc.y))
+
+    def stop(self):
+        if self._run_loop is not None:
+            self._quartz.CFRunLoopStop(self._run_loop)
+            self._run_loop = None
+        _join(self._thread)
+
+
+class SyntheticEventSource(EventPointerSource):
+    """Pushes scripted samples, either on demand or from a background thread.
+
+    With ``realtime`` set, samples are delivered at their recorded spacing and
+    stamped with the wall clock at delivery; otherwise they are pushed as
+    fast as the pipeline accepts them.
+    """
+
+    def __init__(self, samples: Iterable[Sample] = (), realtime: bool = True):
+        self._samples = list(samples)
+        self.realtime = realtime
+        self._push = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, push: Callable[[float, float, float], None]):
+        self._push = push
+        self._stopped.clear()
+        if self._samples:
+            self._thread = threading.Thread(target=self._play, name="firecorners-synthetic",
+                                            daemon=True)
+            self._thread.start()
+
+    def move(self, x: float, y: float, timestamp: Optional[float] = None):
+        """Push a single sample"""
+        self._push(time.time() if timestamp is None else timestamp, x, y)
+
+    def _play(self):
+        first = self._samples[0][0]
+        origin = time.time()
+        for t, x, y in self._samples:
+            if self._stopped.is_set():
+                return
+            if self.realtime:
+                delay = origin + (t - first) - time.time()
+                if delay > 0 and self._stopped.wait(delay):
+                    return
+                self._push(time.time(), x, y)
+            else:
+                self._push(t, x, y)
+
+    def stop(self):
+        self._stopped.set()
+        _join(self._thread)
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+FireCorners Profiles
+
+Named variants of the config, such as "presenting" or "after hours", kept
+in the same config.json under a "profiles" key. A profile lists only what
+it changes: corners and zones it names replace the config's, and its
+settings are merged over the config's settings.
+
+  "profiles": {
+    "presenting": {"top_left": [], "settings": {"dwell": 1.0}},
+    "after hours": {"bottom_right": {"type": "app", "value": "Music"}}
+  },
+  "profile": "coding",
+  "schedule": [
+    {"profile": "after hours", "start": "18:00", "end": "08:00"},
+    {"profile": "presenting", "days": ["tue", "thu"], "start": "10:00", "end": "11:00"}
+  ]
+
+Every profile is compiled along with the config, into a ConfigSnapshot of
+its own (see snapshot.py and compiler.py), so switching profiles publishes
+an already built snapshot by assigning one reference.
+
+"profile" is the profile in effect when none is picked and no schedule
+entry applies; without it, the config itself. A schedule entry applies
+from its start to its end time, on the given days (every day by default),
+and may run past midnight. The first entry that applies wins. Rather than
+looking at the clock as the cursor moves, the ProfileScheduler sleeps
+until the next start or end time of any entry.
+
+The profile in effect is the one picked last: picking one, from the tray
+menu or with
+
+  firecorners-profile [NAME | --auto]
+
+holds until the next schedule transition. The pick is saved in
+config.profile next to the config, which the daemon watches.
+"""
+
+import datetime
+import logging
+import os
+import sys
+import threading
+from typing import Callable, Collection, Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Keys that belong to the config as a whole, not to a profile
+PROFILE_KEYS = ("profiles", "profile", "schedule")
+# Settings shared by every profile, since they all use one application catalog
+SHARED_SETTINGS = ("application_roots",)
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# Re-check the schedule at least this often, in seconds, in case the clock
+# jumped or the machine slept through a transition
+MAX_TIMER = 900.0
+
+
+class ScheduleEntry(NamedTuple):
+    profile: str
+    start: int  # minutes after midnight
+    end: int  # minutes after midnight; before start if it ends the next day
+    days: Tuple[int, ...] = tuple(range(7))  # weekdays it starts on, Monday is 0
+
+
+def profile_config(config: Mapping, overrides: Mapping) -> Dict:
+    """The config with a profile's overrides applied"""
+    merged = {key: value for key, value in config.items() if key not in PROFILE_KEYS}
+    for key, value in overrides.items():
+        if key in PROFILE_KEYS:
+            continue
+        if key == "settings" and isinstance(value, dict):
+            settings = dict(config.get("settings", {}))
+            settings.update((name, setting) for name, setting in value.items()
+                            if name not in SHARED_SETTINGS)
+            merged["settings"] = settings
+        else:
+            merged[key] = value
+    return merged
+
+
+def profile_overrides(config: Mapping) -> Dict[str, Dict]:
+    """The valid profiles of a config, by name"""
+    profiles = config.get("profiles", {})
+    if not isinstance(profiles, dict):
+        logger.warning("Ignoring profiles: not an object")
+        return {}
+    valid = {}
+    for name, overrides in profiles.items():
+        if not name or not isinstance(overrides, dict):
+            logger.warning("Ignoring invalid profile %r", name)
+            continue
+        valid[name] = overrides
+    return valid
+
+
+def _parse_time(text: str) -> int:
+    hours, minutes = (int(part) for part in str(text).split(":"))
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"invalid time {text!r}")
+    return hours * 60 + minutes
+
+
+def parse_schedule_entry(entry: Mapping, profiles: Collection[str]) -> ScheduleEntry:
+    """Parse one schedule entry; raises ValueError, KeyError or TypeError"""
+    profile = entry["profile"]
+    if profile not in profiles:
+        raise ValueError(f"unknown profile {profile!r}")
+    start, end = _parse_time(entry["start"]), _parse_time(entry["end"])
+    if start == end:
+        raise ValueError("start and end are the same")
+    days = entry.get("days")
+    if days is None:
+        return ScheduleEntry(profile, start, end)
+    if isinstance(days, str):
+        days = [days]
+    try:
+        weekdays = sorted({DAYS.index(day.lower()[:3]) for day in days})
+    except (AttributeError, ValueError):
+        raise ValueError(f"invalid days {days!r}")
+    if not weekdays:
+        raise ValueError("no days")
+    return ScheduleEntry(profile, start, end, tuple(weekdays))
+
+
+def parse_schedule(config: Mapping,
+                   profiles: Optional[Collection[str]] = None) -> Tuple[ScheduleEntry, ...]:
+    """A config's schedule, skipping invalid entries.
+
+    ``profiles`` are the names of the config's valid profiles, if known.
+    """
+    if profiles is None:
+        profiles = profile_overrides(config)
+    entries = []
+    for i, entry in enumerate(config.get("schedule", [])):
+        try:
+            entries.append(parse_schedule_entry(entry, profiles))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Ignoring invalid schedule entry %d: %s", i, e)
+    return tuple(entries)
+
+
+def _midnight(moment: datetime.datetime, days: int = 0) -> datetime.datetime:
+    return datetime.datetime.combine(moment.date() + datetime.timedelta(days),
+                                     datetime.time())
+
+
+def _windows(entry: ScheduleEntry, moment: datetime.datetime, days: range):
+    """(start, end) of the entry's windows starting on the given days around ``moment``"""
+    for offset in days:
+        day = _midnight(moment, offset)
+        if day.weekday() not in entry.days:
+            continue
+        start = day + datetime.timedelta(minutes=entry.start)
+        end = day + datetime.timedelta(minutes=entry.end)
+        if entry.end < entry.start:
+            end += datetime.timedelta(days=1)
+        yield start, end
+
+
+def scheduled_profile(schedule: Sequence[ScheduleEntry],
+                      moment: datetime.datetime) -> Optional[str]:
+    """The profile the schedule picks at ``moment``, or None if no entry applies"""
+    for entry in schedule:
+        for start, end in _windows(entry, moment, range(-1, 1)):
+            if start <= moment < end:
+                return entry.profile
+    return None
+
+
+def next_transition(schedule: Sequence[ScheduleEntry],
+                    moment: datetime.datetime) -> Optional[datetime.datetime]:
+    """The first start or end time of an entry after ``moment``"""
+    times = [time for entry in schedule for window in _windows(entry, moment, range(-1, 8))
+             for time in window if time > moment]
+    return min(times, default=None)
+
+
+def last_transition(schedule: Sequence[ScheduleEntry],
+                    moment: datetime.datetime) -> Optional[datetime.datetime]:
+    """The last start or end time of an entry at or before ``moment``"""
+    times = [time for entry in schedule for window in _windows(entry, moment, range(-8, 1))
+             for time in window if time <= moment]
+    return max(times, default=None)
+
+
+def selection_path(config_path: str) -> str:
+    """Where the profile picked by hand is saved"""
+    return os.path.splitext(os.fspath(config_path))[0] + ".profile"
+
+
+def read_selection(path: str) -> Tuple[Optional[str], float]:
+    """(profile picked by hand, when it was picked), or (None, 0) if none is"""
+    try:
+        with open(path, "rb") as f:
+            name = f.read().decode().strip()
+            picked = os.fstat(f.fileno()).st_mtime
+    except (OSError, UnicodeDecodeError):
+        return None, 0.0
+    return (name, picked) if name else (None, 0.0)
+
+
+def write_selection(path: str, name: Optional[str]):
+    """Pick a profile by hand, or with None go back to the schedule and default"""
+    # Emptied rather than removed, so the daemon's watcher sees the change
+    atomic_write(path, name.encode() + b"\n" if name is not None else b"")
+
+
+def active_profile(profiles: Collection[str], default: Optional[str],
+                   schedule: Sequence[ScheduleEntry], selection: Tuple[Optional[str], float],
+                   now: Optional[datetime.datetime] = None) -> Optional[str]:
+    """The profile in effect: the one picked last, by hand or by the schedule.
+
+    ``default`` is the config's "profile". None means the config itself.
+    """
+    now = now or datetime.datetime.now()
+    picked, picked_at = selection
+    if picked is not None and picked not in profiles:
+        logger.warning("Unknown profile %r picked, ignoring it", picked)
+        picked = None
+    if picked is not None:
+        transition = last_transition(schedule, now)
+        if transition is None or picked_at >= transition.timestamp():
+            return picked
+    profile = scheduled_profile(schedule, now) or default
+    if profile is not None and profile not in profiles:
+        logger.warning("Unknown default profile %r, using the config itself", profile)
+        return None
+    return profile
+
+
+class ProfileScheduler:
+    """Calls ``callback`` at every start and end time of a schedule's entries.
+
+    The callback runs on the scheduler's thread.
+    """
+
+    def __init__(self, callback: Callable[[], None], max_timer: float = MAX_TIMER,
+                 clock: Callable[[], datetime.datetime] = datetime.datetime.now):
+        self.callback = callback
+        self.max_timer = max_timer
+        self.clock = clock
+        self._schedule: Tuple[ScheduleEntry, ...] = ()
+        self._changed = threading.Event()
+        self._thread = None
+        self._stopped = False
+        self.timers = 0
+        self.transitions = 0
+
+    def set_schedule(self, schedule: Sequence[ScheduleEntry]):
+        """Replace the schedule and re-arm the timer"""
+        schedule = tuple(schedule)
+        if schedule != self._schedule:
+            self._schedule = schedule
+            self._changed.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="firecorners-profile-scheduler",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._changed.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+
+    def _run(self):
+        while not self._stopped:
+            self._changed.clear()
+            transition = next_transition(self._schedule, self.clock())
+            timeout = None
+            if transition is not None:
+                seconds = (transition - self.clock()).total_seconds()
+                timeout = min(max(seconds, 0.0), self.max_timer)
+                self.timers += 1
+                logger.debug("Next profile transition at %s", transition)
+            if self._changed.wait(timeout) or self._stopped:
+                continue
+            if transition is None or self.clock() < transition:
+                continue  # woke up early to check the clock
+            self.transitions += 1
+            try:
+                self.callback()
+            except Exception as e:
+                logger.error("Error switching profiles: %s", e, exc_info=True)
+
+    def counters(self) -> Dict[str, int]:
+        return {"timers": self.timers, "transitions": self.transitions}
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="List the profiles of a FireCorners config or switch to one")
+    parser.add_argument("profile", nargs="?", help="Profile to switch to")
+    parser.add_argument("--auto", action="store_true",
+                        help="Go back to the profile the schedule or the config picks")
+    parser.add_argument("--config", default=os.path.expanduser("~/.firecorners/config.json"),
+                        help="Config file (default: ~/.firecorners/config.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Switch the running daemon's profile, or list the profiles"""
+    args = parse_args(argv)
+    from .compiler import read_config
+
+    try:
+        config = read_config(args.config)
+    except ValueError as e:
+        print(f"{args.config}: {e}", file=sys.stderr)
+        return 1
+    profiles = profile_overrides(config)
+    path = selection_path(args.config)
+    if args.profile is not None:
+        if args.profile not in profiles:
+            print(f"{args.config}: no profile {args.profile!r}", file=sys.stderr)
+            return 1
+        write_selection(path, args.profile)
+        return 0
+    if args.auto:
+        write_selection(path, None)
+        return 0
+
+    active = active_profile(profiles, config.get("profile"), parse_schedule(config, profiles),
+                            read_selection(path))
+    for name in profiles:
+        print(f"{'*' if name == active else ' '} {name}")
+    if active is None:
+        print("No profile is active")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
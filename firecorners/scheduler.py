@@ -0,0 +1,81 @@
+"""
+FireCorners Sampling Schedulers
+
+Decide how long the polling pipeline sleeps between pointer samples. The
+fixed scheduler is the daemon's original 100 ms / 50 ms cadence. The
+adaptive scheduler predicts the earliest moment the cursor could reach a
+zone and sleeps until then, so a cursor parked mid-screen is sampled
+rarely while a fast approach to a corner is sampled densely.
+"""
+
+from collections import deque
+
+from .detector import CornerDetector
+
+
+class FixedScheduler:
+    """Constant intervals, shorter while the cursor is inside a zone"""
+
+    def __init__(self, idle_interval: float = 0.1, zone_interval: float = 0.05):
+        self.idle_interval = idle_interval
+        self.zone_interval = zone_interval
+
+    def next_interval(self, timestamp: float, x: int, y: int, detector: CornerDetector) -> float:
+        return self.zone_interval if detector.last_corner else self.idle_interval
+
+
+class AdaptiveScheduler:
+    """Sleeps until the earliest time the cursor could reach a zone.
+
+    Recent samples give the cursor's velocity. Assuming it can accelerate
+    towards the nearest zone at up to ``max_accel`` px/s^2 from its current
+    speed in that direction, the earliest arrival over distance D solves
+    D = v*t + a*t^2/2. That bound is the next interval, clamped to
+    [min_interval, max_interval]. Inside a zone the scheduler samples every
+    ``zone_interval``, or sooner to land on the dwell/cooldown deadline.
+    """
+
+    def __init__(self, min_interval: float = 0.01, max_interval: float = 0.5,
+                 zone_interval: float = 0.05, max_accel: float = 20000.0, history: int = 4):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.zone_interval = zone_interval
+        self.max_accel = max_accel
+        self._history = deque(maxlen=history)
+
+    def velocity(self):
+        """Mean velocity (px/s) over the sample history"""
+        if len(self._history) < 2:
+            return 0.0, 0.0
+        t0, x0, y0 = self._history[0]
+        t1, x1, y1 = self._history[-1]
+        dt = t1 - t0
+        if dt <= 0:
+            return 0.0, 0.0
+        return (x1 - x0) / dt, (y1 - y0) / dt
+
+    def time_to_reach(self, distance: float, speed: float) -> float:
+        """Earliest time to cover ``distance`` starting at ``speed`` towards it"""
+        if distance <= 0:
+            return 0.0
+        speed = max(speed, 0.0)
+        a = self.max_accel
+        return (-speed + (speed * speed + 2 * a * distance) ** 0.5) / a
+
+    def next_interval(self, timestamp: float, x: int, y: int, detector: CornerDetector) -> float:
+        self._history.append((timestamp, x, y))
+        if detector.last_corner:
+            # Wake right at the dwell/cooldown deadline rather than up to an
+            # interval past it
+            until_deadline = detector.next_deadline() - timestamp
+            if until_deadline > 0:
+                return max(self.min_interval, min(self.zone_interval, until_deadline))
+            return self.zone_interval
+
+        distance, zx, zy = detector.table.nearest(x, y)
+        if distance == float("inf"):
+            return self.max_interval
+        vx, vy = self.velocity()
+        speed = (vx * (zx - x) + vy * (zy - y)) / distance if distance else 0.0
+        interval = self.time_to_reach(distance, speed)
+        return min(self.max_interval, max(self.min_interval, interval))
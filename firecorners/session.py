@@ -0,0 +1,141 @@
+"""
+FireCorners Session State
+
+Tells the pipelines when nobody can be using hot corners: the screen is
+locked, the displays are asleep, or there has been no input for a while.
+The polling pipeline backs off while the user is idle and suspends sampling
+entirely while the session is inactive; the event pipeline stops re-arming
+deadlines for a cursor left parked in a corner.
+
+Providers also have an activity event, set when the session becomes active
+again (unlock, display wake), so a suspended pipeline resumes at once
+rather than at its next check.
+"""
+
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class SessionState(NamedTuple):
+    idle_seconds: float = 0.0  # since the last keyboard, mouse or trackpad input
+    locked: bool = False  # screen locked or session switched away from the console
+    display_asleep: bool = False
+
+    @property
+    def active(self) -> bool:
+        return not (self.locked or self.display_asleep)
+
+
+class SessionProvider:
+    """Reports session state; the base class always reports an active session"""
+
+    def __init__(self):
+        self._activity = threading.Event()
+
+    def state(self) -> SessionState:
+        return SessionState()
+
+    def wait_for_activity(self, timeout: float) -> bool:
+        """Sleep up to ``timeout`` seconds; return early (True) on session activity"""
+        woke = self._activity.wait(timeout)
+        self._activity.clear()
+        return woke
+
+    def notify_activity(self):
+        """Wake whoever waits for activity, as unlocking does; safe from any thread"""
+        self._activity.set()
+
+    def stop(self):
+        """Stop listening for session notifications"""
+
+
+class QuartzSessionProvider(SessionProvider):
+    """Session state from Quartz, woken by AppKit unlock and wake notifications.
+
+    Without AppKit the state is still correct, but a suspended pipeline only
+    notices the session coming back at its next check.
+    """
+
+    UNLOCK_NOTIFICATION = "com.apple.screenIsUnlocked"
+    WORKSPACE_NOTIFICATIONS = ("NSWorkspaceScreensDidWakeNotification",
+                               "NSWorkspaceDidWakeNotification",
+                               "NSWorkspaceSessionDidBecomeActiveNotification")
+
+    def __init__(self):
+        super().__init__()
+        import Quartz
+        self._quartz = Quartz
+        self._observers = []
+        try:
+            from AppKit import NSWorkspace
+            from Foundation import NSDistributedNotificationCenter
+        except ImportError:
+            logger.info("AppKit not available, session changes are detected by polling")
+            return
+        workspace = NSWorkspace.sharedWorkspace().notificationCenter()
+        for name in self.WORKSPACE_NOTIFICATIONS:
+            self._observe(workspace, name)
+        self._observe(NSDistributedNotificationCenter.defaultCenter(), self.UNLOCK_NOTIFICATION)
+
+    def _observe(self, center, name: str):
+        token = center.addObserverForName_object_queue_usingBlock_(
+            name, None, None, lambda notification: self.notify_activity())
+        self._observers.append((center, token))
+
+    def state(self) -> SessionState:
+        Quartz = self._quartz
+        idle = Quartz.CGEventSourceSecondsSinceLastEventType(
+            Quartz.kCGEventSourceStateHIDSystemState, Quartz.kCGAnyInputEventType)
+        session = Quartz.CGSessionCopyCurrentDictionary() or {}
+        locked = (bool(session.get("CGSSessionScreenIsLocked", False)) or
+                  not session.get("kCGSSessionOnConsoleKey", True))
+        asleep = bool(Quartz.CGDisplayIsAsleep(Quartz.CGMainDisplayID()))
+        return SessionState(float(idle), locked, asleep)
+
+    def stop(self):
+        for center, token in self._observers:
+            center.removeObserver_(token)
+        self._observers = []
+
+
+class FakeSessionProvider(SessionProvider):
+    """Scripted session state for tests and benchmarks.
+
+    With ``virtual=True`` waiting advances ``now`` instead of sleeping, so
+    hours of suspended operation run in moments.
+    """
+
+    def __init__(self, idle_seconds: float = 0.0, locked: bool = False,
+                 display_asleep: bool = False, virtual: bool = False, start: float = 0.0):
+        super().__init__()
+        self._state = SessionState(idle_seconds, locked, display_asleep)
+        self.virtual = virtual
+        self.now = start
+
+    def clock(self) -> float:
+        return self.now if self.virtual else time.time()
+
+    def state(self) -> SessionState:
+        return self._state
+
+    def set_state(self, idle_seconds: float = None, locked: bool = None,
+                  display_asleep: bool = None):
+        """Change the state; becoming active or seeing input counts as activity"""
+        old = self._state
+        changes = {"idle_seconds": idle_seconds, "locked": locked, "display_asleep": display_asleep}
+        self._state = old._replace(**{k: v for k, v in changes.items() if v is not None})
+        if self._state.active and (not old.active or self._state.idle_seconds < old.idle_seconds):
+            self.notify_activity()
+
+    def wait_for_activity(self, timeout: float) -> bool:
+        if not self.virtual:
+            return super().wait_for_activity(timeout)
+        woke = self._activity.is_set()
+        self._activity.clear()
+        if not woke:
+            self.now += timeout
+        return woke
@@ -6,13 +6,13 @@ A lightweight hot corners daemon that detects when your mouse cursor reaches
 the corners of your screen and triggers configured actions.
 
 Usage:
-  firecorners [--threshold=5] [--cooldown=3.0] [--dwell=0.5] [--no-test]
+  firecorners [--threshold=5] [--cooldown=3.0] [--dwell=0.5] [--no-test] [--record-trace=PATH]
 """
 
 import os
 import sys
 import json
-import time
+import threading
 from pathlib import Path
 from typing import Dict, Optional, Tuple
 
@@ -22,10 +22,34 @@ from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu
 from PyQt6.QtGui import QIcon
 from PyQt6.QtCore import QThread, QTimer, pyqtSignal
 
+from .actions import normalize_actions
+from .catalog import ApplicationCatalog
+from .compiler import config_folder, load_snapshot
+from .detector import CornerDetector
+from .executor import DEFAULT_MAX_CHILDREN, ActionExecutor
+from .geometry import CORNERS, DisplayMonitor, QuartzDisplayMonitor
+from .interpreters import InterpreterPool, applescript_worker, shell_worker
+from .launchers import NativeLauncher
+from .metrics import Metrics
+from .pipeline import EventPipeline, PollingPipeline
+from .plugins import PluginRegistry
+from .pointer import (EventPointerSource, PointerSource, QuartzEventTapSource,
+                      QuartzPointerSource)
+from .profiles import (ProfileScheduler, active_profile, parse_schedule, read_selection,
+                       selection_path, write_selection)
+from .scheduler import AdaptiveScheduler
+from .session import QuartzSessionProvider, SessionProvider
+from .snapshot import DetectionSettings, application_roots, build_snapshot, switch_diff
+from .spawner import SpawnHelper, posix_spawn_popen
+from .store import ConfigStore
+from .tracefile import RecordingEventSource, RecordingPointerSource, TraceWriter
+from .watcher import ConfigWatcher, FolderWatcher
+
 # Constants
 DEFAULT_CORNER_THRESHOLD = 5  # pixels from edge to trigger corner
 DEFAULT_CORNER_COOLDOWN = 1.0  # seconds between triggers
 DEFAULT_DWELL_TIME = 0.0  # seconds mouse must stay in corner before triggering
+DEFAULT_EXIT_HYSTERESIS = 0.0  # seconds outside a corner before leaving it counts
 
 # Lazy imports and setup
 _logging = None
@@ -73,125 +97,285 @@ def get_config_window():
 
 class HotCornersDaemon(QThread):
     config_changed = pyqtSignal()
+    profile_changed = pyqtSignal(str)  # the profile switched to, "" for none
 
-    def __init__(self, config: Dict, threshold: int = 5, cooldown: float = 1.0, dwell: float = 0.0):
+    def __init__(self, config: Optional[Dict] = None, threshold: int = 5, cooldown: float = 1.0, dwell: float = 0.0,
+                 pointer_source: Optional[PointerSource] = None, poll: bool = False,
+                 record_trace: Optional[str] = None, display_monitor: Optional[DisplayMonitor] = None,
+                 session: Optional[SessionProvider] = None,
+                 spawn_helper: Optional[SpawnHelper] = None,
+                 script_folder: Optional[str] = None):
         super().__init__()
-        self.config = config
-        self.threshold = config.get("settings", {}).get("threshold", threshold)
-        self.cooldown = config.get("settings", {}).get("cooldown", cooldown)
-        self.dwell = config.get("settings", {}).get("dwell", dwell)
-        self.last_corner = None
-        self.last_trigger_time = 0
-        self.corner_enter_time = 0
+        # Settings the config may override: the command line's
+        self.defaults = DetectionSettings(threshold, cooldown, dwell, DEFAULT_EXIT_HYSTERESIS)
+        self.pointer_source = pointer_source
+        self.poll = poll
+        self.record_trace = record_trace
+        self.display_monitor = display_monitor
+        self.session = session
+        self.metrics = Metrics()
+        self.interpreters = {"Shell Command": InterpreterPool("shell", shell_worker)}
+        if not getattr(sys, "frozen", False):
+            # The AppleScript driver runs on a Python interpreter, which a
+            # frozen app bundle does not ship separately
+            self.interpreters["AppleScript"] = InterpreterPool("applescript", applescript_worker)
+        self.config_path = get_config_path()
+        self.store = ConfigStore(str(self.config_path))
+        # Generation of the loaded config, if the store wrote it
+        self.config_generation = self.store.generation() if config is None else None
+        self.catalog = None
+        self._new_catalog = None
+        self.plugins = PluginRegistry()
+        # Replaced as a whole on reload; readers take the reference once
+        if config is None:
+            try:
+                self.config_snapshot, _, _ = load_snapshot(
+                    str(self.config_path), None, self.defaults, self._catalog_for, self.plugins)
+            except ValueError as e:
+                setup_logging().error("Invalid config %s: %s", self.config_path, e)
+                config = {}
+        if config is not None:
+            # Relative script paths of a --config file are in its folder
+            self.config_snapshot, _ = build_snapshot(config, None, self.defaults,
+                                                     self._catalog_for(application_roots(config)),
+                                                     self.plugins, script_folder)
+        # The snapshot in effect is the config's or one of its profiles'
+        self._profile_lock = threading.Lock()
+        self.selection_path = selection_path(str(self.config_path))
+        self.schedule = parse_schedule(self.config_snapshot.config, self.config_snapshot.profiles)
+        self.profile = self._pick_profile()
+        self.snapshot = self._profile_snapshot(self.profile)
+        self.profile_switches = 0
+        self.catalog = self._catalog_for(self.config_snapshot.roots)
+        self._new_catalog = None
+        settings = self.config_snapshot.config.get("settings", {})
+        self.executor = ActionExecutor(
+            popen=spawn_helper.popen if spawn_helper else posix_spawn_popen,
+            interpreters=self.interpreters, catalog=self.catalog, plugins=self.plugins,
+            max_children=settings.get("max_children", DEFAULT_MAX_CHILDREN),
+            launcher=NativeLauncher.create() if settings.get("native_launch", True) else None)
+        self.executor.set_limits(*self.snapshot.limits)
+        self.metrics.register("actions", self.executor.counters)
+        self.metrics.register_gauges("actions", self.executor.gauges)
+        for pool in self.interpreters.values():
+            self.metrics.register(f"interpreters.{pool.name}", pool.counters)
+        self.metrics.register("catalog", self.catalog.counters)
+        self.metrics.register("plugins", self.plugins.counters)
+        self.metrics.register_gauges("plugins", self.plugins.gauges)
+        self.detector = None
+        self.pipeline = None
         self.running = True
-        self.logger = None
+        # Before run(): profile switches and config reloads can come first
+        self.logger = setup_logging()
 
-        # Set up config file watcher
-        self.config_path = get_config_path()
-        self.config_mtime = os.path.getmtime(self.config_path) if os.path.exists(self.config_path) else 0
-        
-        # Start config watcher timer with reduced frequency
-        self.config_timer = QTimer()
-        self.config_timer.timeout.connect(self.check_config)
-        self.config_timer.start(5000)  # Check every 5 seconds instead of every second
+        # Reload the config as soon as it is saved; started in run()
+        # The watcher needs the folder to exist to get notifications for it
+        self.config_path.parent.mkdir(parents=True, exist_ok=True)
+        self.config_watcher = ConfigWatcher(self.config_path, self.check_config)
+        self.metrics.register("config", self.config_watcher.counters)
+        # Rescan the application folders when their entries change
+        self.catalog_watcher = FolderWatcher(self.catalog.folders(), self.refresh_catalog)
+        self.metrics.register("catalog_watcher", self.catalog_watcher.counters)
+        # Switch profiles when one is picked from the command line or a
+        # schedule transition comes; both started in run()
+        self.selection_watcher = ConfigWatcher(self.selection_path, self.update_profile)
+        self.profile_scheduler = ProfileScheduler(self.update_profile)
+        self.profile_scheduler.set_schedule(self.schedule)
+        self.metrics.register("profiles", self.profile_counters)
+
+        self.metrics_timer = QTimer()
+        self.metrics_timer.timeout.connect(self.write_metrics)
+        self.metrics_timer.start(60000)
         
     def check_config(self):
-        """Check if config file has been modified"""
+        """Reload the config file; called on the watcher thread when it changed"""
         if os.path.exists(self.config_path):
             try:
-                mtime = os.path.getmtime(self.config_path)
-                if mtime > self.config_mtime:
-                    self.logger.info("Config file changed, reloading...")
-                    self.config_mtime = mtime
-                    self.config = load_config()
-                    # Update settings when config changes
-                    self.threshold = self.config.get("settings", {}).get("threshold", self.threshold)
-                    self.cooldown = self.config.get("settings", {}).get("cooldown", self.cooldown)
-                    self.dwell = self.config.get("settings", {}).get("dwell", self.dwell)
-                    self.config_changed.emit()
-            except Exception:
-                pass  # Ignore errors during config check
+                generation = self.store.generation()
+                if generation is not None and generation == self.config_generation:
+                    self.logger.debug("Config generation %d is already loaded", generation)
+                    return
+                self.logger.info("Config file changed, reloading...")
+                self.apply_config()
+                self.config_generation = generation
+            except Exception as e:
+                self.logger.error("Error reloading config: %s", e)
+
+    def refresh_catalog(self):
+        """Rescan the application folders that changed; called on the catalog watcher's thread"""
+        catalog = self.catalog
+        if catalog.refresh():
+            self.logger.info("Applications changed, %d names indexed",
+                             len(catalog.applications()))
+            self.catalog_watcher.set_folders(catalog.folders())
+
+    def _catalog_for(self, roots):
+        """The application catalog for a config's roots: the current one unless they changed"""
+        expanded = [os.path.expanduser(root) for root in roots]
+        for catalog in (self.catalog, self._new_catalog):
+            if catalog is not None and catalog.roots == expanded:
+                return catalog
+        self._new_catalog = ApplicationCatalog(roots)
+        return self._new_catalog
+
+    def apply_config(self):
+        """Load the config file's snapshot, from its artifact if fresh, and switch to it"""
+        with self._profile_lock:
+            config_snapshot, diff, fresh = load_snapshot(str(self.config_path),
+                                                         self.config_snapshot, self.defaults,
+                                                         self._catalog_for, self.plugins)
+            self.logger.info("Config reloaded from %s: %d of %d corners and zones compiled, "
+                             "changed: %s", "artifact" if fresh else "JSON", diff.compiled,
+                             len(config_snapshot.sources), ", ".join(diff.changed) or "none")
+            catalog = self._catalog_for(config_snapshot.roots)
+            self._new_catalog = None
+            if catalog is not self.catalog:
+                self.catalog = self.executor.catalog = catalog
+                self.metrics.register("catalog", catalog.counters)
+                self.catalog_watcher.set_folders(catalog.folders())
+            self.config_snapshot = config_snapshot
+            self.schedule = parse_schedule(config_snapshot.config, config_snapshot.profiles)
+            self.profile_scheduler.set_schedule(self.schedule)
+            self._activate(self._pick_profile())
+        self.config_changed.emit()
+
+    def update_profile(self):
+        """Switch to the profile that should be in effect; called when that may have changed"""
+        with self._profile_lock:
+            profile = self._pick_profile()
+            if profile != self.profile:
+                self._activate(profile)
+
+    def select_profile(self, name: Optional[str]):
+        """Pick a profile by hand, or with None go back to the scheduled or default one"""
+        write_selection(self.selection_path, name)
+        self.update_profile()
+
+    def _pick_profile(self) -> Optional[str]:
+        config_snapshot = self.config_snapshot
+        return active_profile(config_snapshot.profiles, config_snapshot.config.get("profile"),
+                              self.schedule, read_selection(self.selection_path))
+
+    def _profile_snapshot(self, profile: Optional[str]):
+        if profile is None:
+            return self.config_snapshot
+        return self.config_snapshot.profiles.get(profile, self.config_snapshot)
+
+    def _activate(self, profile: Optional[str]):
+        """Publish the snapshot of a profile, already compiled, or of the config for None"""
+        snapshot = self._profile_snapshot(profile)
+        diff = switch_diff(self.snapshot, snapshot)
+        if diff.limits:
+            self.executor.set_limits(*snapshot.limits)
+        if self.detector and diff.detection:
+            self.detector.configure(snapshot.detection, rebuild=diff.geometry)
+        self.snapshot = snapshot
+        if profile != self.profile:
+            self.profile = profile
+            self.profile_switches += 1
+            self.logger.info("Switched to profile %s", profile or "(none)")
+            self.profile_changed.emit(profile or "")
+
+    def profile_counters(self):
+        return {"switches": self.profile_switches, **self.profile_scheduler.counters()}
+
+    def write_metrics(self):
+        """Write the counters to ~/.firecorners/metrics.json and action output to output.json"""
+        if not self.pipeline:
+            return
+        try:
+            snapshot = self.metrics.write(str(get_config_path().parent / "metrics.json"))
+            self.logger.debug("Pipeline wakeups: %.0f/hour",
+                              snapshot["recent_per_hour"].get("pipeline.wakeups", 0))
+            self.executor.outputs.write(str(get_config_path().parent / "output.json"))
+        except Exception as e:
+            self.logger.error("Error writing metrics: %s", e)
                 
     def run(self):
-        self.logger = setup_logging()
-        self.logger.info("HotCornersDaemon initialized with config: %s", self.config)
+        self.logger.info("HotCornersDaemon initialized with config: %s, profile: %s",
+                         self.config_snapshot.config, self.profile or "(none)")
+        self.config_watcher.start()
+        self.selection_watcher.start()
+        self.catalog_watcher.start()
+        self.profile_scheduler.start()
+        for pool in self.interpreters.values():
+            threading.Thread(target=pool.start, daemon=True).start()
         
-        screen_width, screen_height = get_screen_dimensions()
-        self.logger.info("Screen dimensions: %dx%d", screen_width, screen_height)
+        if self.display_monitor is None:
+            self.display_monitor = QuartzDisplayMonitor()
+        displays = self.display_monitor.displays()
+        for display in displays:
+            self.logger.info("Display %d: %dx%d at (%d, %d)", display.display_id,
+                             display.width, display.height, display.x, display.y)
         
-        while self.running:
+        detection = self.snapshot.detection
+        self.detector = CornerDetector(displays, detection.threshold, detection.cooldown,
+                                       detection.dwell, detection.zones, detection.hysteresis)
+        self.display_monitor.add_listener(self.detector.set_displays)
+        if self.session is None:
+            self.session = QuartzSessionProvider()
+        if self.pointer_source is None:
+            self.pointer_source = QuartzPointerSource() if self.poll else QuartzEventTapSource()
+        if not self.running:
+            return
+        if self.record_trace:
+            writer = TraceWriter(self.record_trace, displays)
+            self.display_monitor.add_listener(writer.set_displays)
+            self.logger.info("Recording pointer trace to %s", self.record_trace)
+            if isinstance(self.pointer_source, EventPointerSource):
+                self.pointer_source = RecordingEventSource(self.pointer_source, writer)
+            else:
+                self.pointer_source = RecordingPointerSource(self.pointer_source, writer)
+        
+        if isinstance(self.pointer_source, EventPointerSource):
+            self.pipeline = EventPipeline(self.detector, self._on_trigger, session=self.session)
+            self.metrics.register("pipeline", self.pipeline.counters)
             try:
-                # Get current mouse position
-                mouse_loc = Quartz.CGEventGetLocation(Quartz.CGEventCreate(None))
-                x, y = int(mouse_loc.x), int(mouse_loc.y)
-                
-                # Check if we're in a corner
-                corner = None
-                if x <= self.threshold:
-                    if y <= self.threshold:
-                        corner = "top_left"
-                    elif y >= screen_height - self.threshold:
-                        corner = "bottom_left"
-                elif x >= screen_width - self.threshold:
-                    if y <= self.threshold:
-                        corner = "top_right"
-                    elif y >= screen_height - self.threshold:
-                        corner = "bottom_right"
-                
-                # Handle corner detection
-                current_time = time.time()
-                if corner:
-                    if corner != self.last_corner:
-                        self.corner_enter_time = current_time
-                        self.last_corner = corner
-                        self.logger.debug("Entered new corner: %s", corner)
-                    elif (current_time - self.last_trigger_time >= self.cooldown and
-                          current_time - self.corner_enter_time >= self.dwell):
-                        self.logger.info("Triggering actions for corner: %s", corner)
-                        self._trigger_corner_actions(corner)
-                        self.last_trigger_time = current_time
-                else:
-                    self.last_corner = None
-                
-                # Adaptive sleep based on corner state
-                time.sleep(0.05 if corner else 0.1)
-                
-            except Exception as e:
-                self.logger.error("Error in mouse monitoring: %s", e, exc_info=True)
-                time.sleep(1)
+                self.logger.info("Using event-driven pointer source")
+                self.pipeline.run(self.pointer_source)
+                return
+            except RuntimeError as e:
+                self.logger.warning("%s; falling back to polling", e)
+                self.pointer_source = QuartzPointerSource()
+                if self.record_trace:
+                    self.pointer_source = RecordingPointerSource(self.pointer_source, writer)
+        
+        self.pipeline = PollingPipeline(self.detector, self._on_trigger, AdaptiveScheduler(),
+                                        session=self.session)
+        self.metrics.register("pipeline", self.pipeline.counters)
+        try:
+            self.pipeline.run(self.pointer_source)
+        finally:
+            self.pointer_source.close()
+    
+    def _on_trigger(self, corner: str, timestamp: float):
+        self.logger.info("Triggering actions for corner: %s", corner)
+        self._trigger_corner_actions(corner)
     
     def stop(self):
         self.logger.info("Stopping daemon...")
         self.running = False
-        self.config_timer.stop()
+        if self.pipeline:
+            self.pipeline.stop()
+        if self.display_monitor:
+            self.display_monitor.stop()
+        if self.session:
+            self.session.stop()
+        self.executor.shutdown()
+        self.config_watcher.stop()
+        self.selection_watcher.stop()
+        self.catalog_watcher.stop()
+        self.profile_scheduler.stop()
+        self.metrics_timer.stop()
+        self.write_metrics()
     
     def _trigger_corner_actions(self, corner: str):
-        actions = self.config.get(corner, [])
-        if not actions:
+        plans = self.snapshot.plans.get(corner)
+        if not plans:
             return
-            
-        subprocess = get_subprocess()
-        for action in actions:
-            action_type = action.get("type")
-            value = action.get("value")
-            
-            if not action_type or not value:
-                self.logger.warning("Invalid action in corner %s: %s", corner, action)
-                continue
-                
-            try:
-                self.logger.info("Executing %s action: %s", action_type, value)
-                if action_type == "URL":
-                    subprocess.run(["open", value])
-                elif action_type == "Application":
-                    subprocess.run(["open", "-a", value])
-                elif action_type == "Shell Command":
-                    subprocess.run(value, shell=True)
-                elif action_type == "AppleScript":
-                    subprocess.run(["osascript", "-e", value])
-                self.logger.info("Action executed successfully")
-            except Exception as e:
-                self.logger.error("Error executing %s action: %s", action_type, e, exc_info=True)
+
+        # Returns at once; the executor's workers launch and time the actions
+        self.executor.submit(corner, plans)
 
 def get_config_path():
     """Get the path to the config file"""
@@ -211,10 +395,14 @@ def parse_args():
     parser.add_argument("--dwell", type=float, default=0.0, help="Time to dwell in corner before triggering")
     parser.add_argument("--config", type=str, help="Path to configuration file")
     parser.add_argument("--no-test", action="store_true", help="Skip testing actions on startup")
+    parser.add_argument("--poll", action="store_true",
+                        help="Poll the cursor position instead of listening for mouse events")
+    parser.add_argument("--record-trace", type=str, metavar="PATH",
+                        help="Record every pointer sample to a binary trace file")
     return parser.parse_args()
 
 def get_screen_dimensions() -> Tuple[int, int]:
-    """Get the main screen dimensions"""
+    """Get the main screen dimensions (see geometry.quartz_displays for all displays)"""
     main_monitor = Quartz.CGDisplayBounds(Quartz.CGMainDisplayID())
     return int(main_monitor.size.width), int(main_monitor.size.height)
 
@@ -227,26 +415,32 @@ def load_config(config_path: Optional[str] = None) -> Dict:
         try:
             with open(config_path, 'r') as f:
                 return json.load(f)
-        except json.JSONDecodeError:
+        except json.JSONDecodeError as e:
+            setup_logging().error("Invalid config %s: %s", config_path, e)
             return {}
     return {}
 
-def test_actions(config: Dict):
-    """Test that all configured actions are valid"""
-    for corner, actions in config.items():
-        if not isinstance(actions, list) or not actions:
+def test_actions(config: Dict, base: Optional[str] = None):
+    """Log every configured action; invalid ones are logged as warnings
+
+    ``base`` is the config file's folder, for relative script paths.
+    """
+    logging = setup_logging()
+    for corner in CORNERS:
+        actions = config.get(corner)
+        if not actions:
             continue
         logging.info("Testing actions for %s...", corner)
-        for action in actions:
-            action_type = action.get("type")
-            value = action.get("value")
-            if not action_type or not value:
-                logging.warning("Invalid action in %s", corner)
-                continue
-            logging.info("  %s: %s", action_type, value)
-
-def main():
-    """Main function"""
+        for action in normalize_actions(actions, corner, base):
+            logging.info("  %s: %s", action["type"], action["value"])
+
+def main(spawn_helper: Optional[SpawnHelper] = None):
+    """Main function
+
+    ``spawn_helper`` is forked by the entry point in ``__main__`` before this
+    module loads Quartz and PyQt6; without one, actions are launched with
+    posix_spawn.
+    """
     # Parse command line arguments
     args = parse_args()
     
@@ -273,6 +467,7 @@ def main():
     # Create tray menu
     menu = QMenu()
     configure_action = menu.addAction("Configure")
+    profile_menu = menu.addMenu("Profile")
     menu.addSeparator()
     quit_action = menu.addAction("Quit")
     
@@ -280,15 +475,23 @@ def main():
     tray_icon.setContextMenu(menu)
     tray_icon.show()
     
-    # Load configuration
-    config = load_config(args.config if args.config else None)
+    # Without --config the daemon loads ~/.firecorners/config.json itself,
+    # from its compiled artifact when that is fresh
+    config = load_config(args.config) if args.config else None
+    script_folder = config_folder(args.config or str(get_config_path()))
+    if not args.no_test:
+        test_actions(config if config is not None else load_config(), script_folder)
     
     # Create and start the daemon thread
     daemon = HotCornersDaemon(
         config,
         threshold=args.threshold,
         cooldown=args.cooldown,
-        dwell=args.dwell
+        dwell=args.dwell,
+        poll=args.poll,
+        record_trace=args.record_trace,
+        spawn_helper=spawn_helper,
+        script_folder=script_folder
     )
     daemon.start()
     
@@ -300,9 +503,26 @@ def main():
     
     def quit_app():
         daemon.stop()
+        if spawn_helper is not None:
+            spawn_helper.close()
         app.quit()
     
+    def update_profile_menu():
+        profile_menu.clear()
+        automatic = profile_menu.addAction("Automatic")
+        automatic.triggered.connect(lambda: daemon.select_profile(None))
+        profile_menu.addSeparator()
+        for name in daemon.config_snapshot.profiles:
+            action = profile_menu.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(name == daemon.profile)
+            action.triggered.connect(lambda checked, name=name: daemon.select_profile(name))
+        profile_menu.menuAction().setVisible(bool(daemon.config_snapshot.profiles))
+    
     configure_action.triggered.connect(show_config)
+    daemon.config_changed.connect(update_profile_menu)
+    daemon.profile_changed.connect(update_profile_menu)
+    update_profile_menu()
     quit_action.triggered.connect(quit_app)
     
     # Launch configuration UI if requested
@@ -0,0 +1,249 @@
+"""
+FireCorners Config Snapshots
+
+Everything the daemon derives from a config, built in one go: detection
+settings, zones, the compiled launch plans of every corner and zone,
+application roots and action limits. A ConfigSnapshot is never modified
+once built. A reload builds the next one on the watcher thread and
+publishes it by assigning a single reference, so the detection and trigger
+paths see either the old config or the new one, never a mix of the two.
+
+Building the next snapshot starts from the current one: a corner or zone
+whose actions are the same as before keeps its compiled plans, so a reload
+compiles only what changed. Actions are compared as parsed rather than
+hashed, so an unchanged entry costs one comparison in C, and none for the
+objects a profile shares with its config. The SnapshotDiff returned alongside says what
+did change, so the daemon rebuilds the zone table only when the threshold
+or a zone's shape changed, and resets limits or the application catalog
+only when those settings did.
+
+The profiles of a config (see profiles.py) are built with it, each into a
+snapshot of its own, starting from the same profile in the current
+snapshot or else from the config's: a profile compiles only the corners
+and zones it changes. Snapshots with equal detection settings share one
+DetectionSettings, so switching between profiles tells whether detection
+changed by comparing references (see switch_diff), however many zones
+there are.
+"""
+
+import logging
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+
+from .actions import LaunchPlan, compile_actions, scripts_unchanged
+from .catalog import DEFAULT_ROOTS
+from .executor import DEFAULT_BURST, DEFAULT_RATE
+from .geometry import CORNERS
+from .profiles import profile_config, profile_overrides
+from .zones import ZoneSpec, parse_zones
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionSettings(NamedTuple):
+    threshold: int = 5
+    cooldown: float = 1.0
+    dwell: float = 0.0
+    hysteresis: float = 0.0
+    zones: Tuple[ZoneSpec, ...] = ()
+
+
+class ConfigSnapshot(NamedTuple):
+    config: Mapping  # the config it was built from; treat as read-only
+    detection: DetectionSettings
+    plans: Mapping[str, Tuple[LaunchPlan, ...]]  # corner or zone -> plans
+    sources: Mapping[str, object]  # corner or zone -> its actions as configured
+    roots: Tuple[str, ...]  # application catalog roots
+    limits: Tuple  # (single_flight, rate, burst) for the executor
+    generation: int = 0
+    profiles: Mapping[str, "ConfigSnapshot"] = MappingProxyType({})  # name -> its snapshot
+    # corner or zone -> (path, existed) of the relative script paths its plans depend on
+    scripts: Mapping[str, Tuple[Tuple[str, bool], ...]] = MappingProxyType({})
+
+
+class SnapshotDiff(NamedTuple):
+    detection: bool  # a detection setting or a zone's shape changed
+    geometry: bool  # the threshold or a zone's shape changed
+    roots: bool
+    limits: bool
+    changed: Tuple[str, ...]  # corners and zones whose actions were added, changed or removed
+    compiled: int  # corners and zones compiled for this snapshot and its profiles
+
+
+def application_roots(config: Mapping) -> Tuple[str, ...]:
+    """Folders the application catalog indexes: the defaults plus "application_roots" """
+    extra = config.get("settings", {}).get("application_roots", [])
+    return tuple(DEFAULT_ROOTS) + tuple(root for root in extra if root not in DEFAULT_ROOTS)
+
+
+def action_limits(config: Mapping) -> Tuple:
+    """(single_flight, rate, burst) for the executor from the config's settings"""
+    settings = config.get("settings", {})
+    single_flight = settings.get("single_flight", "action")
+    if single_flight in (False, "off", None):
+        single_flight = None
+    elif single_flight not in ("action", "corner"):
+        logger.warning("Unknown single_flight setting %r, using \"action\"", single_flight)
+        single_flight = "action"
+    limit = settings.get("rate_limit", {})
+    if limit is None:
+        return single_flight, None, DEFAULT_BURST
+    try:
+        return (single_flight, float(limit.get("rate", DEFAULT_RATE)),
+                float(limit.get("burst", DEFAULT_BURST)))
+    except (AttributeError, TypeError, ValueError):
+        logger.warning("Invalid rate_limit setting %r, using the defaults", limit)
+        return single_flight, DEFAULT_RATE, DEFAULT_BURST
+
+
+def detection_settings(config: Mapping, defaults: DetectionSettings,
+                       zones: Optional[Tuple[ZoneSpec, ...]] = None) -> DetectionSettings:
+    """Detection settings of a config, with ``defaults`` for the ones it leaves out.
+
+    ``zones`` are the config's zones if they have been parsed already.
+    """
+    settings = config.get("settings", {})
+    return DetectionSettings(
+        settings.get("threshold", defaults.threshold),
+        settings.get("cooldown", defaults.cooldown),
+        settings.get("dwell", defaults.dwell),
+        settings.get("hysteresis", defaults.hysteresis),
+        tuple(parse_zones(config)) if zones is None else zones,
+    )
+
+
+def _shape(zones: Tuple[ZoneSpec, ...]) -> Tuple[tuple, ...]:
+    return tuple(zone[:-1] for zone in zones)  # every field but actions, the last
+
+
+def build_snapshot(config: Dict, previous: Optional[ConfigSnapshot] = None,
+                   defaults: DetectionSettings = DetectionSettings(), catalog=None,
+                   plugins=None, base: Optional[str] = None
+                   ) -> Tuple[ConfigSnapshot, SnapshotDiff]:
+    """The snapshot of ``config``, reusing what it shares with ``previous``.
+
+    Pass no ``previous`` after replacing the catalog, since plans compiled
+    against the old one may resolve applications differently. ``base`` is
+    the config file's folder, where relative script paths are looked up.
+    """
+    snapshot, compiled = _build(config, previous, defaults, catalog, plugins, base)
+    profiles = {}
+    for name, overrides in profile_overrides(config).items():
+        start = previous.profiles.get(name, snapshot) if previous is not None else snapshot
+        profile, profile_compiled = _build(profile_config(config, overrides), start,
+                                           defaults, catalog, plugins, base)
+        profiles[name] = profile._replace(
+            detection=shared_detection(profile.detection, snapshot.detection),
+            generation=snapshot.generation)
+        compiled += profile_compiled
+    snapshot = snapshot._replace(profiles=MappingProxyType(profiles))
+    return snapshot, diff_snapshots(previous, snapshot, compiled)
+
+
+def _build(config: Dict, previous: Optional[ConfigSnapshot], defaults: DetectionSettings,
+           catalog, plugins, base: Optional[str]) -> Tuple[ConfigSnapshot, int]:
+    detection = detection_settings(config, defaults)
+    roots = application_roots(config)
+    limits = action_limits(config)
+
+    # A zone's actions take precedence over a corner of the same name
+    actions = {corner: config.get(corner) for corner in CORNERS if config.get(corner)}
+    actions.update((zone.name, list(zone.actions)) for zone in detection.zones)
+
+    old_sources = previous.sources if previous is not None else {}
+    old_plans = previous.plans if previous is not None else {}
+    old_scripts = previous.scripts if previous is not None else {}
+    sources = {}
+    plans = {}
+    scripts = {}
+    compiled = 0
+    for name, entry in actions.items():
+        source = sources[name] = entry
+        if (old_sources.get(name) == source and name in old_plans
+                and scripts_unchanged(old_scripts.get(name, ()))):
+            plans[name] = old_plans[name]
+            if name in old_scripts:
+                scripts[name] = old_scripts[name]
+            continue
+        compiled += 1
+        checked = {}
+        name_plans = compile_actions(entry, name, catalog, plugins, base, checked)
+        if name_plans:
+            plans[name] = name_plans
+        if checked:
+            scripts[name] = tuple(sorted(checked.items()))
+
+    if previous is not None:
+        detection = shared_detection(detection, previous.detection)
+    snapshot = ConfigSnapshot(
+        config=config,
+        detection=detection,
+        plans=MappingProxyType(plans),
+        sources=MappingProxyType(sources),
+        roots=roots,
+        limits=limits,
+        generation=previous.generation + 1 if previous is not None else 0,
+        scripts=MappingProxyType(scripts),
+    )
+    return snapshot, compiled
+
+
+def shared_detection(detection: DetectionSettings,
+                     other: DetectionSettings) -> DetectionSettings:
+    """``detection``, using ``other`` or its zones instead where they are equal"""
+    if detection == other:
+        return other
+    if detection.zones == other.zones:
+        return detection._replace(zones=other.zones)
+    return detection
+
+
+def switch_diff(previous: ConfigSnapshot, snapshot: ConfigSnapshot) -> SnapshotDiff:
+    """What switching between two snapshots of one config changes, but for actions.
+
+    Costs a few reference comparisons unless detection changed.
+    """
+    if snapshot.detection is previous.detection:
+        detection = geometry = False
+    else:
+        old = previous.detection
+        new = snapshot.detection
+        geometry = new.threshold != old.threshold or (
+            new.zones is not old.zones and _shape(new.zones) != _shape(old.zones))
+        detection = True
+    return SnapshotDiff(detection, geometry, snapshot.roots != previous.roots,
+                        snapshot.limits != previous.limits, (), 0)
+
+
+def renumber(snapshot: ConfigSnapshot, generation: int) -> ConfigSnapshot:
+    """``snapshot`` and its profiles with another generation"""
+    profiles = {name: profile._replace(generation=generation)
+                for name, profile in snapshot.profiles.items()}
+    return snapshot._replace(generation=generation, profiles=MappingProxyType(profiles))
+
+
+def diff_snapshots(previous: Optional[ConfigSnapshot], snapshot: ConfigSnapshot,
+                   compiled: int = 0) -> SnapshotDiff:
+    """What changed from ``previous`` to ``snapshot``; everything if there is no previous"""
+    old_sources = previous.sources if previous is not None else {}
+    old_plans = previous.plans if previous is not None else {}
+    sources = snapshot.sources
+    plans = snapshot.plans
+    # Plans also change with the script files their relative paths name
+    changed = tuple(sorted(name for name in set(sources) | set(old_sources)
+                           if sources.get(name) != old_sources.get(name)
+                           or plans.get(name) != old_plans.get(name)))
+    if previous is None:
+        return SnapshotDiff(True, True, True, True, changed, compiled)
+    old = previous.detection
+    detection = snapshot.detection
+    geometry = (detection.threshold != old.threshold
+                or _shape(detection.zones) != _shape(old.zones))
+    return SnapshotDiff(
+        detection=geometry or detection[1:4] != old[1:4],
+        geometry=geometry,
+        roots=snapshot.roots != previous.roots,
+        limits=snapshot.limits != previous.limits,
+        changed=changed,
+        compiled=compiled,
+    )
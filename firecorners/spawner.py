@@ -0,0 +1,420 @@
+"""
+FireCorners Process Spawning
+
+Launching an action makes a child of the daemon, a process carrying PyQt6,
+pyobjc and the logging stack. A plain fork() duplicates that whole address
+space (copy-on-write, but its page tables are copied and the child holds
+every mapping until exec) for a command that replaces it right away. Two
+cheaper launch paths:
+
+- posix_spawn, which starts the command without duplicating the daemon.
+- A spawn helper in the style of multiprocessing's forkserver: a process
+  forked by the entry point, before Quartz and PyQt6 are imported.
+  The daemon sends it argv and environment over a socket; it launches the
+  command and reports the pid and, later, the exit status.
+
+Both take the arguments the executor passes to subprocess.Popen and return
+handles with the same pid, poll() and wait(timeout) interface. With
+stdout=PIPE (and optionally stderr=STDOUT) the handle's ``stdout`` is the
+read end of a pipe; the helper receives the write end over its socket.
+"""
+
+import array
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+START_TIMEOUT = 5.0  # seconds to wait for the helper to report a pid
+
+# Python ignores SIGPIPE and SIGXFSZ, and the helper SIGINT; an ignored
+# signal survives exec, so children get the defaults back, as with Popen
+DEFAULT_SIGNALS = tuple(getattr(signal, name) for name in ("SIGPIPE", "SIGXFSZ", "SIGINT")
+                        if hasattr(signal, name))
+
+
+def _exit_code(status: int) -> int:
+    """Popen-style returncode from a waitpid status"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def maxrss_kib(who: int) -> int:
+    """Peak RSS from getrusage in KiB (macOS reports bytes, Linux KiB)"""
+    import resource
+    maxrss = resource.getrusage(who).ru_maxrss
+    return maxrss // 1024 if sys.platform == "darwin" else maxrss
+
+
+def _argv(args, shell: bool) -> List[str]:
+    return ["/bin/sh", "-c", args] if shell else list(args)
+
+
+def _output_actions(fd: int, stderr) -> list:
+    """posix_spawn file actions that point stdout, and maybe stderr, at ``fd``"""
+    actions = [(os.POSIX_SPAWN_DUP2, fd, 1)]
+    if stderr == subprocess.STDOUT:
+        actions.append((os.POSIX_SPAWN_DUP2, fd, 2))
+    return actions
+
+
+def _supported(stdout, stderr) -> bool:
+    return stdout in (None, subprocess.PIPE) and (
+        stderr is None or (stderr == subprocess.STDOUT and stdout == subprocess.PIPE))
+
+
+class SpawnedProcess:
+    """Handle for a child started with posix_spawn"""
+
+    def __init__(self, pid: int, args: List[str], stdout=None):
+        self.pid = pid
+        self.args = args
+        self.stdout = stdout
+        self.returncode = None
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None:
+            try:
+                pid, status = os.waitpid(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                self.returncode = 0  # reaped elsewhere; the status is lost
+                return self.returncode
+            if pid:
+                self.returncode = _exit_code(status)
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.0005
+        while self.poll() is None:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.args, timeout)
+                delay = min(delay, remaining)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        return self.returncode
+
+
+def posix_spawn_popen(args, shell: bool = False, stdin=None, stdout=None, stderr=None,
+                      start_new_session: bool = False, env: Optional[Dict[str, str]] = None):
+    """Launch with posix_spawn; falls back to subprocess.Popen where it is missing"""
+    if not hasattr(os, "posix_spawnp") or not _supported(stdout, stderr):
+        return subprocess.Popen(args, shell=shell, stdin=stdin, stdout=stdout, stderr=stderr,
+                                start_new_session=start_new_session, env=env)
+    argv = _argv(args, shell)
+    file_actions = []
+    if stdin == subprocess.DEVNULL:
+        file_actions.append((os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0))
+    read_fd = write_fd = None
+    if stdout == subprocess.PIPE:
+        # Both ends are close-on-exec; only the dup2 copies reach the child
+        read_fd, write_fd = os.pipe()
+        file_actions.extend(_output_actions(write_fd, stderr))
+    try:
+        pid = os.posix_spawnp(argv[0], argv, os.environ if env is None else env,
+                              file_actions=file_actions, setsid=start_new_session,
+                              setsigdef=DEFAULT_SIGNALS)
+    except BaseException:
+        if read_fd is not None:
+            os.close(read_fd)
+        raise
+    finally:
+        if write_fd is not None:
+            os.close(write_fd)
+    return SpawnedProcess(pid, argv, None if read_fd is None else os.fdopen(read_fd, "rb", 0))
+
+
+class HelperProcess:
+    """Handle for a child started by the spawn helper"""
+
+    def __init__(self, args: List[str], stdout=None):
+        self.pid = None
+        self.args = args
+        self.stdout = stdout
+        self.returncode = None
+        self.error = None
+        self._started = threading.Event()
+        self._exited = threading.Event()
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if not self._exited.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+
+class SpawnHelper:
+    """Client side of the spawn helper; use start_spawn_helper() to create one"""
+
+    def __init__(self, sock: socket.socket, pid: int):
+        self.pid = pid
+        self._sock = sock
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._pending: Dict[int, HelperProcess] = {}
+        self._running: Dict[int, HelperProcess] = {}
+        self._abandoned: Dict[int, bool] = {}  # request id -> setsid, given up on
+        self._stats: Dict[int, list] = {}
+        self.alive = True
+        self._closing = False
+        self._reader = threading.Thread(target=self._read, name="firecorners-spawn-helper",
+                                        daemon=True)
+        self._reader.start()
+
+    def popen(self, args, shell: bool = False, stdin=None, stdout=None, stderr=None,
+              start_new_session: bool = False, env: Optional[Dict[str, str]] = None):
+        """Launch through the helper, or with posix_spawn if the helper is gone"""
+        if not self.alive or not _supported(stdout, stderr):
+            return posix_spawn_popen(args, shell=shell, stdin=stdin, stdout=stdout,
+                                     stderr=stderr, start_new_session=start_new_session, env=env)
+        request = {"op": "spawn", "argv": _argv(args, shell), "setsid": start_new_session,
+                   "devnull": stdin == subprocess.DEVNULL}
+        fds = []
+        read_fd = None
+        if stdout == subprocess.PIPE:
+            read_fd, write_fd = os.pipe()
+            fds.append(write_fd)
+            request["stdout"] = True
+            request["stderr_to_stdout"] = stderr == subprocess.STDOUT
+        process = HelperProcess(request["argv"],
+                                None if read_fd is None else os.fdopen(read_fd, "rb", 0))
+        if env is not None:
+            request["env"] = env
+        try:
+            with self._lock:
+                self._next_id += 1
+                request["id"] = self._next_id
+                self._pending[self._next_id] = process
+                try:
+                    self._send(json.dumps(request).encode() + b"\n", fds)
+                except OSError as e:
+                    del self._pending[self._next_id]
+                    raise OSError(f"spawn helper is gone: {e}")
+        finally:
+            for fd in fds:
+                os.close(fd)
+        if not process._started.wait(START_TIMEOUT):
+            with self._lock:
+                abandoned = self._pending.pop(request["id"], None) is not None
+                if abandoned:
+                    self._abandoned[request["id"]] = start_new_session
+            if abandoned:
+                if process.stdout is not None:
+                    process.stdout.close()
+                raise OSError("spawn helper did not answer")
+            process._started.wait()  # the answer came in just now
+        if process.error:
+            if process.stdout is not None:
+                process.stdout.close()
+            raise OSError(process.error)
+        return process
+
+    def _send(self, data: bytes, fds: List[int]):
+        """Send a request, passing ``fds`` along with its first byte; call with the lock held"""
+        if fds:
+            sent = self._sock.sendmsg(
+                [data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))])
+            data = data[sent:]
+        if data:
+            self._sock.sendall(data)
+
+    def stats(self) -> Dict[str, int]:
+        """Peak RSS of the helper and of the largest child it has reaped, in
+        KiB, and the modules the helper has loaded"""
+        done = threading.Event()
+        result = []
+        with self._lock:
+            self._next_id += 1
+            self._stats[self._next_id] = [done, result]
+            self._sock.sendall(json.dumps({"op": "stats", "id": self._next_id}).encode() + b"\n")
+        done.wait(START_TIMEOUT)
+        return result[0] if result else {}
+
+    def _read(self):
+        buffer = b""
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except OSError:
+                data = b""
+            if not data:
+                break
+            buffer += data
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                self._handle(json.loads(line))
+        if not self._closing:
+            logger.warning("Spawn helper exited, launching actions with posix_spawn")
+        self.alive = False
+        with self._lock:
+            orphans = list(self._pending.values()) + list(self._running.values())
+            self._pending.clear()
+            self._running.clear()
+        for process in orphans:
+            process.error = process.error or "spawn helper exited"
+            process.returncode = -1 if process.returncode is None else process.returncode
+            process._started.set()
+            process._exited.set()
+
+    def _handle(self, message: Dict):
+        with self._lock:
+            if "stats" in message:
+                done, result = self._stats.pop(message["id"])
+                result.append(message["stats"])
+                done.set()
+                return
+            if "exit" in message:
+                process = self._running.pop(message["pid"], None)
+                if process is not None:
+                    process.returncode = message["exit"]
+                    process._exited.set()
+                return
+            process = self._pending.pop(message["id"], None)
+            if process is None:
+                # popen gave up waiting for this one; nobody will wait for the child
+                setsid = self._abandoned.pop(message["id"], False)
+                if "pid" in message:
+                    _kill(message["pid"], setsid)
+                return
+            if "error" in message:
+                process.error = message["error"]
+            else:
+                process.pid = message["pid"]
+                self._running[process.pid] = process
+        process._started.set()
+
+    def close(self):
+        """Stop the helper and reap it; children still running are left to init"""
+        self._closing = True
+        try:
+            self._sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        try:
+            os.waitpid(self.pid, 0)
+        except ChildProcessError:
+            pass  # reaped already
+
+
+def _kill(pid: int, group: bool):
+    """SIGKILL a child of the helper, which reaps it"""
+    try:
+        if group:
+            os.killpg(pid, signal.SIGKILL)
+        else:
+            os.kill(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _serve(sock: socket.socket):
+    """The helper's loop: spawn on request, report exits as children finish"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    wake_read, wake_write = os.pipe()
+    os.set_blocking(wake_write, False)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.set_wakeup_fd(wake_write)
+
+    def reply(message):
+        sock.sendall(json.dumps(message).encode() + b"\n")
+
+    children = set()
+    buffer = b""
+    received = []  # descriptors that came with requests, in order
+    open_ = True
+    while open_:
+        try:
+            ready = select.select([sock, wake_read], [], [])[0]
+        except InterruptedError:
+            ready = []
+        if wake_read in ready:
+            os.read(wake_read, 4096)
+        if sock in ready:
+            data, ancillary, _, _ = sock.recvmsg(65536, socket.CMSG_SPACE(64 * 4),
+                                                 getattr(socket, "MSG_CMSG_CLOEXEC", 0))
+            for level, kind, payload in ancillary:
+                if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                    fds = array.array("i")
+                    fds.frombytes(payload[:len(payload) - len(payload) % fds.itemsize])
+                    for fd in fds:
+                        os.set_inheritable(fd, False)
+                    received.extend(fds)
+            if not data:
+                open_ = False
+            buffer += data
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                request = json.loads(line)
+                if request["op"] == "stats":
+                    import resource
+                    reply({"id": request["id"], "stats": {
+                        "helper_maxrss": maxrss_kib(resource.RUSAGE_SELF),
+                        "children_maxrss": maxrss_kib(resource.RUSAGE_CHILDREN),
+                        "modules": sorted(sys.modules),
+                    }})
+                    continue
+                actions = []
+                if request.get("devnull"):
+                    actions.append((os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0))
+                output_fd = received.pop(0) if request.get("stdout") and received else None
+                if output_fd is not None:
+                    actions.extend(_output_actions(
+                        output_fd, subprocess.STDOUT if request.get("stderr_to_stdout") else None))
+                try:
+                    argv = request["argv"]
+                    pid = os.posix_spawnp(argv[0], argv, request.get("env", os.environ),
+                                          file_actions=actions, setsid=request.get("setsid", False),
+                                          setsigdef=DEFAULT_SIGNALS)
+                except OSError as e:
+                    reply({"id": request["id"], "error": str(e)})
+                    continue
+                finally:
+                    if output_fd is not None:
+                        os.close(output_fd)
+                children.add(pid)
+                reply({"id": request["id"], "pid": pid})
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                children.clear()
+                break
+            if not pid:
+                break
+            children.discard(pid)
+            if open_:
+                reply({"pid": pid, "exit": _exit_code(status)})
+    # Children still running are reparented to init, which reaps them
+
+
+def start_spawn_helper() -> Optional[SpawnHelper]:
+    """Fork the spawn helper. Call this before importing Quartz or PyQt6.
+
+    Returns None where fork or posix_spawn is unavailable.
+    """
+    if not hasattr(os, "fork") or not hasattr(os, "posix_spawnp"):
+        return None
+    parent, child = socket.socketpair()
+    pid = os.fork()
+    if pid == 0:
+        parent.close()
+        try:
+            _serve(child)
+        finally:
+            os._exit(0)
+    child.close()
+    return SpawnHelper(parent, pid)
@@ -0,0 +1,126 @@
+"""
+FireCorners Trigger State Machine
+
+Decides when a zone's actions fire, given the zone each sample falls in.
+This is the only implementation of the dwell, cooldown and hysteresis
+rules: the live detector, offline replay and the benchmarks all drive it,
+and batch detection reproduces it exactly.
+
+Rules, for samples in timestamp order:
+
+- The sample that enters a zone never fires.
+- A later sample in the same zone fires once it is at least ``dwell``
+  seconds after the entry and at least ``cooldown`` seconds after that
+  zone last fired. Each zone has its own cooldown.
+- Leaving a zone only counts once the cursor has been outside it for
+  ``hysteresis`` seconds; coming back sooner continues the same visit.
+  Entering a different zone always starts a new visit.
+
+Every deadline is precomputed when it changes (on entry, trigger, exit or
+a settings change), so a steady-state sample costs a few comparisons and
+allocates nothing.
+"""
+
+from typing import Dict, Hashable, Optional
+
+INF = float("inf")
+
+
+class ZoneStateMachine:
+    """Dwell, per-zone cooldown and exit hysteresis over (timestamp, zone)"""
+
+    __slots__ = ("zone", "enter_time", "last_trigger_time", "_cooldown", "_dwell",
+                 "_hysteresis", "_dwell_at", "_exit_at", "_fired", "_ready")
+
+    def __init__(self, cooldown: float = 1.0, dwell: float = 0.0, hysteresis: float = 0.0):
+        self.zone: Optional[Hashable] = None  # zone of the current visit
+        self.enter_time = 0.0
+        self.last_trigger_time = 0.0  # latest trigger of any zone
+        self._cooldown = cooldown
+        self._dwell = dwell
+        self._hysteresis = hysteresis
+        self._dwell_at = 0.0
+        self._exit_at = INF  # when an exit becomes final; INF while inside
+        self._fired: Dict[Hashable, float] = {}  # zone -> time it last fired
+        self._ready: Dict[Hashable, float] = {}  # zone -> end of its cooldown
+
+    @property
+    def cooldown(self) -> float:
+        return self._cooldown
+
+    @cooldown.setter
+    def cooldown(self, cooldown: float):
+        self._cooldown = cooldown
+        self._ready = {zone: t + cooldown for zone, t in self._fired.items()}
+
+    @property
+    def dwell(self) -> float:
+        return self._dwell
+
+    @dwell.setter
+    def dwell(self, dwell: float):
+        self._dwell = dwell
+        self._dwell_at = self.enter_time + dwell
+
+    @property
+    def hysteresis(self) -> float:
+        return self._hysteresis
+
+    @hysteresis.setter
+    def hysteresis(self, hysteresis: float):
+        if self._exit_at != INF:
+            self._exit_at += hysteresis - self._hysteresis
+        self._hysteresis = hysteresis
+
+    @property
+    def inside(self) -> bool:
+        """Whether the last sample was in the current visit's zone"""
+        return self.zone is not None and self._exit_at == INF
+
+    def ready_time(self, zone: Hashable) -> float:
+        """Time at which ``zone``'s cooldown ends"""
+        return self._ready.get(zone, self._cooldown)
+
+    def update(self, timestamp: float, zone: Optional[Hashable]) -> Optional[Hashable]:
+        """Feed the zone of one sample; return the zone to fire, or None"""
+        current = self.zone
+        if zone is None:
+            if current is not None:
+                exit_at = self._exit_at
+                if exit_at == INF:
+                    exit_at = self._exit_at = timestamp + self._hysteresis
+                if timestamp >= exit_at:
+                    self.zone = None
+            return None
+
+        if zone != current or timestamp >= self._exit_at:
+            self.zone = zone
+            self.enter_time = timestamp
+            self._dwell_at = timestamp + self._dwell
+            self._exit_at = INF
+            return None
+
+        self._exit_at = INF
+        if timestamp >= self._dwell_at and timestamp >= self._ready.get(zone, self._cooldown):
+            self._fired[zone] = timestamp
+            self._ready[zone] = timestamp + self._cooldown
+            self.last_trigger_time = timestamp
+            return zone
+        return None
+
+    def next_deadline(self) -> Optional[float]:
+        """Time at which the state can next change without a new zone.
+
+        That is when the occupied zone becomes eligible to fire, or, just
+        after leaving it, when the exit becomes final. None when idle.
+        """
+        if self.zone is None:
+            return None
+        if self._exit_at != INF:
+            return self._exit_at
+        return max(self._dwell_at, self._ready.get(self.zone, self._cooldown))
+
+    def reset(self):
+        """End the current visit, so the next sample counts as a fresh entry"""
+        self.zone = None
+        self._exit_at = INF
@@ -0,0 +1,272 @@
+"""
+FireCorners Pointer Traces
+
+Records every pointer sample the daemon sees to a compact binary file and
+reads it back through a memory map without copying.
+
+File layout (little-endian):
+
+  header, 24 bytes:
+    magic           8s   b"FCTRACE\\0"
+    version         u32
+    record size     u32
+    display count   u32
+    reserved        u32
+  displays, 20 bytes each, padded to a multiple of 8 bytes:
+    display id      u32        display layout at recording time
+    x, y            i32, i32
+    width, height   i32, i32
+  records, 16 bytes each:
+    timestamp       i64  microseconds since the epoch
+    x, y            i32, i32
+
+A change of the display layout during the recording is a record whose x
+is LAYOUT_MARK and whose y is the number of displays, followed by two
+records per display holding its id, x, y, width and height. Version 2
+files, which have no such records, are read too.
+
+Fixed-width records keep the writer to one struct pack per sample and let
+the reader expose each column as a strided memoryview over the mapping,
+one segment per display layout.
+"""
+
+import math
+import mmap
+import struct
+import sys
+import time
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence
+
+from .geometry import Display
+from .pointer import EventPointerSource, PointerSource, Sample
+
+MAGIC = b"FCTRACE\0"
+VERSION = 3
+READABLE_VERSIONS = (2, 3)
+HEADER = struct.Struct("<8sIIII")
+DISPLAY = struct.Struct("<I4i")
+RECORD = struct.Struct("<qii")
+LAYOUT_MARK = -(1 << 31)  # x of a layout change record; no display reaches it
+LAYOUT_DISPLAY = struct.Struct("<I4i12x")  # a display in a layout change, two records long
+FLUSH_INTERVAL = 1.0  # seconds of samples kept in the write buffer at most
+
+
+def _displays_size(count: int) -> int:
+    return (count * DISPLAY.size + 7) // 8 * 8
+
+
+class TraceWriter:
+    """Appends pointer samples and display layout changes to a trace file.
+
+    Buffered writes are flushed once a second of samples has piled up, so
+    a recorder that is killed loses at most that much.
+    """
+
+    def __init__(self, path: str, displays: Sequence[Display], buffer_size: int = 1 << 16):
+        self.path = path
+        self._file = open(path, 'wb', buffering=buffer_size)
+        self.displays = tuple(displays)
+        table = b"".join(DISPLAY.pack(*d) for d in self.displays)
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(self.displays), 0))
+        self._file.write(table.ljust(_displays_size(len(self.displays)), b"\0"))
+        self._pack = RECORD.pack
+        self._write = self._file.write
+        self._flush_at = None
+        self.count = 0
+
+    def write(self, timestamp: float, x: float, y: float):
+        # Floored like the zone table's lookup, so a replay lands in the
+        # same pixel for fractional coordinates left of or above the origin
+        self._write(self._pack(int(timestamp * 1e6), math.floor(x), math.floor(y)))
+        self.count += 1
+        if self._flush_at is None:
+            self._flush_at = timestamp + FLUSH_INTERVAL
+        elif timestamp >= self._flush_at:
+            self._flush_at = timestamp + FLUSH_INTERVAL
+            self.flush()
+
+    def set_displays(self, displays: Sequence[Display], timestamp: Optional[float] = None):
+        """Record a change of the display layout; a DisplayMonitor listener"""
+        displays = tuple(displays)
+        if displays == self.displays:
+            return
+        self.displays = displays
+        if timestamp is None:
+            timestamp = time.time()
+        # One write call, so samples pushed meanwhile cannot land in the middle
+        self._write(self._pack(int(timestamp * 1e6), LAYOUT_MARK, len(displays))
+                    + b"".join(LAYOUT_DISPLAY.pack(*d) for d in displays))
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._write = self._discard
+            self._file.close()
+
+    @staticmethod
+    def _discard(data: bytes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceSegment(NamedTuple):
+    """Samples recorded with one display layout.
+
+    The columns are memoryviews into the trace's mapping.
+    """
+    displays: List[Display]
+    start: int  # index of its first sample in the whole trace
+    timestamps_us: memoryview
+    xs: memoryview
+    ys: memoryview
+
+
+class Trace:
+    """Read-only, memory-mapped view of a trace file.
+
+    ``segments`` hold the samples of each display layout in turn; their
+    columns stay valid until close(), and arrays made from them without
+    copying must be gone by then. A trailing partial record, left by a
+    recorder that was killed mid-write, is ignored.
+    """
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise ValueError("Trace files can only be mapped on little-endian hosts")
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"{path} is not a FireCorners trace (truncated header)")
+            magic, version, record_size, display_count, _ = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a FireCorners trace")
+            if version not in READABLE_VERSIONS or record_size != RECORD.size:
+                raise ValueError(f"Unsupported trace version {version} in {path}")
+            table = f.read(_displays_size(display_count))
+            self.displays: List[Display] = [
+                Display(*DISPLAY.unpack_from(table, i * DISPLAY.size)) for i in range(display_count)
+            ]
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offset = HEADER.size + _displays_size(display_count)
+        records = max(0, len(self._mmap) - offset) // RECORD.size
+        body = memoryview(self._mmap)[offset:offset + records * RECORD.size]
+        self._views = [body]
+        self.segments: List[TraceSegment] = []
+        self.count = 0
+        for displays, first, end in self._layouts(offset, records):
+            self._add_segment(body, displays, first, end)
+
+    def _layouts(self, offset: int, records: int):
+        """(displays, first record, end record) of each layout's run of samples"""
+        mark = struct.pack("<i", LAYOUT_MARK)
+        displays, first = self.displays, 0
+        # Layout changes are rare, so find their marks instead of reading every record
+        position = self._mmap.find(mark, offset + 8)
+        while position != -1:
+            index, field = divmod(position - offset, RECORD.size)
+            if index >= records:
+                break
+            if field == 8:
+                count = RECORD.unpack_from(self._mmap, offset + index * RECORD.size)[2]
+                end = index + 1 + 2 * count
+                if end > records:
+                    records = index  # cut off mid-write
+                    break
+                yield displays, first, index
+                displays = [Display(*LAYOUT_DISPLAY.unpack_from(
+                    self._mmap, offset + (index + 1 + 2 * i) * RECORD.size))
+                    for i in range(count)]
+                first = end
+                position = offset + end * RECORD.size + 8
+            else:
+                position += 1
+            position = self._mmap.find(mark, position)
+        yield displays, first, records
+
+    def _add_segment(self, body: memoryview, displays: List[Display], first: int, end: int):
+        part = body[first * RECORD.size:end * RECORD.size]
+        as_int64 = part.cast('q')
+        as_int32 = part.cast('i')
+        segment = TraceSegment(displays, self.count, as_int64[0::2], as_int32[2::4],
+                               as_int32[3::4])
+        self._views += [part, as_int64, as_int32] + list(segment[2:])
+        self.segments.append(segment)
+        self.count += end - first
+
+    def __len__(self) -> int:
+        return self.count
+
+    def samples(self) -> Iterator[Sample]:
+        """Yield (timestamp_seconds, x, y) tuples, e.g. for ReplayPointerSource"""
+        for segment in self.segments:
+            for t, x, y in zip(segment.timestamps_us, segment.xs, segment.ys):
+                yield t / 1e6, x, y
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self.segments = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_trace(path: str) -> Trace:
+    """Memory-map a trace file for reading"""
+    return Trace(path)
+
+
+class RecordingPointerSource(PointerSource):
+    """Polling source wrapper that records every sample it returns"""
+
+    def __init__(self, source: PointerSource, writer: TraceWriter):
+        self.source = source
+        self.writer = writer
+
+    def sample(self) -> Optional[Sample]:
+        sample = self.source.sample()
+        if sample is not None:
+            self.writer.write(*sample)
+        return sample
+
+    def close(self):
+        self.source.close()
+        self.writer.close()
+
+
+class RecordingEventSource(EventPointerSource):
+    """Event source wrapper that records every sample it pushes"""
+
+    def __init__(self, source: EventPointerSource, writer: TraceWriter):
+        self.source = source
+        self.writer = writer
+
+    def start(self, push: Callable[[float, float, float], None]):
+        writer = self.writer
+
+        def recording_push(timestamp, x, y):
+            writer.write(timestamp, x, y)
+            push(timestamp, x, y)
+
+        self.source.start(recording_push)
+
+    def stop(self):
+        # Stops and joins the thread that pushes samples before the writer
+        # goes; a write that still comes in after all is discarded
+        self.source.stop()
+        self.writer.close()
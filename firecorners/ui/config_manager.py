@@ -1,14 +1,18 @@
-import json
 import os
 import logging
 from pathlib import Path
 
+from ..compiler import BackgroundCompiler, read_config
+from ..store import ConfigStore
+
 logger = logging.getLogger(__name__)
 
 class ConfigManager:
     def __init__(self):
         self.config_dir = Path.home() / ".firecorners"
         self.config_file = self.config_dir / "config.json"
+        self.store = ConfigStore(str(self.config_file))
+        self.compiler = BackgroundCompiler(str(self.config_file))
         
         self.default_config = {
             "top_left": [],
@@ -44,33 +48,35 @@ class ConfigManager:
         """Load configuration from file"""
         try:
             if self.config_file.exists():
-                with open(self.config_file, 'r') as f:
-                    try:
-                        config = json.load(f)
-                        logger.info("Successfully loaded config from: %s", self.config_file)
-                        
-                        # Ensure all required fields exist
-                        for key in self.default_config:
-                            if key not in config:
-                                config[key] = self.default_config[key]
-                                logger.info("Added missing key to config: %s", key)
+                try:
+                    # Normalized, from the compiled artifact when it is fresh:
+                    # older configs use "url"/"app"/"shell"/"script" and may
+                    # give a corner a single action; the editor expects lists
+                    config = read_config(str(self.config_file))
+                    logger.info("Successfully loaded config from: %s", self.config_file)
+
+                    # Ensure all required fields exist
+                    for key in self.default_config:
+                        if key not in config:
+                            config[key] = self.default_config[key]
+                            logger.info("Added missing key to config: %s", key)
                         
-                        # Ensure settings exist and have all required fields
-                        if "settings" not in config:
-                            config["settings"] = self.default_config["settings"]
-                            logger.info("Added missing settings to config")
-                        else:
-                            # Add any missing settings fields
-                            for key, value in self.default_config["settings"].items():
-                                if key not in config["settings"]:
-                                    config["settings"][key] = value
-                                    logger.info("Added missing setting: %s", key)
+                    # Ensure settings exist and have all required fields
+                    if "settings" not in config:
+                        config["settings"] = self.default_config["settings"]
+                        logger.info("Added missing settings to config")
+                    else:
+                        # Add any missing settings fields
+                        for key, value in self.default_config["settings"].items():
+                            if key not in config["settings"]:
+                                config["settings"][key] = value
+                                logger.info("Added missing setting: %s", key)
                         
-                        return config
-                    except json.JSONDecodeError as e:
-                        logger.error("Invalid JSON in config file: %s", e, exc_info=True)
-                        logger.info("Creating new default configuration")
-                        return self._create_default_config()
+                    return config
+                except ValueError as e:
+                    logger.error("Invalid JSON in config file: %s", e, exc_info=True)
+                    logger.info("Creating new default configuration")
+                    return self._create_default_config()
             else:
                 logger.info("Config file not found, creating default configuration")
                 return self._create_default_config()
@@ -84,8 +90,7 @@ class ConfigManager:
         try:
             self._ensure_config_dir()
             config = self.default_config.copy()
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=2)
+            self.store.write(config)
             logger.info("Created default configuration at: %s", self.config_file)
             return config
         except Exception as e:
@@ -113,10 +118,12 @@ class ConfigManager:
                         logger.warning("Missing setting: %s, adding default", key)
                         config["settings"][key] = value
             
-            # Save config
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=2)
-            logger.info("Successfully saved config to: %s", self.config_file)
+            # Save config; the daemon never sees a partly written file
+            generation = self.store.write(config)
+            logger.info("Successfully saved config to: %s (generation %d)", self.config_file,
+                        generation)
+            # Compile it off the GUI thread, so the daemon can load it without parsing it
+            self.compiler.request()
             return True
         except Exception as e:
             logger.error("Error saving configuration: %s", e, exc_info=True)
@@ -0,0 +1,467 @@
+"""
+FireCorners Config Watcher
+
+Tells the daemon when config.json changes, instead of a timer that stats
+the file every few seconds. The watcher thread sleeps in select() on a
+change notification descriptor and costs nothing while the file is left
+alone:
+
+- inotify (Linux), through ctypes, on the file's folder
+- kqueue (macOS and the BSDs), on the folder and on the file itself
+
+Both watch the folder rather than only the file, so an editor that saves
+by writing a temporary file and renaming it over the config is seen, as
+is a config that is deleted and created again. Changes to other files in
+the folder, such as the metrics the daemon writes every minute, are
+ignored: inotify names the entry that changed, and for kqueue a folder
+change counts only if the config's name now refers to another file. Where neither is available
+the watcher falls back to polling the file's mtime.
+
+Editors often write a file in several steps. A notification starts a
+short debounce and every further one restarts it, up to ``max_delay``
+after the first; when it runs out the file is stat()ed and the callback
+is called if its inode, mtime or size differs from the last reload. A
+burst of writes therefore causes a single reload of the finished file.
+
+A FolderWatcher uses the same backends, without the file: it calls its
+callback once entries were added to, removed from or renamed in any of a
+set of folders, such as the application folders the catalog indexes (see
+catalog.py). Polling compares the folders' mtimes.
+
+The callback runs on the watcher thread.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE = 0.05  # seconds of quiet after the last write before reloading
+DEFAULT_MAX_DELAY = 0.5  # seconds after the first write to reload at the latest
+DEFAULT_INTERVAL = 5.0  # seconds between stat() calls when polling
+BACKENDS = ("inotify", "kqueue", "poll")
+
+Signature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: str) -> Signature:
+    """(inode, mtime, size) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class _Inotify:
+    """inotify on folders, for changes to the entry ``path`` names or, without it, any entry"""
+
+    name = "inotify"
+
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+            | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+    EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+    def __init__(self, folders: Sequence[str], path: Optional[str] = None):
+        if not hasattr(os, "O_CLOEXEC"):
+            raise OSError("inotify is not available")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._name = os.fsencode(os.path.basename(path)) if path is not None else None
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for folder in folders:
+            if libc.inotify_add_watch(self.fd, os.fsencode(folder), self.MASK) >= 0:
+                continue
+            errno = ctypes.get_errno()
+            if path is None:
+                logger.debug("Cannot watch %s: %s", folder, os.strerror(errno))
+                continue  # the others are still worth watching
+            os.close(self.fd)
+            raise OSError(errno, f"cannot watch {folder}")
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def read(self) -> bool:
+        """Drain pending events; True if any concerns the file, or any at all without one.
+
+        Watching a file, raises OSError once its folder is gone.
+        """
+        relevant = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return relevant
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = self.EVENT.unpack_from(data, offset)
+                offset += self.EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if self._name is None:
+                    relevant = True
+                elif mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_IGNORED):
+                    raise OSError("the config folder was removed")
+                elif mask & self.IN_Q_OVERFLOW or name == self._name:
+                    relevant = True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Kqueue:
+    """kqueue on folders, and on the file ``path`` names while it exists"""
+
+    name = "kqueue"
+
+    def __init__(self, folders: Sequence[str], path: Optional[str] = None):
+        if not hasattr(select, "kqueue"):
+            raise OSError("kqueue is not available")
+        self.path = path
+        self._open_flags = os.O_RDONLY | getattr(os, "O_EVTONLY", 0) | os.O_CLOEXEC
+        self.kq = select.kqueue()
+        self._file_fd = None
+        self._file_id = None  # (device, inode) of the file the open descriptor is for
+        self._folder_fds = []
+        for folder in folders:
+            try:
+                fd = os.open(folder, self._open_flags)
+            except OSError as e:
+                if path is None:
+                    logger.debug("Cannot watch %s: %s", folder, e)
+                    continue  # the others are still worth watching
+                self.close()
+                raise
+            self._folder_fds.append(fd)
+            self._register(fd, select.KQ_NOTE_WRITE | select.KQ_NOTE_DELETE
+                           | select.KQ_NOTE_RENAME)
+        if path is not None:
+            self._open_file()
+
+    def _register(self, fd: int, fflags: int):
+        event = select.kevent(fd, filter=select.KQ_FILTER_VNODE,
+                              flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR, fflags=fflags)
+        self.kq.control([event], 0, 0)
+
+    def _open_file(self):
+        if self._file_fd is not None:
+            os.close(self._file_fd)  # closing removes its kevent
+            self._file_fd = self._file_id = None
+        try:
+            self._file_fd = os.open(self.path, self._open_flags)
+        except OSError:
+            return  # not there (yet); the folder watch sees it appear
+        st = os.fstat(self._file_fd)
+        self._file_id = st.st_dev, st.st_ino
+        self._register(self._file_fd, select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND
+                       | select.KQ_NOTE_ATTRIB | select.KQ_NOTE_DELETE | select.KQ_NOTE_RENAME)
+
+    def fileno(self) -> int:
+        return self.kq.fileno()
+
+    def _path_id(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_dev, st.st_ino
+
+    def read(self) -> bool:
+        """Drain pending events; True if any concerns the file, or any at all without one.
+
+        kqueue does not say which entry of a folder changed, so a change to
+        the folder's entries counts only if the file's name now refers to
+        another inode, or to none: the file was created, removed, or
+        replaced by a rename. Watching a file, raises OSError once its
+        folder is gone.
+        """
+        events = []
+        while True:
+            batch = self.kq.control(None, 16, 0)
+            events.extend(batch)
+            if len(batch) < 16:
+                break
+        if self.path is None:
+            return bool(events)
+        relevant = False
+        entries_changed = False
+        for event in events:
+            if event.ident in self._folder_fds:
+                if event.fflags & (select.KQ_NOTE_DELETE | select.KQ_NOTE_RENAME):
+                    raise OSError("the config folder was removed")
+                entries_changed = True
+            elif event.ident == self._file_fd:
+                relevant = True
+        if relevant or entries_changed:
+            # Follow the name, not the inode, once it refers to another file
+            if self._path_id() != self._file_id:
+                self._open_file()
+                relevant = True
+        return relevant
+
+    def close(self):
+        if self._file_fd is not None:
+            os.close(self._file_fd)
+        for fd in self._folder_fds:
+            os.close(fd)
+        self.kq.close()
+
+
+def _notifier(folders: Sequence[str], path: Optional[str], backend: str):
+    """A notification backend for ``folders`` and the file ``path``, or None to poll"""
+    kinds = {"inotify": _Inotify, "kqueue": _Kqueue}
+    names = [backend] if backend != "auto" else list(kinds)
+    for name in names:
+        if name not in kinds:
+            continue
+        try:
+            return kinds[name](folders, path)
+        except OSError as e:
+            logger.debug("Cannot watch %s with %s: %s", path or ", ".join(folders), name, e)
+    return None
+
+
+class _Watcher:
+    """Debounces change notifications, or polls, on a thread; see ConfigWatcher"""
+
+    def __init__(self, callback: Callable[[], None], debounce: float, max_delay: float,
+                 interval: float, backend: str):
+        if backend not in BACKENDS + ("auto",):
+            raise ValueError(f"unknown watcher backend {backend!r}")
+        self.callback = callback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.interval = interval
+        self._backend = backend
+        self._notifier = None
+        self._wake_read, self._wake_write = os.pipe()
+        self._thread = None
+        self._stopped = False
+        self.wakeups = 0
+        self.events = 0
+        self.reloads = 0
+        self.fallbacks = 0
+
+    @property
+    def backend(self) -> str:
+        return self._notifier.name if self._notifier is not None else "poll"
+
+    def _describe(self) -> str:
+        raise NotImplementedError
+
+    def _polled_change(self) -> bool:
+        """Whether a poll finds a change"""
+        raise NotImplementedError
+
+    def _check(self):
+        """Call the callback if there was a change, once a burst of notifications is over"""
+        raise NotImplementedError
+
+    def _rearm(self):
+        """Called on the watcher thread when woken up by something other than stop()"""
+
+    def start(self):
+        logger.info("Watching %s with %s", self._describe(), self.backend)
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        if self._thread is None:
+            self._close()
+            return
+        self._wake()
+        self._thread.join(1.0)
+
+    def _wake(self):
+        os.write(self._wake_write, b"x")
+
+    def _run(self):
+        try:
+            self._watch()
+        finally:
+            self._close()
+
+    def _close(self):
+        if self._notifier is not None:
+            self._notifier.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    def _watch(self):
+        first = None  # time of the first notification of a burst
+        deadline = None  # when the burst counts as over
+        polled = time.monotonic()
+        while not self._stopped:
+            now = time.monotonic()
+            if self._notifier is None:
+                waits = [polled + self.interval - now]
+            else:
+                waits = []
+            if deadline is not None:
+                waits.append(deadline - now)
+            timeout = max(min(waits), 0) if waits else None
+            fds = [self._wake_read]
+            if self._notifier is not None:
+                fds.append(self._notifier.fileno())
+            ready = select.select(fds, [], [], timeout)[0]
+            self.wakeups += 1
+            now = time.monotonic()
+            changed = False
+            if self._wake_read in ready:
+                os.read(self._wake_read, 512)
+                if self._stopped:
+                    return
+                self._rearm()
+                changed = True  # in case something changed while re-arming
+            elif self._notifier is not None and self._notifier.fileno() in ready:
+                try:
+                    changed = self._notifier.read()
+                except OSError as e:
+                    logger.warning("Lost the %s watch (%s), polling %s instead",
+                                   self.backend, e, self._describe())
+                    self._notifier.close()
+                    self._notifier = None
+                    self.fallbacks += 1
+                    polled = now
+                    changed = True
+            elif self._notifier is None and now - polled >= self.interval:
+                polled = now
+                changed = self._polled_change()
+            if changed:
+                self.events += 1
+                if first is None:
+                    first = now
+                deadline = min(now + self.debounce, first + self.max_delay)
+            if deadline is not None and now >= deadline:
+                first = deadline = None
+                self._check()
+
+    def counters(self) -> Dict[str, int]:
+        return {"wakeups": self.wakeups, "events": self.events, "reloads": self.reloads,
+                "fallbacks": self.fallbacks}
+
+
+class ConfigWatcher(_Watcher):
+    """Calls ``callback`` once each time a file has changed"""
+
+    thread_name = "firecorners-config-watcher"
+
+    def __init__(self, path: str, callback: Callable[[], None], debounce: float = DEFAULT_DEBOUNCE,
+                 max_delay: float = DEFAULT_MAX_DELAY, interval: float = DEFAULT_INTERVAL,
+                 backend: str = "auto"):
+        super().__init__(callback, debounce, max_delay, interval, backend)
+        self.path = os.path.abspath(os.fspath(path))
+        if backend != "poll":
+            self._notifier = _notifier([os.path.dirname(self.path)], self.path, backend)
+        self._signature = file_signature(self.path)
+
+    def _describe(self) -> str:
+        return self.path
+
+    def _polled_change(self) -> bool:
+        return file_signature(self.path) != self._signature
+
+    def _check(self):
+        signature = file_signature(self.path)
+        if signature == self._signature:
+            return
+        self._signature = signature
+        if signature is None:
+            logger.info("%s was removed", self.path)
+            return
+        self.reloads += 1
+        try:
+            self.callback()
+        except Exception as e:
+            logger.error("Error handling a change to %s: %s", self.path, e, exc_info=True)
+
+
+class FolderWatcher(_Watcher):
+    """Calls ``callback`` once each time entries of any of a set of folders have changed"""
+
+    thread_name = "firecorners-folder-watcher"
+
+    def __init__(self, folders: Sequence[str], callback: Callable[[], None],
+                 debounce: float = DEFAULT_DEBOUNCE, max_delay: float = DEFAULT_MAX_DELAY,
+                 interval: float = DEFAULT_INTERVAL, backend: str = "auto"):
+        super().__init__(callback, debounce, max_delay, interval, backend)
+        self.folders = tuple(os.path.abspath(os.fspath(folder)) for folder in folders)
+        self._lock = threading.Lock()
+        self._next_folders = None
+        if backend != "poll":
+            self._notifier = _notifier(self.folders, None, backend)
+        self._signatures = self._folder_signatures()
+
+    def set_folders(self, folders: Sequence[str]):
+        """Watch another set of folders; may be called from any thread"""
+        folders = tuple(os.path.abspath(os.fspath(folder)) for folder in folders)
+        with self._lock:
+            if folders == (self._next_folders or self.folders):
+                return
+            self._next_folders = folders
+        if self._thread is None:
+            self._rearm()
+        elif not self._stopped:
+            self._wake()
+
+    def _rearm(self):
+        with self._lock:
+            folders, self._next_folders = self._next_folders, None
+        if folders is None:
+            return
+        if self._notifier is not None:
+            self._notifier.close()
+            self._notifier = _notifier(folders, None, self._backend)
+        # Folders watched before keep their signature and new ones have
+        # none yet, so the check that follows sees whatever changed while
+        # the watch was not armed
+        signatures = dict(zip(self.folders, self._signatures))
+        self._signatures = tuple(signatures.get(folder, ()) for folder in folders)
+        self.folders = folders
+
+    def _folder_signatures(self) -> Tuple[Signature, ...]:
+        return tuple(file_signature(folder) for folder in self.folders)
+
+    def _describe(self) -> str:
+        return f"{len(self.folders)} folders"
+
+    def _polled_change(self) -> bool:
+        return self._folder_signatures() != self._signatures
+
+    def _check(self):
+        signatures = self._folder_signatures()
+        if signatures == self._signatures:
+            return
+        self._signatures = signatures
+        self.reloads += 1
+        try:
+            self.callback()
+        except Exception as e:
+            logger.error("Error handling a change to %s: %s", self._describe(), e,
+                         exc_info=True)
@@ -0,0 +1,256 @@
+"""
+FireCorners Hot Zones
+
+A zone is a region of a display that triggers actions like a hot corner.
+Besides the four built-in corners, the config may define edge segments,
+rectangles and corner arcs under a "zones" key:
+
+  "zones": [
+    {"name": "dock", "edge": "bottom", "start": 0.25, "end": 0.75,
+     "threshold": 3, "actions": [...]},
+    {"name": "widget", "rect": [100, 100, 300, 200], "display": 1, "actions": [...]},
+    {"name": "wide_corner", "arc": "top_right", "radius": 40, "actions": [...]}
+  ]
+
+Edge "start"/"end" are fractions of the edge length. Rectangles are
+[x, y, width, height] relative to the display's top-left. "display" is an
+index into the active display list; without it the zone is placed on every
+display. "threshold" is the edge thickness and defaults to the global one.
+
+All zones are rasterized into a grid of buckets when the table is built, so
+classifying a sample costs one dict lookup plus a check of the few zones
+sharing its bucket, however many zones are configured.
+"""
+
+import logging
+from math import floor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .geometry import CORNERS, Display, corner_pinned, corner_point
+
+logger = logging.getLogger(__name__)
+
+EDGES = ("top", "bottom", "left", "right")
+
+CELL_SHIFT = 5  # 32 pixel buckets; ZoneTable.classify inlines this value
+
+
+class ZoneSpec(NamedTuple):
+    name: str
+    kind: str  # "corner", "edge", "rect" or "arc"
+    side: str = ""  # corner or edge name for corner, edge and arc zones
+    display: Optional[int] = None
+    threshold: Optional[int] = None
+    start: float = 0.0
+    end: float = 1.0
+    rect: Tuple[int, int, int, int] = (0, 0, 0, 0)
+    radius: int = 0
+    actions: Tuple = ()
+
+
+def parse_zones(config: Dict) -> List[ZoneSpec]:
+    """Read the "zones" list of a config, skipping invalid entries"""
+    zones = []
+    for i, entry in enumerate(config.get("zones", []) or []):
+        try:
+            zones.append(parse_zone(entry))
+        except (TypeError, ValueError, KeyError) as e:
+            logger.warning("Ignoring invalid zone %d: %s", i, e)
+    return zones
+
+
+def parse_zone(entry: Dict) -> ZoneSpec:
+    """Build a ZoneSpec from one config entry; raises ValueError if invalid"""
+    if not isinstance(entry, dict):
+        raise ValueError("zone must be an object")
+    name = entry.get("name")
+    if not name or not isinstance(name, str):
+        raise ValueError("zone needs a name")
+    display = entry.get("display")
+    if display is not None:
+        display = int(display)
+    threshold = entry.get("threshold")
+    if threshold is not None:
+        threshold = int(threshold)
+        if threshold < 0:
+            raise ValueError(f"zone {name!r} has a negative threshold")
+    actions = entry.get("actions") or []
+    if isinstance(actions, dict):
+        actions = [actions]
+    common = {"display": display, "threshold": threshold, "actions": tuple(actions)}
+
+    if "edge" in entry:
+        edge = entry["edge"]
+        if edge not in EDGES:
+            raise ValueError(f"zone {name!r} has unknown edge {edge!r}")
+        start = float(entry.get("start", 0.0))
+        end = float(entry.get("end", 1.0))
+        if not 0.0 <= start < end <= 1.0:
+            raise ValueError(f"zone {name!r} needs 0 <= start < end <= 1")
+        return ZoneSpec(name, "edge", side=edge, start=start, end=end, **common)
+    if "rect" in entry:
+        x, y, width, height = (int(v) for v in entry["rect"])
+        if width <= 0 or height <= 0:
+            raise ValueError(f"zone {name!r} has an empty rectangle")
+        return ZoneSpec(name, "rect", rect=(x, y, width, height), **common)
+    if "arc" in entry:
+        corner = entry["arc"]
+        if corner not in CORNERS:
+            raise ValueError(f"zone {name!r} has unknown corner {corner!r}")
+        radius = int(entry.get("radius", 0))
+        if radius <= 0:
+            raise ValueError(f"zone {name!r} needs a positive radius")
+        return ZoneSpec(name, "arc", side=corner, radius=radius, **common)
+    raise ValueError(f"zone {name!r} needs one of 'edge', 'rect' or 'arc'")
+
+
+def corner_zones() -> List[ZoneSpec]:
+    """The four built-in hot corners, sized by the global threshold"""
+    return [ZoneSpec(corner, "corner", side=corner) for corner in CORNERS]
+
+
+# Region tuple: (x0, y0, x1, y1, cx, cy, r2, name). The bounding box is
+# inclusive; r2 >= 0 additionally limits the region to a circle around (cx, cy).
+Region = Tuple[int, int, int, int, int, int, int, str]
+
+
+def _region(spec: ZoneSpec, display: Display, displays: Sequence[Display],
+            threshold: int) -> Optional[Region]:
+    t = threshold if spec.threshold is None else spec.threshold
+    left, top = display.x, display.y
+    right, bottom = display.x + display.width - 1, display.y + display.height - 1
+
+    if spec.kind == "corner":
+        if not corner_pinned(displays, display, spec.side):
+            return None
+        _, _, dx, dy = corner_point(display, spec.side)
+        # Same extents as the original single-display classifier:
+        # [0, threshold] on the near side, [size - threshold, size) on the far side
+        x0, x1 = (left, left + t) if dx < 0 else (right + 1 - t, right)
+        y0, y1 = (top, top + t) if dy < 0 else (bottom + 1 - t, bottom)
+        return (x0, y0, x1, y1, 0, 0, -1, spec.name)
+
+    if spec.kind == "arc":
+        if not corner_pinned(displays, display, spec.side):
+            return None
+        x, y, dx, dy = corner_point(display, spec.side)
+        r = spec.radius
+        x0, x1 = (x, x + r) if dx < 0 else (x - r, x)
+        y0, y1 = (y, y + r) if dy < 0 else (y - r, y)
+        return (x0, y0, x1, y1, x, y, r * r, spec.name)
+
+    if spec.kind == "edge":
+        if spec.side in ("top", "bottom"):
+            x0 = left + int(spec.start * display.width)
+            x1 = left + int(spec.end * display.width) - 1
+            y0, y1 = (top, top + t) if spec.side == "top" else (bottom + 1 - t, bottom)
+        else:
+            y0 = top + int(spec.start * display.height)
+            y1 = top + int(spec.end * display.height) - 1
+            x0, x1 = (left, left + t) if spec.side == "left" else (right + 1 - t, right)
+        return (x0, y0, x1, y1, 0, 0, -1, spec.name)
+
+    # Rectangle, relative to the display origin
+    x, y, width, height = spec.rect
+    return (left + x, top + y, left + x + width - 1, top + y + height - 1, 0, 0, -1, spec.name)
+
+
+def _prune(cx: int, cy: int, regions: List[Region]) -> Tuple[Region, ...]:
+    """Drop regions shadowed by an earlier region covering the whole cell"""
+    cell_x0, cell_y0 = cx << CELL_SHIFT, cy << CELL_SHIFT
+    cell_x1, cell_y1 = cell_x0 + (1 << CELL_SHIFT) - 1, cell_y0 + (1 << CELL_SHIFT) - 1
+    kept = []
+    for region in regions:
+        kept.append(region)
+        x0, y0, x1, y1, _, _, r2 = region[:7]
+        if r2 < 0 and x0 <= cell_x0 and y0 <= cell_y0 and x1 >= cell_x1 and y1 >= cell_y1:
+            break
+    return tuple(kept)
+
+
+class ZoneTable:
+    """Spatial index of every zone on every display.
+
+    Configured zones take precedence over the built-in corners and are
+    checked in config order.
+    """
+
+    def __init__(self, displays: Sequence[Display], threshold: int,
+                 zones: Sequence[ZoneSpec] = ()):
+        self.displays = tuple(displays)
+        self.threshold = threshold
+        self.zones = tuple(zones)
+        self.regions: List[Tuple[int, str, int, int, int, int]] = []
+        self.shapes: List[Region] = []  # same order as regions, i.e. by precedence
+        grid: Dict[int, Dict[int, List[Region]]] = {}
+
+        for spec in list(self.zones) + corner_zones():
+            if spec.display is not None:
+                if not 0 <= spec.display < len(self.displays):
+                    logger.warning("Zone %s is on display %d, which is not connected",
+                                   spec.name, spec.display)
+                    continue
+                targets = (self.displays[spec.display],)
+            else:
+                targets = self.displays
+            for display in targets:
+                region = _region(spec, display, self.displays, threshold)
+                if region is None:
+                    continue
+                x0, y0, x1, y1 = region[:4]
+                if x1 < x0 or y1 < y0:
+                    continue
+                self.regions.append((display.display_id, spec.name, x0, y0, x1, y1))
+                self.shapes.append(region)
+                for cx in range(x0 >> CELL_SHIFT, (x1 >> CELL_SHIFT) + 1):
+                    for cy in range(y0 >> CELL_SHIFT, (y1 >> CELL_SHIFT) + 1):
+                        grid.setdefault(cx, {}).setdefault(cy, []).append(region)
+
+        # Column-major buckets: small cell indices are cached ints, so a
+        # lookup allocates nothing
+        self._grid = {cx: {cy: _prune(cx, cy, regions) for cy, regions in column.items()}
+                      for cx, column in grid.items()}
+
+    def classify(self, x: float, y: float) -> Optional[str]:
+        """Return the name of the zone containing the point (x, y), or None.
+
+        Fractional coordinates count as the pixel they fall in.
+        """
+        x = floor(x)
+        y = floor(y)
+        column = self._grid.get(x >> 5)
+        if column is None:
+            return None
+        bucket = column.get(y >> 5)
+        if bucket is None:
+            return None
+        for x0, y0, x1, y1, cx, cy, r2, name in bucket:
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                if r2 < 0:
+                    return name
+                dx = x - cx
+                dy = y - cy
+                if dx * dx + dy * dy <= r2:
+                    return name
+        return None
+
+    def nearest(self, x: int, y: int) -> Tuple[float, int, int]:
+        """Distance from (x, y) to the closest zone, and the closest point.
+
+        Arcs are measured to their bounding box, which never overestimates.
+        Returns infinite distance when there are no zones. This scans every
+        region, so it is meant for schedulers, not the per-sample path.
+        """
+        best = float("inf")
+        best_x, best_y = x, y
+        for x0, y0, x1, y1, _, _, _, _ in self.shapes:
+            px = x0 if x < x0 else x1 if x > x1 else x
+            py = y0 if y < y0 else y1 if y > y1 else y
+            d = ((px - x) ** 2 + (py - y) ** 2) ** 0.5
+            if d < best:
+                best, best_x, best_y = d, px, py
+        return best, best_x, best_y
+
+    def actions(self) -> Dict[str, Tuple]:
+        """Actions of the configured zones, by zone name"""
+        return {spec.name: spec.actions for spec in self.zones}
@@ -17,10 +17,16 @@ setup(
         "pynput>=1.7.6",
         "pillow>=9.0.0"
     ],
+    extras_require={
+        "analysis": ["numpy>=1.20"]
+    },
     entry_points={
         "console_scripts": [
-            "firecorners=firecorners.simple_hot_corners:main",
-            "firecorners-config=firecorners.configure:main"
+            "firecorners=firecorners.__main__:main",
+            "firecorners-config=firecorners.configure:main",
+            "firecorners-bench=firecorners.bench:main",
+            "firecorners-compile=firecorners.compiler:main",
+            "firecorners-profile=firecorners.profiles:main"
         ]
     },
     package_data={
@@ -39,11 +45,11 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: MacOS :: MacOS X",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
-        "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
         "Topic :: Desktop Environment :: Window Managers",
     ],
-    python_requires=">=3.6"
+    python_requires=">=3.8"
 )
@@ -0,0 +1,184 @@
+import logging
+import os
+import shlex
+
+from firecorners.actions import (batch_plans, compile_actions, normalize_action,
+                                 normalize_actions, scripts_unchanged, split_command)
+
+
+def _script(value, base=None, checked=None):
+    return normalize_action({"type": "script", "value": value}, base, checked)
+
+
+def test_absolute_script_path_runs_the_executable():
+    action = _script("/usr/local/bin/tidy desktop")
+    assert action["type"] == "Shell Command"
+    assert action["value"] == shlex.quote("/usr/local/bin/tidy desktop")
+
+
+def test_home_script_path_is_expanded():
+    action = _script("~/bin/focus.sh")
+    assert action["type"] == "Shell Command"
+    assert action["value"] == shlex.quote(os.path.expanduser("~/bin/focus.sh"))
+
+
+def test_missing_absolute_script_warns(tmp_path, caplog):
+    path = str(tmp_path / "missing.sh")
+    with caplog.at_level(logging.WARNING):
+        action = _script(path)
+    assert action == {"type": "Shell Command", "value": shlex.quote(path)}
+    assert "Script not found" in caplog.text
+
+
+def test_relative_script_path_to_an_existing_file_runs_it(tmp_path):
+    script = tmp_path / "scripts" / "focus.sh"
+    script.parent.mkdir()
+    script.write_text("#!/bin/sh\n")
+    checked = {}
+    action = _script(os.path.join("scripts", "focus.sh"), str(tmp_path), checked)
+    assert action["type"] == "Shell Command"
+    assert action["value"] == shlex.quote(str(script))
+    assert checked == {str(script): True}
+
+
+def test_relative_script_path_is_taken_from_the_config_folder(tmp_path, monkeypatch):
+    (tmp_path / "focus.sh").write_text("#!/bin/sh\n")
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(tmp_path)
+    assert _script("focus.sh", str(elsewhere))["type"] == "AppleScript"
+    monkeypatch.chdir(elsewhere)
+    assert _script("focus.sh", str(tmp_path))["type"] == "Shell Command"
+
+
+def test_scripts_unchanged_until_a_checked_path_appears(tmp_path):
+    checked = {}
+    _script("focus.sh", str(tmp_path), checked)
+    assert checked == {str(tmp_path / "focus.sh"): False}
+    assert scripts_unchanged(checked.items())
+    (tmp_path / "focus.sh").write_text("#!/bin/sh\n")
+    assert not scripts_unchanged(checked.items())
+
+
+def test_applescript_source_stays_applescript(tmp_path, caplog):
+    source = 'tell application "Safari" to activate'
+    with caplog.at_level(logging.WARNING):
+        action = _script(source, str(tmp_path))
+    assert action == {"type": "AppleScript", "value": source}
+    assert not caplog.records
+
+
+def test_missing_relative_path_warns_and_runs_as_applescript(tmp_path, caplog):
+    with caplog.at_level(logging.WARNING):
+        action = _script(os.path.join("scripts", "missing.sh"), str(tmp_path))
+    assert action["type"] == "AppleScript"
+    assert "no such file" in caplog.text
+
+
+def test_multiline_applescript_with_a_slash_does_not_warn(tmp_path, caplog):
+    source = 'set x to 4 / 2\ndisplay dialog x'
+    with caplog.at_level(logging.WARNING):
+        assert _script(source, str(tmp_path))["type"] == "AppleScript"
+    assert not caplog.records
+
+
+def test_aliases_and_invalid_actions():
+    actions = normalize_actions([{"type": "url", "value": "https://example.com"},
+                                 {"type": "app", "value": "Safari"},
+                                 {"type": "shell", "value": "true"},
+                                 {"type": "nonsense", "value": "x"},
+                                 {"type": "url"}], "top_left")
+    assert [action["type"] for action in actions] == ["URL", "Application", "Shell Command"]
+    assert normalize_actions({"type": "url", "value": "https://example.com"}) == [
+        {"type": "URL", "value": "https://example.com"}]
+    assert normalize_actions("https://example.com", "top_left") == []
+
+
+def _kinds(plans):
+    return [(plan.kind, plan.wait) for plan in plans]
+
+
+def test_urls_of_a_stage_open_with_one_launch_at_the_first_url():
+    plans = compile_actions([{"type": "url", "value": "https://a.example"},
+                             {"type": "shell", "value": "true"},
+                             {"type": "url", "value": "https://b.example"}])
+    assert _kinds(plans) == [("URL", False), ("Shell Command", False)]
+    assert plans[0].args == ("open", "https://a.example", "https://b.example")
+
+
+def test_urls_with_different_timeouts_are_not_merged():
+    plans = compile_actions([{"type": "url", "value": "https://a.example", "timeout": 5},
+                             {"type": "url", "value": "https://b.example"},
+                             {"type": "url", "value": "https://c.example", "timeout": 5}])
+    assert [plan.args for plan in plans] == [
+        ("open", "https://a.example", "https://c.example"), ("open", "https://b.example")]
+
+
+def test_merging_never_crosses_a_wait():
+    plans = compile_actions([{"type": "url", "value": "https://a.example"},
+                             {"type": "applescript", "value": "beep"},
+                             {"type": "url", "value": "https://b.example", "wait": True},
+                             {"type": "applescript", "value": "beep 2"},
+                             {"type": "url", "value": "https://c.example"}])
+    assert _kinds(plans) == [("URL", False), ("AppleScript", False),
+                             ("URL", True), ("AppleScript", False)]
+    assert plans[0].args == ("open", "https://a.example")
+    assert plans[2].args == ("open", "https://b.example", "https://c.example")
+
+
+def test_only_the_first_plan_of_a_stage_waits():
+    plans = compile_actions([{"type": "shell", "value": "true"},
+                             {"type": "applescript", "value": "beep", "wait": True},
+                             {"type": "applescript", "value": "beep 2"}])
+    assert _kinds(plans) == [("Shell Command", False), ("AppleScript", True)]
+
+
+def test_consecutive_applescripts_run_as_one_script():
+    plans = compile_actions([{"type": "applescript", "value": "beep", "timeout": 2},
+                             {"type": "applescript", "value": "say \"hi\"", "timeout": 3},
+                             {"type": "shell", "value": "true"},
+                             {"type": "applescript", "value": "beep 3"}])
+    assert _kinds(plans) == [("AppleScript", False), ("Shell Command", False),
+                             ("AppleScript", False)]
+    merged = plans[0]
+    assert merged.args == ("osascript", "-e", merged.script)
+    assert merged.timeout == 5
+    lines = merged.script.splitlines()
+    assert lines.count("try") == 2
+    assert lines.index("    beep") < lines.index('    say "hi"')
+    assert lines[-1] == "if fcErrors is not {} then error (fcErrors as text)"
+
+
+def test_applescript_without_a_timeout_keeps_the_merged_one_unlimited():
+    plans = compile_actions([{"type": "applescript", "value": "beep", "timeout": 2},
+                             {"type": "applescript", "value": "beep 2"}])
+    assert len(plans) == 1
+    assert plans[0].timeout is None
+
+
+def test_applescript_handlers_are_not_merged():
+    handler = "on run\n    beep\nend run"
+    plans = compile_actions([{"type": "applescript", "value": "beep"},
+                             {"type": "applescript", "value": handler},
+                             {"type": "applescript", "value": "beep 2"}])
+    assert [plan.value for plan in plans] == ["beep", handler, "beep 2"]
+
+
+def test_batching_a_batched_corner_changes_nothing():
+    plans = compile_actions([{"type": "url", "value": "https://a.example"},
+                             {"type": "url", "value": "https://b.example"},
+                             {"type": "applescript", "value": "beep"},
+                             {"type": "applescript", "value": "beep 2", "wait": True}])
+    assert batch_plans(plans) == plans
+
+
+def test_shell_commands_without_shell_syntax_are_split():
+    assert split_command("open -a 'Mission Control'") == ("open", "-a", "Mission Control")
+    assert split_command("ls | wc -l") is None
+    assert split_command("cd /tmp") is None
+    assert split_command("FOO=1 env") is None
+    assert split_command("echo 'unterminated") is None
+    plan, = compile_actions([{"type": "shell", "value": "echo $HOME"}])
+    assert plan.shell and plan.args == "echo $HOME"
+    plan, = compile_actions([{"type": "shell", "value": "say hello"}])
+    assert not plan.shell and plan.args == ("say", "hello")
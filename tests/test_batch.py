@@ -0,0 +1,126 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from firecorners.batch import classify_batch, detect_batch, detect_trace, trace_arrays  # noqa: E402
+from firecorners.detector import CornerDetector  # noqa: E402
+from firecorners.geometry import Display, single_display  # noqa: E402
+from firecorners.tracefile import TraceWriter, open_trace  # noqa: E402
+from firecorners.zones import ZoneTable, parse_zone  # noqa: E402
+
+DOCKED = [Display(1, 0, 0, 1920, 1080), Display(2, 1920, 0, 2560, 1440)]
+LAPTOP = single_display(1440, 900)
+
+
+def _walk(rng, start, count, width, height):
+    """Random moves with visits of varying length to the corners"""
+    corners = [(0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)]
+    samples = []
+    t = start
+    while len(samples) < count:
+        if rng.random() < 0.1:
+            cx, cy = rng.choice(corners)
+            points = [(cx + rng.randint(-3, 3), cy + rng.randint(-3, 3))
+                      for _ in range(rng.randint(1, 20))]
+        else:
+            points = [(rng.randrange(width), rng.randrange(height))]
+        for x, y in points:
+            t += rng.uniform(0.005, 0.05)
+            samples.append((t, x, y))
+    return samples[:count]
+
+
+def _write_trace(path):
+    rng = random.Random(7)
+    first = _walk(rng, 1000.0, 3000, 4480, 1440)
+    second = _walk(rng, first[-1][0] + 1, 3000, 1440, 900)
+    with TraceWriter(path, DOCKED) as writer:
+        for sample in first:
+            writer.write(*sample)
+        writer.set_displays(LAPTOP, timestamp=second[0][0] - 0.5)
+        for sample in second:
+            writer.write(*sample)
+    return first, second
+
+
+def test_trace_arrays_outlive_the_trace(tmp_path):
+    path = str(tmp_path / "t.fct")
+    first, second = _write_trace(path)
+    with open_trace(path) as trace:
+        ts, xs, ys = trace_arrays(trace)
+    assert len(ts) == len(xs) == len(ys) == len(first) + len(second)
+    assert list(xs[:3]) == [x for _, x, _ in first[:3]]
+    assert ys[-1] == second[-1][2]
+    assert ts[0] == pytest.approx(first[0][0])
+
+
+def test_close_fails_while_arrays_still_map_the_trace(tmp_path):
+    path = str(tmp_path / "t.fct")
+    _write_trace(path)
+    trace = open_trace(path)
+    xs = np.asarray(trace.segments[0].xs)
+    with pytest.raises(BufferError):
+        trace.close()
+    del xs
+    trace.close()
+
+
+def test_detect_trace_matches_the_live_detector(tmp_path):
+    path = str(tmp_path / "t.fct")
+    first, second = _write_trace(path)
+    detector = CornerDetector(DOCKED, threshold=5, cooldown=1.0, dwell=0.1)
+    expected = []
+    for i, (t, x, y) in enumerate(first + second):
+        if i == len(first):
+            detector.set_displays(LAPTOP)
+        if detector.update(t, x, y):
+            expected.append(i)
+
+    with open_trace(path) as trace:
+        results = detect_trace(trace, ZoneTable(trace.displays, 5), cooldown=1.0, dwell=0.1,
+                               chunk=1000)
+    triggers = []
+    offset = 0
+    for result in results:
+        triggers += [offset + int(i) for i in result.triggers]
+        offset += len(result.zones)
+    assert triggers == expected
+    # Both layouts fire
+    assert min(expected) < len(first) <= max(expected)
+
+
+def test_chunks_match_a_single_pass():
+    rng = random.Random(3)
+    samples = _walk(rng, 500.0, 5000, 1920, 1080)
+    ts, xs, ys = (np.array(column) for column in zip(*samples))
+    table = ZoneTable(single_display(1920, 1080), 5)
+    whole = detect_batch(ts, xs, ys, table, 1.0, 0.1, hysteresis=0.05)
+    state = None
+    triggers = []
+    for start in range(0, len(ts), 333):
+        part = detect_batch(ts[start:start + 333], xs[start:start + 333], ys[start:start + 333],
+                            table, 1.0, 0.1, state, hysteresis=0.05)
+        triggers += [start + int(i) for i in part.triggers]
+        state = part.state
+    assert triggers == list(whole.triggers)
+
+
+def test_fractional_coordinates_classify_like_the_zone_table():
+    displays = [Display(1, 0, 0, 100, 80), Display(2, -1280, -200, 1280, 1024)]
+    table = ZoneTable(displays, 5, [parse_zone({"name": "round", "arc": "top_right",
+                                                "display": 1, "radius": 40})])
+    rng = random.Random(5)
+    points = [(-0.5, -0.5), (-1280.25, 823.75), (4.99, 5.01)]
+    points += [(rng.uniform(-1300, 120), rng.uniform(-220, 840)) for _ in range(5000)]
+    points += [(rng.uniform(-10, 10) + cx, rng.uniform(-10, 10) + cy)
+               for cx, cy in [(0, 0), (100, 0), (0, 80), (100, 80), (-1280, -200), (0, 824)]
+               for _ in range(500)]
+    xs, ys = (np.array(column) for column in zip(*points))
+    names, zones = classify_batch(table, xs, ys)
+    batch = [names[zone] if zone >= 0 else None for zone in zones]
+    assert batch == [table.classify(x, y) for x, y in points]
+    names, zones = classify_batch(ZoneTable(single_display(100, 80), 5), [4.5, 99.5],
+                                  [0.5, 79.9])
+    assert [names[zone] for zone in zones] == ["top_left", "bottom_right"]
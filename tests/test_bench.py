@@ -0,0 +1,26 @@
+import pytest
+
+from firecorners import bench
+from firecorners.geometry import CORNERS
+
+
+def test_hotpath_runs_triggers_through_the_executor():
+    samples = bench.workload_fitts_flicks(20000)
+    result = bench.bench_hotpath("fitts_flicks", samples)
+    assert result["triggers"] > 0
+    # Every trigger runs its corner's URL and shell command plans
+    assert result["launches"] == 2 * result["triggers"]
+    assert 0 < result["trigger_to_launch_ms_p50"] <= result["trigger_to_launch_ms_p99"]
+
+
+@pytest.mark.parametrize("workload", sorted(bench.WORKLOADS))
+def test_every_workload_triggers_all_four_corners(workload):
+    samples = bench.WORKLOADS[workload](50000)
+    assert all(0 <= x < bench.SCREEN_WIDTH and 0 <= y < bench.SCREEN_HEIGHT
+               for _, x, y in samples)
+    result = bench.bench_hotpath(workload, samples)
+    assert set(result["corner_triggers"]) == set(CORNERS)
+    assert sum(result["corner_triggers"].values()) == result["triggers"]
+    # Triggers wait for the dwell time after entering a corner, at least
+    assert result["entry_to_dispatch_ms_p50"] >= bench.DWELL * 1000
+    assert result["entry_to_dispatch_ms_p50"] <= result["entry_to_dispatch_ms_p99"]
@@ -0,0 +1,92 @@
+import os
+import plistlib
+
+from firecorners.catalog import ApplicationCatalog
+
+
+def _app(folder, name, **info):
+    path = folder / f"{name}.app"
+    (path / "Contents").mkdir(parents=True)
+    if info:
+        with open(path / "Contents" / "Info.plist", "wb") as f:
+            plistlib.dump(info, f)
+    return str(path)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_resolves_file_bundle_and_display_names_and_identifiers(tmp_path):
+    path = _app(tmp_path, "Visual Studio Code", CFBundleName="Code",
+                CFBundleIdentifier="com.microsoft.VSCode")
+    catalog = ApplicationCatalog([str(tmp_path)])
+    for name in ("Visual Studio Code", "visual studio code.app", "code", "com.microsoft.vscode"):
+        assert catalog.resolve(name) == path
+    assert catalog.resolve(path) == path
+    assert catalog.application_args("Code") == ("open", "-a", path)
+
+
+def test_file_names_beat_names_from_info_plist(tmp_path):
+    notes = _app(tmp_path, "Notes")
+    _app(tmp_path, "Notes Helper", CFBundleName="Notes")
+    assert ApplicationCatalog([str(tmp_path)]).resolve("Notes") == notes
+
+
+def test_earlier_roots_win_and_subfolders_are_scanned_one_level_deep(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    (second / "Utilities" / "Deeper").mkdir(parents=True)
+    first.mkdir()
+    mine = _app(first, "Terminal")
+    _app(second, "Terminal")
+    console = _app(second / "Utilities", "Console")
+    _app(second / "Utilities" / "Deeper", "Hidden")
+    catalog = ApplicationCatalog([str(first), str(second)])
+    assert catalog.resolve("Terminal") == mine
+    assert catalog.resolve("Console") == console
+    assert catalog.resolve("Hidden") is None
+    assert sorted(catalog.folders()) == [str(first), str(second), str(second / "Utilities")]
+
+
+def test_a_miss_refreshes_at_most_every_min_interval(tmp_path):
+    clock = _Clock()
+    catalog = ApplicationCatalog([str(tmp_path)], min_interval=5.0, clock=clock)
+    assert catalog.resolve("Safari") is None
+    path = _app(tmp_path, "Safari")
+    clock.now += 1
+    assert catalog.resolve("Safari") is None  # refreshed too recently
+    clock.now += 5
+    assert catalog.resolve("Safari") == path
+    assert catalog.counters() == {"hits": 1, "misses": 2, "rescans": 2}
+
+
+def test_refresh_only_rescans_changed_folders(tmp_path):
+    (tmp_path / "Utilities").mkdir()
+    catalog = ApplicationCatalog([str(tmp_path)])
+    assert catalog.rescans == 2
+    assert not catalog.refresh()
+    assert catalog.rescans == 2
+    _app(tmp_path / "Utilities", "Console")
+    assert catalog.refresh()
+    assert catalog.rescans == 3
+    assert "console" in catalog.applications()
+
+
+def test_moved_bundles_are_looked_up_again_at_launch(tmp_path):
+    clock = _Clock()
+    old = _app(tmp_path, "Mail")
+    catalog = ApplicationCatalog([str(tmp_path)], clock=clock)
+    args = catalog.application_args("Mail")
+    assert catalog.launch_args(args, "Mail") == args
+    os.rename(old, tmp_path / "Mail Old.app")
+    (tmp_path / "Elsewhere").mkdir()
+    new = str(tmp_path / "Elsewhere" / "Mail.app")
+    os.rename(tmp_path / "Mail Old.app", new)
+    clock.now += 10
+    assert catalog.launch_args(args, "Mail") == ("open", "-a", new)
+    # A bundle path that is gone is looked up by name
+    assert catalog.resolve(old) == new
@@ -0,0 +1,176 @@
+import json
+import os
+import shlex
+
+from firecorners.catalog import ApplicationCatalog
+from firecorners.compiler import (BackgroundCompiler, artifact_path, compile_file,
+                                  load_snapshot, main, read_config)
+from firecorners.plugins import PluginRegistry
+
+CONFIG = {
+    "top_left": [{"type": "app", "value": "Notes"}],
+    "top_right": {"type": "url", "value": "https://example.com"},
+    "bottom_left": [{"type": "python", "value": "dashboards"}],
+    "profiles": {"quiet": {"top_left": []}},
+}
+
+
+def _write(path, config):
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+class _Catalogs:
+    """catalog_for for one root, remembering the catalog it built"""
+
+    def __init__(self, root):
+        self.catalog = ApplicationCatalog([str(root)])
+
+    def __call__(self, roots):
+        return self.catalog
+
+
+def _setup(tmp_path):
+    apps = tmp_path / "Applications"
+    apps.mkdir()
+    (apps / "Notes.app").mkdir()
+    config = dict(CONFIG, settings={"application_roots": [str(apps)]})
+    return _write(tmp_path / "config.json", config), apps
+
+
+def test_artifact_round_trip(tmp_path):
+    source, apps = _setup(tmp_path)
+    catalogs, plugins = _Catalogs(apps), PluginRegistry()
+    compiled, _, fresh = load_snapshot(source, catalog_for=catalogs, plugins=plugins)
+    assert not fresh
+    assert os.path.exists(artifact_path(source))
+    loaded, diff, fresh = load_snapshot(source, catalog_for=catalogs, plugins=plugins)
+    assert fresh
+    assert loaded.config == compiled.config
+    assert dict(loaded.plans) == dict(compiled.plans)
+    assert dict(loaded.profiles["quiet"].plans) == dict(compiled.profiles["quiet"].plans)
+    assert loaded.plans["top_left"][0].args == ("open", "-a", str(apps / "Notes.app"))
+
+
+def test_edited_config_is_compiled_again(tmp_path):
+    source, apps = _setup(tmp_path)
+    catalogs = _Catalogs(apps)
+    load_snapshot(source, catalog_for=catalogs)
+    config = json.loads(open(source).read())
+    config["top_right"] = {"type": "url", "value": "https://example.org"}
+    _write(tmp_path / "config.json", config)
+    snapshot, _, fresh = load_snapshot(source, catalog_for=catalogs)
+    assert not fresh
+    assert snapshot.plans["top_right"][0].args == ("open", "https://example.org")
+
+
+def test_artifact_is_stale_once_applications_change(tmp_path):
+    source, apps = _setup(tmp_path)
+    catalogs = _Catalogs(apps)
+    load_snapshot(source, catalog_for=catalogs)
+    os.rename(apps / "Notes.app", apps / "Notes Old.app")
+    (tmp_path / "Elsewhere").mkdir()
+    os.rename(apps / "Notes Old.app", tmp_path / "Elsewhere" / "Notes.app")
+    catalogs.catalog.refresh()
+    snapshot, _, fresh = load_snapshot(source, catalog_for=catalogs)
+    assert not fresh
+    assert snapshot.plans["top_left"][0].args == ("open", "-a", "Notes")
+    # And fresh again against the new index
+    assert load_snapshot(source, catalog_for=catalogs)[2]
+
+
+def test_artifact_is_stale_once_plugins_change(tmp_path):
+    source, apps = _setup(tmp_path)
+    catalogs, plugins = _Catalogs(apps), PluginRegistry()
+    load_snapshot(source, catalog_for=catalogs, plugins=plugins)
+    plugins.register("dashboards", lambda: True)
+    assert not load_snapshot(source, catalog_for=catalogs, plugins=plugins)[2]
+    assert load_snapshot(source, catalog_for=catalogs, plugins=plugins)[2]
+
+
+def test_artifact_is_stale_once_a_relative_script_appears(tmp_path):
+    source, apps = _setup(tmp_path)
+    config = json.loads(open(source).read())
+    config["bottom_right"] = {"type": "script", "value": "focus.sh"}
+    config["zones"] = [{"name": "dock", "edge": "bottom",
+                        "actions": [{"type": "script", "value": "dock.sh"}]}]
+    _write(tmp_path / "config.json", config)
+    catalogs = _Catalogs(apps)
+    snapshot, _, _ = load_snapshot(source, catalog_for=catalogs)
+    assert snapshot.plans["bottom_right"][0].kind == "AppleScript"
+    assert load_snapshot(source, catalog_for=catalogs)[2]
+
+    (tmp_path / "focus.sh").write_text("#!/bin/sh\n")
+    assert not load_snapshot(source, catalog_for=catalogs)[2]
+    assert read_config(source)["bottom_right"] == [
+        {"type": "Shell Command", "value": shlex.quote(str(tmp_path / "focus.sh"))}]
+    snapshot, _, fresh = load_snapshot(source, catalog_for=catalogs)
+    assert fresh
+    assert snapshot.plans["bottom_right"][0].kind == "Shell Command"
+
+    # Zone scripts are compiled, not normalized with the corners
+    (tmp_path / "dock.sh").write_text("#!/bin/sh\n")
+    snapshot, _, fresh = load_snapshot(source, previous=snapshot, catalog_for=catalogs)
+    assert not fresh
+    assert snapshot.plans["dock"][0].kind == "Shell Command"
+
+
+def test_read_config_needs_only_the_config_to_match(tmp_path):
+    source, apps = _setup(tmp_path)
+    load_snapshot(source, catalog_for=_Catalogs(apps), plugins=PluginRegistry())
+    # Read from the artifact, whatever the catalog and plugins know now
+    with open(artifact_path(source), "r+b") as f:
+        artifact = bytearray(f.read())
+        artifact[artifact.index(b"https://example.com")] = ord("H")
+        f.seek(0)
+        f.write(artifact)
+    config = read_config(source)
+    assert config["top_right"] == [{"type": "URL", "value": "Https://example.com"}]
+
+
+def test_checking_a_config_writes_no_artifact(tmp_path, capsys):
+    source, apps = _setup(tmp_path)
+    snapshot = compile_file(source, write=False)
+    assert "top_left" in snapshot.plans
+    assert main([source, "--check"]) == 1  # the Python action is not installed
+    assert "Python action not found: dashboards" in capsys.readouterr().err
+    assert not os.path.exists(artifact_path(source))
+
+
+def _daemon_catalog(roots):
+    return ApplicationCatalog(roots)
+
+
+def test_the_compile_command_writes_an_artifact_the_daemon_loads(tmp_path, capsys):
+    source, apps = _setup(tmp_path)
+    assert main([source]) == 1
+    assert f"Wrote {artifact_path(source)}" in capsys.readouterr().out
+    snapshot, _, fresh = load_snapshot(source, catalog_for=_daemon_catalog,
+                                       plugins=PluginRegistry())
+    assert fresh
+    assert snapshot.plans["top_left"][0].args == ("open", "-a", str(apps / "Notes.app"))
+
+
+def test_background_compiler_compiles_the_last_save(tmp_path):
+    source, apps = _setup(tmp_path)
+    compiler = BackgroundCompiler(source)
+    for value in ("https://example.org", "https://example.net"):
+        config = json.loads(open(source).read())
+        config["top_right"] = {"type": "url", "value": value}
+        _write(tmp_path / "config.json", config)
+        compiler.request()
+        compiler.request()
+    assert compiler.wait(10.0)
+    snapshot, _, fresh = load_snapshot(source, catalog_for=_daemon_catalog,
+                                       plugins=PluginRegistry(), write=False)
+    assert fresh
+    assert snapshot.plans["top_right"][0].args == ("open", "https://example.net")
+
+
+def test_background_compiler_logs_invalid_configs(tmp_path, caplog):
+    source = _write(tmp_path / "config.json", [])
+    compiler = BackgroundCompiler(source)
+    compiler.request()
+    assert compiler.wait(10.0)
+    assert "Could not compile" in caplog.text
+    assert not os.path.exists(artifact_path(source))
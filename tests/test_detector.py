@@ -0,0 +1,37 @@
+from firecorners.detector import CornerDetector, replay
+from firecorners.geometry import single_display
+from firecorners.pointer import ReplayPointerSource
+
+
+def test_replay_fires_once_per_visit_after_dwell():
+    detector = CornerDetector(single_display(1920, 1080), threshold=5, cooldown=1.0, dwell=0.2)
+    samples = [(t + 100.0, x, y) for t, x, y in [
+        (0.0, 500, 500), (0.1, 0, 0), (0.2, 1, 1), (0.35, 2, 2), (0.5, 2, 2),
+        (0.6, 500, 500), (2.0, 1919, 1079), (2.5, 1919, 1079)]]
+    fired = []
+    count, triggers, _ = replay(ReplayPointerSource(samples), detector,
+                                lambda corner, t: fired.append((corner, t)))
+    assert count == len(samples)
+    assert fired == [("top_left", 100.35), ("bottom_right", 102.5)]
+    assert triggers == 2
+
+
+def test_float_coordinates_are_classified_by_the_pixel_they_fall_in():
+    detector = CornerDetector(single_display(1920, 1080), threshold=5)
+    assert detector.classify(0.4, 0.9) == "top_left"
+    assert detector.classify(1919.5, 1079.99) == "bottom_right"
+    assert detector.classify(5.5, 5.5) == "top_left"
+    assert detector.classify(6.0, 500.25) is None
+    assert detector.update(100.0, 0.5, 0.5) is None
+    assert detector.update(101.0, 0.5, 0.5) == "top_left"
+
+
+def test_float_coordinates_left_of_the_origin():
+    from firecorners.geometry import Display
+    # A taller display on the left, whose bottom right corner sticks out
+    displays = [Display(1, -1280, -200, 1280, 1400), Display(2, 0, 0, 1920, 1080)]
+    detector = CornerDetector(displays, threshold=5)
+    # -0.5 lies in the left display's last column, not the main display's first
+    assert detector.classify(-0.5, 1199.5) == "bottom_right"
+    assert detector.classify(0.5, 1199.5) is None
+    assert detector.classify(-1280.0, -200.0) == "top_left"
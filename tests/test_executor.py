@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+
+from firecorners.actions import compile_action
+from firecorners.executor import DEFAULT_TIMEOUT, ActionExecutor
+
+
+def _shell(command, **options):
+    return compile_action(dict({"type": "Shell Command", "value": command}, **options))
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_actions_run_as_long_as_they_take_by_default():
+    assert DEFAULT_TIMEOUT is None
+    executor = ActionExecutor(workers=1)
+    executor.submit("top_left", [_shell("sleep 0.3; exit 0")])
+    _wait_for(lambda: executor.completed == 1)
+    assert executor.counters()["timed_out"] == 0
+    assert executor.failed == 0
+    executor.shutdown(wait=True)
+
+
+def test_timeout_kills_the_action_and_what_it_started(tmp_path):
+    pid_file = tmp_path / "pid"
+    executor = ActionExecutor(workers=1)
+    started = time.monotonic()
+    executor.submit("top_left", [_shell(f"sleep 30 & echo $! > {pid_file}; wait",
+                                        timeout=0.3)])
+    _wait_for(lambda: executor.completed == 1)
+    assert time.monotonic() - started < 5.0
+    assert executor.timed_out == 1 and executor.failed == 1
+    background = int(pid_file.read_text())
+    _wait_for(lambda: not _alive(background))
+    executor.shutdown(wait=True)
+
+
+def test_executor_default_timeout_applies_to_actions_without_one():
+    executor = ActionExecutor(workers=1, timeout=0.2)
+    executor.submit("top_left", [_shell("sleep 30")])
+    executor.submit("top_right", [_shell("sleep 0.5", timeout=5)])
+    _wait_for(lambda: executor.completed == 2)
+    assert executor.timed_out == 1
+    assert executor.failed == 1
+    executor.shutdown(wait=True)
+
+
+def test_stage_after_a_coalesced_action_waits_for_its_twin(tmp_path):
+    executor = ActionExecutor(workers=4, rate=None)
+    slow = _shell(f"sleep 0.4 && touch {tmp_path / 'slow-done'}")
+    after = _shell(f"test -e {tmp_path / 'slow-done'} && touch {tmp_path / 'ok'}"
+                   f" || touch {tmp_path / 'too-early'}", wait=True)
+    executor.submit("top_left", [slow])
+    _wait_for(lambda: executor.in_flight == 1)
+    executor.submit("top_left", [slow, after])
+    _wait_for(lambda: executor.completed == 2)
+    assert executor.coalesced == 1
+    assert (tmp_path / "ok").exists()
+    assert not (tmp_path / "too-early").exists()
+    executor.shutdown()
+
+
+def test_identical_actions_of_other_corners_are_not_coalesced(tmp_path):
+    executor = ActionExecutor(workers=4, rate=None)
+    plan = _shell("sleep 0.2")
+    executor.submit("top_left", [plan])
+    executor.submit("top_right", [plan])
+    _wait_for(lambda: executor.completed == 2)
+    assert executor.coalesced == 0
+    executor.shutdown()
+
+
+def test_corner_single_flight_drops_a_trigger_while_one_runs():
+    executor = ActionExecutor(workers=2, rate=None, single_flight="corner")
+    assert executor.submit("top_left", [_shell("sleep 0.3")])
+    assert not executor.submit("top_left", [_shell("true")])
+    _wait_for(lambda: executor.completed == 1)
+    assert executor.submit("top_left", [_shell("true")])
+    _wait_for(lambda: executor.completed == 2)
+    assert executor.coalesced == 1
+    executor.shutdown()
+
+
+def test_without_single_flight_identical_actions_overlap(tmp_path):
+    executor = ActionExecutor(workers=2, rate=None, single_flight=None)
+    plan = _shell(f"echo x >> {tmp_path / 'runs'}; sleep 0.2")
+    executor.submit("top_left", [plan])
+    executor.submit("top_left", [plan])
+    _wait_for(lambda: executor.completed == 2)
+    assert (tmp_path / "runs").read_text() == "x\nx\n"
+    assert not executor._running
+    executor.shutdown()
+
+
+def test_rate_limit_allows_a_burst_then_the_rate():
+    now = [100.0]
+    executor = ActionExecutor(workers=1, clock=lambda: now[0], rate=2.0, burst=3,
+                              single_flight=None)
+    accepted = [executor.submit("top_left", [_shell("true")]) for _ in range(5)]
+    assert accepted == [True, True, True, False, False]
+    now[0] += 0.5  # one token back
+    assert executor.submit("top_left", [_shell("true")])
+    assert not executor.submit("top_left", [_shell("true")])
+    # Corners have buckets of their own
+    assert executor.submit("top_right", [_shell("true")])
+    assert executor.rate_limited == 3
+    _wait_for(lambda: executor.completed == 5)
+    executor.shutdown()
+
+
+def test_max_children_caps_processes_running_at_once(tmp_path):
+    executor = ActionExecutor(workers=4, rate=None, max_children=1)
+    for i in range(3):
+        executor.submit("top_left", [_shell(f"sleep 0.1; echo {i}")])
+    _wait_for(lambda: executor.completed == 3)
+    assert executor.throttled >= 1
+    assert executor.gauges()["children"] == 0
+    executor.shutdown()
+
+
+class _HungProcess:
+    """An action that never exits until ``release`` is set"""
+
+    stdout = None
+    pid = 0
+
+    def __init__(self, release):
+        self.release = release
+
+    def wait(self, timeout=None):
+        self.release.wait()
+        return 0
+
+
+def test_shutdown_returns_with_a_full_queue_and_hung_workers():
+    release = threading.Event()
+    executor = ActionExecutor(workers=2, max_pending=2, rate=None, single_flight=None,
+                              max_children=2, popen=lambda *args, **kwargs: _HungProcess(release))
+    for corner in ("top_left", "top_right"):
+        assert executor.submit(corner, [_shell("hang")])
+    _wait_for(lambda: executor.in_flight == 2)
+    assert executor.submit("bottom_left", [_shell("hang")])
+    assert executor.submit("bottom_right", [_shell("hang")])
+    assert not executor.submit("top_left", [_shell("hang", wait=True)])  # queue full
+
+    started = time.monotonic()
+    executor.shutdown()
+    assert time.monotonic() - started < 1.0
+    assert executor.dropped == 3
+    assert not executor.submit("top_left", [_shell("true")])
+    assert executor.dropped == 4
+
+    release.set()
+    for thread in executor._threads:
+        thread.join(5.0)
+        assert not thread.is_alive()
+    assert executor.completed == 2
+
+
+def test_shutdown_with_wait_starts_the_queued_actions_first(tmp_path):
+    executor = ActionExecutor(workers=2, max_pending=4, rate=None, single_flight=None)
+    for i in range(4):
+        executor.submit("top_left", [_shell(f"sleep 0.1; touch {tmp_path / str(i)}")])
+    executor.shutdown(wait=True)
+    assert executor.completed == 4
+    assert sorted(os.listdir(tmp_path)) == ["0", "1", "2", "3"]
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from firecorners.detector import CornerDetector
+from firecorners.geometry import CORNERS, Display, FakeDisplayMonitor, covered, single_display
+from firecorners.zones import ZoneTable
+
+LAYOUTS = {
+    "single": single_display(1920, 1080),
+    "side_by_side": [Display(1, 0, 0, 1920, 1080), Display(2, 1920, 0, 1920, 1080)],
+    "left_of_main": [Display(1, 0, 0, 1440, 900), Display(2, -2560, -300, 2560, 1440)],
+    "stacked": [Display(1, 0, 0, 1920, 1080), Display(2, 320, -1440, 2560, 1440)],
+    "offset_heights": [Display(1, 0, 0, 1920, 1080), Display(2, 1920, 200, 1280, 1024),
+                       Display(3, -1080, -420, 1080, 1920)],
+}
+
+
+def reference_classify(displays, threshold, x, y):
+    """The single-display classifier run on each display, checking every sample"""
+    for display in displays:
+        if not display.contains(x, y):
+            continue
+        lx, ly = x - display.x, y - display.y
+        w, h = display.width, display.height
+        for corner in CORNERS:
+            right, bottom = corner.endswith("right"), corner.startswith("bottom")
+            in_x = lx >= w - threshold if right else lx <= threshold
+            in_y = ly >= h - threshold if bottom else ly <= threshold
+            if not (in_x and in_y):
+                continue
+            # The cursor only stops at a corner no other display continues
+            px = display.x + w - 1 if right else display.x
+            py = display.y + h - 1 if bottom else display.y
+            dx, dy = (1 if right else -1), (1 if bottom else -1)
+            if not covered(displays, px + dx, py) and not covered(displays, px, py + dy):
+                return corner
+    return None
+
+
+def _samples(displays, threshold, rng, count=4000):
+    """Points spread over the layout, concentrated around the display corners"""
+    points = []
+    for display in displays:
+        for corner_x in (display.x, display.x + display.width - 1):
+            for corner_y in (display.y, display.y + display.height - 1):
+                for dx in range(-threshold - 2, threshold + 3):
+                    for dy in range(-threshold - 2, threshold + 3):
+                        points.append((corner_x + dx, corner_y + dy))
+    left = min(d.x for d in displays) - 10
+    right = max(d.x + d.width for d in displays) + 10
+    top = min(d.y for d in displays) - 10
+    bottom = max(d.y + d.height for d in displays) + 10
+    points += [(rng.randrange(left, right), rng.randrange(top, bottom)) for _ in range(count)]
+    return points
+
+
+@pytest.mark.parametrize("name", sorted(LAYOUTS))
+@pytest.mark.parametrize("threshold", [0, 5, 40])
+def test_table_matches_per_sample_reference(name, threshold):
+    displays = LAYOUTS[name]
+    table = ZoneTable(displays, threshold)
+    for x, y in _samples(displays, threshold, random.Random(name)):
+        assert table.classify(x, y) == reference_classify(displays, threshold, x, y), (x, y)
+
+
+def test_seams_between_displays_are_not_corners():
+    table = ZoneTable(LAYOUTS["side_by_side"], 5)
+    assert table.classify(1919, 0) is None
+    assert table.classify(1920, 0) is None
+    assert table.classify(3839, 0) == "top_right"
+    assert {name for _, name, *_ in table.regions} == set(CORNERS)
+
+
+def test_display_changes_rebuild_the_table():
+    monitor = FakeDisplayMonitor(single_display(1920, 1080))
+    detector = CornerDetector(monitor.displays(), threshold=5)
+    monitor.add_listener(detector.set_displays)
+    assert detector.classify(1919, 0) == "top_right"
+
+    monitor.set_displays(LAYOUTS["side_by_side"])
+    assert detector.classify(1919, 0) is None
+    assert detector.classify(3839, 0) == "top_right"
+
+    monitor.set_displays(LAYOUTS["left_of_main"])
+    assert detector.classify(-2560, -300) == "top_left"
+    assert detector.classify(3839, 0) is None
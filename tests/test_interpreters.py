@@ -0,0 +1,126 @@
+import os
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from firecorners.interpreters import InterpreterPool, driver_worker, frame_shell, shell_worker
+from firecorners.output import OutputCapture
+
+BASH = shutil.which("bash")
+needs_bash = pytest.mark.skipif(BASH is None, reason="needs a shell with job control")
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def worker():
+    worker = shell_worker(BASH)
+    worker.start()
+    assert worker.ping()
+    yield worker
+    worker.kill()
+
+
+@needs_bash
+def test_shell_worker_runs_scripts_with_their_output_and_status(worker):
+    capture = OutputCapture()
+    assert worker.run("echo hi; echo there >&2; exit 3", 5.0, capture) == 3
+    assert capture.text() == "hi\nthere\n"
+    capture = OutputCapture()
+    assert worker.run("printf 'no newline'", None, capture) == 0
+    assert capture.text() == "no newline"
+    # Scripts run in subshells and share no state
+    worker.run("FOO=1; cd /", 5.0)
+    capture = OutputCapture()
+    worker.run('echo "${FOO:-unset}"', 5.0, capture)
+    assert capture.text() == "unset\n"
+
+
+@needs_bash
+def test_output_split_across_reads_keeps_its_bytes(worker):
+    capture = OutputCapture(1 << 20)
+    assert worker.run("i=0; while [ $i -lt 2000 ]; do echo line$i; i=$((i+1)); done",
+                      10.0, capture) == 0
+    assert capture.text().splitlines() == [f"line{i}" for i in range(2000)]
+
+
+@needs_bash
+def test_each_script_runs_in_its_own_process_group(worker):
+    capture = OutputCapture()
+    worker.run("ps -o pgid= -p $(sh -c 'echo $PPID')", 5.0, capture)
+    assert int(capture.text()) == worker.job
+    assert os.getpgid(worker.process.pid) == worker.process.pid != worker.job
+
+
+@needs_bash
+def test_timeout_kills_only_the_overrunning_script(worker, tmp_path):
+    earlier = tmp_path / "earlier"
+    started = tmp_path / "started"
+    # Work an earlier script left running in the background
+    assert worker.run(f"sleep 60 >/dev/null & echo $! > {earlier}", 5.0) == 0
+    with pytest.raises(subprocess.TimeoutExpired):
+        worker.run(f"sleep 60 & echo $! > {started}; wait", 0.3)
+    _wait_for(lambda: not _alive(int(started.read_text())))
+    survivor = int(earlier.read_text())
+    assert _alive(survivor)
+    # Discarding the worker after the timeout leaves it running too
+    worker.kill()
+    assert _alive(survivor)
+    os.kill(survivor, 9)
+
+
+@needs_bash
+def test_pool_reuses_workers_and_replaces_timed_out_ones():
+    pool = InterpreterPool("shell", lambda: shell_worker(BASH), size=1)
+    pool.start()
+    assert pool.run("true", 5.0) == 0
+    assert pool.run("exit 4", 5.0) == 4
+    with pytest.raises(subprocess.TimeoutExpired):
+        pool.run("sleep 60", 0.2)
+    assert pool.run("true", 5.0) == 0
+    counters = pool.counters()
+    assert counters["starts"] == 2 and counters["timeouts"] == 1
+    assert counters["warm_runs"] == 3
+    pool.stop()
+
+
+def test_shell_without_job_control_falls_back_to_one_shot():
+    # dash cannot turn job control on without a terminal
+    dash = shutil.which("dash")
+    if dash is None:
+        pytest.skip("needs dash")
+    pool = InterpreterPool("shell", lambda: shell_worker(dash), size=1, max_failures=1)
+    assert pool.run("true", 5.0) is None
+    assert pool.counters()["fallbacks"] == 1
+
+
+def test_fake_driver_worker():
+    pool = InterpreterPool("fake", lambda: driver_worker("fake"), size=1)
+    capture = OutputCapture()
+    assert pool.run("print hello", 10.0, capture) == 0
+    assert capture.text() == "hello"
+    assert pool.run("exit 2", 10.0) == 2
+    # A crash after the script was sent is a failure, not a fallback
+    assert pool.run("crash", 10.0) == -1
+    assert pool.run("exit 0", 10.0) == 0
+    pool.stop()
+
+
+def test_frame_shell_quotes_the_script():
+    frame = frame_shell("echo 'it''s'", "tok").decode()
+    assert "eval 'echo '\\''it'\\'''\\''s'\\'''" in frame
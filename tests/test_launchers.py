@@ -0,0 +1,105 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from firecorners.actions import compile_action
+from firecorners.executor import ActionExecutor
+from firecorners.launchers import (MODIFIERS, KeyCombo, NativeLauncher, RecordingLauncher,
+                                   parse_key_combo)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_key_combos_parse_with_aliases_in_order():
+    assert parse_key_combo("cmd+shift+4") == KeyCombo(21, ("command", "shift"))
+    assert parse_key_combo(" Ctrl + Left ") == KeyCombo(123, ("control",))
+    assert parse_key_combo("alt+opt+esc") == KeyCombo(53, ("option",))
+    assert parse_key_combo("space") == KeyCombo(49, ())
+
+
+@pytest.mark.parametrize("text", ["cmd+nope", "hyper+a", "", "cmd+"])
+def test_invalid_key_combos_raise(text):
+    with pytest.raises(ValueError):
+        parse_key_combo(text)
+
+
+def test_key_combo_flags_and_applescript():
+    combo = parse_key_combo("cmd+shift+4")
+    assert combo.flags == MODIFIERS["command"][1] | MODIFIERS["shift"][1]
+    assert combo.applescript() == ('tell application "System Events" to key code 21'
+                                   " using {command down, shift down}")
+    assert parse_key_combo("f1").applescript().endswith("key code 122")
+
+
+def test_keystroke_plans_carry_the_parsed_key():
+    plan = compile_action({"type": "Keystroke", "value": "cmd+space"})
+    assert dict(plan.kwargs) == {"code": 49, "modifiers": ("command",)}
+    assert plan.args == ("osascript", "-e", plan.script)
+    with pytest.raises(ValueError):
+        compile_action({"type": "Keystroke", "value": "cmd+nope"})
+
+
+class _Popen:
+    """Records process launches and exits at once"""
+
+    def __init__(self):
+        self.launched = []
+
+    def __call__(self, args, **kwargs):
+        self.launched.append(args)
+        return subprocess.Popen(["true"], stdout=subprocess.PIPE)
+
+
+def _executor(launcher):
+    popen = _Popen()
+    return ActionExecutor(workers=1, popen=popen, launcher=launcher, rate=None), popen
+
+
+def test_launcher_kinds_are_carried_out_in_process():
+    launcher = RecordingLauncher()
+    executor, popen = _executor(launcher)
+    executor.submit("top_left", [compile_action({"type": "URL", "value": "https://a.example"}),
+                                 compile_action({"type": "Keystroke", "value": "cmd+space"}),
+                                 compile_action({"type": "Shell Command", "value": "true"})])
+    _wait_for(lambda: executor.completed == 3)
+    assert [(kind, args) for kind, args, _ in launcher.launches] == [
+        ("URL", ("open", "https://a.example")),
+        ("Keystroke", ("osascript", "-e",
+                       'tell application "System Events" to key code 49 using {command down}'))]
+    assert launcher.launches[1][2] == {"code": 49, "modifiers": ("command",)}
+    assert popen.launched == [["true"]]
+    assert executor.in_process == 2
+    assert executor.failed == 0
+    executor.shutdown()
+
+
+def test_declined_launch_falls_back_to_a_process():
+    launcher = RecordingLauncher(result=None)
+    executor, popen = _executor(launcher)
+    executor.submit("top_left", [compile_action({"type": "URL", "value": "https://a.example"})])
+    _wait_for(lambda: executor.completed == 1)
+    assert len(launcher.launches) == 1
+    assert popen.launched == [["open", "https://a.example"]]
+    assert executor.in_process == 0
+    executor.shutdown()
+
+
+def test_failed_launch_counts_as_failed_without_a_process():
+    executor, popen = _executor(RecordingLauncher(result=False))
+    executor.submit("top_left", [compile_action({"type": "URL", "value": "https://a.example"})])
+    _wait_for(lambda: executor.completed == 1)
+    assert executor.failed == 1
+    assert not popen.launched
+    executor.shutdown()
+
+
+def test_native_launcher_is_none_without_appkit(monkeypatch):
+    monkeypatch.setitem(sys.modules, "AppKit", None)
+    assert NativeLauncher.create() is None
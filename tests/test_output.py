@@ -0,0 +1,97 @@
+import subprocess
+import time
+
+import pytest
+
+from firecorners.actions import compile_action
+from firecorners.executor import ActionExecutor
+from firecorners.output import OutputCapture, OutputLog, stream_output
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_capture_keeps_the_last_limit_bytes():
+    capture = OutputCapture(8)
+    for chunk in (b"abc", b"defgh", b"ij"):
+        capture.write(chunk)
+    assert capture.total == 10
+    assert capture.truncated == 2
+    assert capture.text() == "[2 bytes truncated]\ncdefghij"
+    capture.write(b"0123456789")
+    assert capture.text() == "[12 bytes truncated]\n23456789"
+
+
+def test_capture_of_short_output_is_not_marked_truncated():
+    capture = OutputCapture(8)
+    capture.write("é\n".encode())
+    assert capture.text() == "é\n"
+    assert capture.truncated == 0
+
+
+def _process(script):
+    return subprocess.Popen(["/bin/sh", "-c", script], stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT)
+
+
+def test_stream_output_reads_a_chatty_process_in_bounded_memory():
+    capture = OutputCapture(64)
+    process = _process("i=0; while [ $i -lt 2000 ]; do echo line $i; i=$((i+1)); done; exit 3")
+    try:
+        assert stream_output(process, capture, 10.0) == 3
+    finally:
+        process.stdout.close()
+    assert capture.total == 10 * 7 + 90 * 8 + 900 * 9 + 1000 * 10
+    assert capture.text().endswith("line 1999\n")
+    assert capture.truncated == capture.total - 64
+
+
+def test_stream_output_stops_when_a_background_child_keeps_the_pipe():
+    capture = OutputCapture()
+    process = _process("echo started; sleep 5 & exit 0")
+    start = time.monotonic()
+    try:
+        assert stream_output(process, capture, None) == 0
+    finally:
+        process.stdout.close()
+    assert time.monotonic() - start < 2.0
+    assert capture.text() == "started\n"
+
+
+def test_stream_output_times_out():
+    process = _process("sleep 5")
+    try:
+        with pytest.raises(subprocess.TimeoutExpired):
+            stream_output(process, OutputCapture(), 0.1)
+    finally:
+        process.kill()
+        process.wait()
+        process.stdout.close()
+
+
+def test_log_keeps_the_latest_output_of_the_newest_actions():
+    log = OutputLog(entries=2)
+    for corner, value, status in [("top_left", "a", 0), ("top_left", "b", 1),
+                                  ("top_left", "a", 2), ("top_right", "c", None)]:
+        capture = OutputCapture()
+        capture.write(value.encode())
+        log.record(corner, "Shell Command", value, capture=capture, status=status)
+    assert [(o.value, o.status) for o in log.recent()] == [("a", 2), ("c", None)]
+    assert [o.value for o in log.recent("top_right")] == ["c"]
+
+
+def test_executor_records_action_output_and_status():
+    executor = ActionExecutor(workers=1, rate=None, output_limit=16)
+    command = "echo hello; echo 0123456789abcdefghij; exit 4"
+    executor.submit("top_left", [compile_action({"type": "Shell Command", "value": command})])
+    _wait_for(lambda: executor.completed == 1)
+    output, = executor.outputs.recent("top_left")
+    assert output.status == 4
+    assert output.output.endswith("0123456789abcdefghij\n"[-16:])
+    assert output.truncated == len("hello\n0123456789abcdefghij\n") - 16
+    assert executor.failed == 1
+    executor.shutdown()
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from firecorners.detector import CornerDetector
+from firecorners.geometry import single_display
+from firecorners.pipeline import EventPipeline, PollingPipeline
+from firecorners.pointer import PointerSource, ReplayPointerSource
+from firecorners.scheduler import FixedScheduler
+from firecorners.session import FakeSessionProvider
+
+
+class ParkedSource(PointerSource):
+    def sample(self):
+        return time.time(), 500, 500
+
+
+def _detector():
+    return CornerDetector(single_display(1920, 1080), threshold=5, cooldown=0.0)
+
+
+def _start(pipeline, source):
+    thread = threading.Thread(target=pipeline.run, args=(source,), daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_polling_pipeline_fires_on_replayed_samples():
+    fired = []
+    samples = [(100.0 + i * 0.1, x, y) for i, (x, y) in
+               enumerate([(500, 500), (0, 0), (0, 0), (500, 500), (1919, 1079), (1919, 1079)])]
+    pipeline = PollingPipeline(_detector(), lambda corner, t: fired.append((corner, t)),
+                               scheduler=FixedScheduler(0.0, 0.0))
+    pipeline.run(ReplayPointerSource(samples))
+    assert [corner for corner, _ in fired] == ["top_left", "bottom_right"]
+    assert pipeline.samples == len(samples)
+
+
+def test_stop_cuts_a_suspension_short():
+    session = FakeSessionProvider(locked=True)
+    pipeline = PollingPipeline(_detector(), lambda corner, t: None,
+                               scheduler=FixedScheduler(0.001, 0.001), session=session,
+                               suspend_interval=60.0)
+    thread = _start(pipeline, ParkedSource())
+    _wait_for(lambda: pipeline.suspensions == 1)
+    started = time.monotonic()
+    pipeline.stop()
+    thread.join(2.0)
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 1.0
+
+
+def test_unlocking_resumes_sampling_at_once():
+    session = FakeSessionProvider(locked=True)
+    pipeline = PollingPipeline(_detector(), lambda corner, t: None,
+                               scheduler=FixedScheduler(0.001, 0.001), session=session,
+                               suspend_interval=60.0)
+    thread = _start(pipeline, ParkedSource())
+    _wait_for(lambda: pipeline.suspensions == 1)
+    samples = pipeline.samples
+    session.set_state(locked=False)
+    _wait_for(lambda: pipeline.samples > samples)
+    pipeline.stop()
+    thread.join(2.0)
+
+
+def test_session_activity_wakes_waiters():
+    session = FakeSessionProvider(virtual=True)
+    assert not session.wait_for_activity(10.0)
+    assert session.now == 10.0
+    session.notify_activity()
+    assert session.wait_for_activity(10.0)
+    assert session.now == 10.0
+
+
+def test_event_pipeline_refires_a_parked_cursor_at_its_deadline():
+    fired = []
+    detector = CornerDetector(single_display(1920, 1080), threshold=5, cooldown=0.05)
+    pipeline = EventPipeline(detector, lambda corner, t: fired.append(corner),
+                             clock=time.time, min_repeat=0.05)
+    thread = threading.Thread(target=pipeline.run, daemon=True)
+    thread.start()
+    now = time.time()
+    # The entering sample never fires; the parked cursor does, again and again
+    pipeline.push(now, 0, 0)
+    _wait_for(lambda: len(fired) >= 2)
+    pipeline.stop()
+    thread.join(2.0)
+    assert not thread.is_alive()
+    assert set(fired) == {"top_left"}
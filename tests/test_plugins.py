@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from firecorners import plugins
+from firecorners.actions import compile_action
+from firecorners.executor import ActionExecutor
+from firecorners.plugins import PluginError, PluginRegistry
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class _EntryPoint:
+    def __init__(self, function):
+        self.function = function
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return self.function
+
+
+@pytest.mark.parametrize("result, ok", [(None, True), (True, True), ("done", True),
+                                        (0, True), (False, False), (2, False), (0.5, False)])
+def test_results_decide_success(result, ok):
+    registry = PluginRegistry()
+    registry.register("act", lambda: result)
+    assert registry.call("act", {}, 5.0) is ok
+    assert registry.counters()["failures"] == (0 if ok else 1)
+
+
+def test_keyword_arguments_and_exceptions():
+    registry = PluginRegistry()
+    seen = []
+    registry.register("record", lambda screen, name="x": seen.append((screen, name)))
+    assert registry.call("record", {"screen": 2}, None)
+    assert seen == [(2, "x")]
+    registry.register("broken", lambda: 1 / 0)
+    assert registry.call("broken", {}, None) is False
+
+
+def test_module_function_references_are_imported():
+    registry = PluginRegistry()
+    assert registry.known("os.path:isabs")
+    assert registry.call("os.path:isabs", {"s": "/tmp"}, 5.0)
+    with pytest.raises(PluginError):
+        registry.call("math:pi", {}, 5.0)  # not callable
+    with pytest.raises(PluginError):
+        registry.call("no_such_module_here:run", {}, 5.0)
+
+
+def test_entry_points_are_listed_once_and_loaded_on_first_call(monkeypatch):
+    entry_point = _EntryPoint(lambda: True)
+    listed = []
+
+    def entry_points(group):
+        listed.append(group)
+        return {"dashboards": entry_point}
+
+    monkeypatch.setattr(plugins, "_entry_points", entry_points)
+    registry = PluginRegistry()
+    assert registry.known("dashboards")
+    assert not registry.known("other")
+    assert entry_point.loads == 0
+    assert registry.call("dashboards", {}, 5.0)
+    assert registry.call("dashboards", {}, 5.0)
+    assert entry_point.loads == 1
+    assert listed == ["firecorners.actions"]
+    with pytest.raises(PluginError):
+        registry.call("other", {}, 5.0)
+
+
+def test_an_overrunning_call_is_abandoned_and_cancelled():
+    registry = PluginRegistry()
+    release = threading.Event()
+    cancelled = threading.Event()
+
+    def slow(cancel):
+        if cancel.wait(5.0):
+            cancelled.set()
+        release.wait(5.0)
+
+    registry.register("slow", slow)
+    assert registry.call("slow", {}, 0.05) is None
+    assert cancelled.wait(5.0)
+    assert registry.counters()["timeouts"] == 1
+    assert registry.gauges() == {"running": 1}
+    release.set()
+    _wait_for(lambda: registry.gauges() == {"running": 0})
+
+
+def test_functions_taking_any_keywords_get_cancel_too():
+    registry = PluginRegistry()
+    seen = {}
+    registry.register("kwargs", lambda **kwargs: seen.update(kwargs))
+    registry.register("plain", lambda: True)
+    assert registry.call("kwargs", {"a": 1}, None)
+    assert set(seen) == {"a", "cancel"}
+    assert registry.call("plain", {}, None)
+
+
+def test_executor_runs_python_plans_without_a_process():
+    registry = PluginRegistry()
+    calls = []
+    registry.register("dashboards", lambda screen: calls.append(screen))
+
+    def popen(*args, **kwargs):
+        raise AssertionError("a Python action started a process")
+
+    executor = ActionExecutor(workers=1, popen=popen, plugins=registry, rate=None)
+    plan = compile_action({"type": "Python", "value": "dashboards", "args": {"screen": 2}},
+                          plugins=registry)
+    executor.submit("top_left", [plan, compile_action({"type": "Python", "value": "missing"})])
+    _wait_for(lambda: executor.completed == 2)
+    assert calls == [2]
+    assert executor.failed == 1
+    executor.shutdown()
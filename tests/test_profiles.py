@@ -0,0 +1,169 @@
+import datetime
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from firecorners.profiles import (ProfileScheduler, ScheduleEntry, active_profile,
+                                  last_transition, main, next_transition, parse_schedule,
+                                  parse_schedule_entry, profile_config, read_selection,
+                                  scheduled_profile, selection_path, write_selection)
+
+PROFILES = ("after hours", "presenting")
+# A Monday
+MONDAY = datetime.datetime(2024, 1, 1)
+
+
+def _at(day, hour, minute=0):
+    return MONDAY + datetime.timedelta(days=day, hours=hour, minutes=minute)
+
+
+def test_parse_schedule_entries():
+    entry = parse_schedule_entry({"profile": "presenting", "days": ["Tue", "thursday"],
+                                  "start": "10:00", "end": "11:30"}, PROFILES)
+    assert entry == ScheduleEntry("presenting", 600, 690, (1, 3))
+    assert parse_schedule_entry({"profile": "after hours", "days": "sun",
+                                 "start": "18:00", "end": "8:00"}, PROFILES).days == (6,)
+
+
+@pytest.mark.parametrize("entry", [
+    {"profile": "nope", "start": "10:00", "end": "11:00"},
+    {"profile": "presenting", "start": "10:00", "end": "10:00"},
+    {"profile": "presenting", "start": "24:00", "end": "10:00"},
+    {"profile": "presenting", "start": "10", "end": "11:00"},
+    {"profile": "presenting", "start": "10:00", "end": "11:00", "days": ["someday"]},
+    {"profile": "presenting", "start": "10:00", "end": "11:00", "days": []},
+    {"profile": "presenting", "start": "10:00"},
+])
+def test_invalid_schedule_entries_raise(entry):
+    with pytest.raises((KeyError, TypeError, ValueError)):
+        parse_schedule_entry(entry, PROFILES)
+
+
+def test_invalid_entries_are_skipped():
+    config = {"profiles": {"presenting": {}},
+              "schedule": [{"profile": "presenting", "start": "x", "end": "y"},
+                           {"profile": "presenting", "start": "10:00", "end": "11:00"}]}
+    assert parse_schedule(config) == (ScheduleEntry("presenting", 600, 660),)
+
+
+def test_overnight_entries_apply_past_midnight_on_the_day_after():
+    schedule = (ScheduleEntry("after hours", 18 * 60, 8 * 60, (4,)),)  # Friday night
+    assert scheduled_profile(schedule, _at(4, 17, 59)) is None
+    assert scheduled_profile(schedule, _at(4, 18)) == "after hours"
+    assert scheduled_profile(schedule, _at(5, 7, 59)) == "after hours"  # Saturday morning
+    assert scheduled_profile(schedule, _at(5, 8)) is None
+    assert scheduled_profile(schedule, _at(5, 18)) is None  # starts on Fridays only
+
+
+def test_the_first_entry_that_applies_wins():
+    schedule = (ScheduleEntry("presenting", 10 * 60, 11 * 60, (0,)),
+                ScheduleEntry("after hours", 9 * 60, 17 * 60))
+    assert scheduled_profile(schedule, _at(0, 10, 30)) == "presenting"
+    assert scheduled_profile(schedule, _at(1, 10, 30)) == "after hours"
+
+
+def test_transitions_around_a_moment():
+    schedule = (ScheduleEntry("after hours", 18 * 60, 8 * 60),
+                ScheduleEntry("presenting", 10 * 60, 11 * 60, (1,)))
+    assert next_transition(schedule, _at(0, 9)) == _at(0, 18)
+    assert next_transition(schedule, _at(0, 18)) == _at(1, 8)
+    assert next_transition(schedule, _at(1, 9)) == _at(1, 10)
+    assert last_transition(schedule, _at(1, 9)) == _at(1, 8)
+    assert last_transition(schedule, _at(1, 8)) == _at(1, 8)
+    # A weekly entry is found a week ahead
+    weekly = (ScheduleEntry("presenting", 600, 660, (0,)),)
+    assert next_transition(weekly, _at(0, 12)) == _at(7, 10)
+    assert next_transition((), _at(0, 12)) is None
+
+
+def test_a_pick_holds_until_the_next_transition():
+    schedule = (ScheduleEntry("after hours", 18 * 60, 8 * 60),)
+    picked_at = _at(0, 12).timestamp()
+    selection = ("presenting", picked_at)
+    assert active_profile(PROFILES, None, schedule, selection, _at(0, 17)) == "presenting"
+    assert active_profile(PROFILES, None, schedule, selection, _at(0, 19)) == "after hours"
+    assert active_profile(PROFILES, None, schedule, (None, 0.0), _at(0, 12)) is None
+    assert active_profile(PROFILES, "presenting", schedule, (None, 0.0),
+                          _at(0, 12)) == "presenting"
+
+
+def test_unknown_picks_and_defaults_are_ignored():
+    assert active_profile(PROFILES, None, (), ("gone", 1.0), _at(0, 12)) is None
+    assert active_profile(PROFILES, "gone", (), (None, 0.0), _at(0, 12)) is None
+
+
+def test_profile_config_merges_settings_but_not_shared_ones():
+    config = {"top_left": [1], "top_right": [2],
+              "settings": {"dwell": 0.0, "cooldown": 1.0, "application_roots": ["/a"]},
+              "profiles": {}, "schedule": []}
+    merged = profile_config(config, {"top_left": [], "profile": "x",
+                                     "settings": {"dwell": 1.0, "application_roots": ["/b"]}})
+    assert merged == {"top_left": [], "top_right": [2],
+                      "settings": {"dwell": 1.0, "cooldown": 1.0, "application_roots": ["/a"]}}
+
+
+def test_selection_round_trip(tmp_path):
+    path = selection_path(str(tmp_path / "config.json"))
+    assert path == str(tmp_path / "config.profile")
+    assert read_selection(path) == (None, 0.0)
+    write_selection(path, "presenting")
+    name, picked = read_selection(path)
+    assert name == "presenting" and picked == os.stat(path).st_mtime
+    write_selection(path, None)
+    assert read_selection(path) == (None, 0.0)
+    assert os.path.exists(path)  # emptied, so a watcher sees the change
+
+
+class _Clock:
+    """The wall clock, but starting at ``start``"""
+
+    def __init__(self, start):
+        self.offset = start - datetime.datetime.now()
+
+    def __call__(self):
+        return datetime.datetime.now() + self.offset
+
+
+def test_scheduler_calls_back_at_transitions():
+    clock = _Clock(_at(0, 17, 59) + datetime.timedelta(seconds=59.8))
+    fired = threading.Event()
+    scheduler = ProfileScheduler(fired.set, clock=clock)
+    scheduler.set_schedule((ScheduleEntry("after hours", 18 * 60, 8 * 60),))
+    scheduler.start()
+    try:
+        assert fired.wait(5.0)
+        assert scheduler.transitions == 1
+    finally:
+        scheduler.stop()
+
+
+def test_scheduler_wakes_up_early_without_calling_back():
+    clock = _Clock(_at(0, 12))
+    calls = []
+    scheduler = ProfileScheduler(lambda: calls.append(1), max_timer=0.01, clock=clock)
+    scheduler.set_schedule((ScheduleEntry("after hours", 18 * 60, 8 * 60),))
+    scheduler.start()
+    try:
+        deadline = time.monotonic() + 5.0
+        while scheduler.timers < 5:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert not calls
+    finally:
+        scheduler.stop()
+
+
+def test_profile_command_lists_and_picks(tmp_path, capsys):
+    source = tmp_path / "config.json"
+    source.write_text(json.dumps({"profiles": {"presenting": {}, "quiet": {}},
+                                  "profile": "quiet"}))
+    assert main(["--config", str(source)]) == 0
+    assert capsys.readouterr().out == "  presenting\n* quiet\n"
+    assert main(["presenting", "--config", str(source)]) == 0
+    assert read_selection(selection_path(str(source)))[0] == "presenting"
+    assert main(["nope", "--config", str(source)]) == 1
+    assert main(["--auto", "--config", str(source)]) == 0
+    assert read_selection(selection_path(str(source))) == (None, 0.0)
@@ -0,0 +1,48 @@
+import pytest
+
+from firecorners.detector import CornerDetector
+from firecorners.geometry import single_display
+from firecorners.scheduler import AdaptiveScheduler, FixedScheduler
+
+
+def _detector(**kwargs):
+    return CornerDetector(single_display(1920, 1080), threshold=5, **kwargs)
+
+
+def test_fixed_scheduler_samples_faster_in_a_zone():
+    detector = _detector()
+    scheduler = FixedScheduler(0.1, 0.05)
+    assert scheduler.next_interval(0.0, 500, 500, detector) == 0.1
+    detector.update(100.0, 0, 0)
+    assert scheduler.next_interval(100.0, 0, 0, detector) == 0.05
+
+
+def test_time_to_reach_solves_constant_acceleration():
+    scheduler = AdaptiveScheduler(max_accel=1000.0)
+    assert scheduler.time_to_reach(0, 100) == 0.0
+    assert scheduler.time_to_reach(500, 0) == pytest.approx(1.0)
+    # 100 px/s towards it: 500 = 100 t + 500 t^2
+    assert scheduler.time_to_reach(500, 100) == pytest.approx(0.904988, rel=1e-5)
+    # Moving away counts as standing still
+    assert scheduler.time_to_reach(500, -100) == scheduler.time_to_reach(500, 0)
+
+
+def test_parked_cursor_sleeps_longer_than_an_approaching_one():
+    detector = _detector()
+    parked = AdaptiveScheduler()
+    for i in range(4):
+        parked_interval = parked.next_interval(i * 0.01, 960, 540, detector)
+    approaching = AdaptiveScheduler()
+    for i in range(4):
+        x = 960 - i * 40  # 4000 px/s towards the left edge
+        interval = approaching.next_interval(i * 0.01, x, 540 - i * 22, detector)
+    assert parked_interval > interval
+    assert approaching.min_interval <= interval <= approaching.max_interval
+    assert parked_interval <= parked.max_interval
+
+
+def test_sleeps_until_the_dwell_deadline_in_a_zone():
+    detector = _detector(dwell=0.02, cooldown=0.0)
+    scheduler = AdaptiveScheduler(min_interval=0.005, zone_interval=0.05)
+    detector.update(100.0, 0, 0)
+    assert scheduler.next_interval(100.0, 0, 0, detector) == pytest.approx(0.02)
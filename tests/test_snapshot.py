@@ -0,0 +1,124 @@
+import copy
+
+import pytest
+
+from firecorners.catalog import DEFAULT_ROOTS
+from firecorners.executor import DEFAULT_BURST, DEFAULT_RATE
+from firecorners.snapshot import (DetectionSettings, action_limits, application_roots,
+                                  build_snapshot, switch_diff)
+
+CONFIG = {
+    "top_left": [{"type": "URL", "value": "https://a.example"}],
+    "top_right": [{"type": "Shell Command", "value": "true"}],
+    "zones": [{"name": "dock", "edge": "bottom", "threshold": 3,
+               "actions": [{"type": "URL", "value": "https://dock.example"}]}],
+    "settings": {"threshold": 7},
+}
+
+
+def _edit(config, **changes):
+    config = copy.deepcopy(config)
+    config.update(changes)
+    return config
+
+
+def test_snapshot_is_read_only():
+    snapshot, _ = build_snapshot(CONFIG)
+    with pytest.raises(TypeError):
+        snapshot.plans["top_left"] = ()
+    with pytest.raises(AttributeError):
+        snapshot.plans = {}
+    assert snapshot.detection.threshold == 7
+    assert [zone.name for zone in snapshot.detection.zones] == ["dock"]
+    assert set(snapshot.plans) == {"top_left", "top_right", "dock"}
+
+
+def test_reload_compiles_only_what_changed():
+    first, diff = build_snapshot(CONFIG)
+    assert diff.compiled == 3
+    config = _edit(CONFIG, top_right=[{"type": "Shell Command", "value": "false"}])
+    second, diff = build_snapshot(config, first)
+    assert diff.compiled == 1
+    assert diff.changed == ("top_right",)
+    assert second.plans["top_left"] is first.plans["top_left"]
+    assert second.plans["top_right"] is not first.plans["top_right"]
+    assert not diff.detection and not diff.geometry and not diff.limits
+    assert second.generation == first.generation + 1
+    assert second.detection is first.detection
+
+
+def test_reload_compiles_a_zone_again_once_its_script_appears(tmp_path):
+    zones = [{"name": "dock", "edge": "bottom",
+              "actions": [{"type": "script", "value": "dock.sh"}]}]
+    config = _edit(CONFIG, zones=zones)
+    first, _ = build_snapshot(config, base=str(tmp_path))
+    assert first.plans["dock"][0].kind == "AppleScript"
+    _, diff = build_snapshot(config, first, base=str(tmp_path))
+    assert diff.compiled == 0
+    (tmp_path / "dock.sh").write_text("#!/bin/sh\n")
+    second, diff = build_snapshot(config, first, base=str(tmp_path))
+    assert diff.changed == ("dock",)
+    assert second.plans["dock"][0].kind == "Shell Command"
+    assert second.plans["top_left"] is first.plans["top_left"]
+
+
+def test_removed_corners_are_reported_as_changed():
+    first, _ = build_snapshot(CONFIG)
+    config = _edit(CONFIG)
+    del config["top_left"]
+    second, diff = build_snapshot(config, first)
+    assert diff.changed == ("top_left",)
+    assert "top_left" not in second.plans
+    assert diff.compiled == 0
+
+
+def test_diff_tells_geometry_from_other_detection_settings():
+    first, _ = build_snapshot(CONFIG)
+    _, diff = build_snapshot(_edit(CONFIG, settings={"threshold": 7, "dwell": 0.5}), first)
+    assert diff.detection and not diff.geometry
+    _, diff = build_snapshot(_edit(CONFIG, settings={"threshold": 9}), first)
+    assert diff.detection and diff.geometry
+    zones = copy.deepcopy(CONFIG["zones"])
+    zones[0]["actions"] = [{"type": "URL", "value": "https://other.example"}]
+    _, diff = build_snapshot(_edit(CONFIG, zones=zones), first)
+    assert not diff.geometry and diff.changed == ("dock",)
+    zones[0]["threshold"] = 4
+    _, diff = build_snapshot(_edit(CONFIG, zones=zones), first)
+    assert diff.geometry
+
+
+def test_settings_left_out_come_from_the_defaults():
+    snapshot, _ = build_snapshot({}, defaults=DetectionSettings(3, 2.0, 0.25, 0.1))
+    assert snapshot.detection == DetectionSettings(3, 2.0, 0.25, 0.1, ())
+
+
+def test_limits_and_roots():
+    assert action_limits({}) == ("action", DEFAULT_RATE, DEFAULT_BURST)
+    assert action_limits({"settings": {"single_flight": "off", "rate_limit": None}}) == (
+        None, None, DEFAULT_BURST)
+    assert action_limits({"settings": {"single_flight": "bogus",
+                                       "rate_limit": {"rate": 2, "burst": 3}}}) == (
+        "action", 2.0, 3.0)
+    assert action_limits({"settings": {"rate_limit": "fast"}}) == (
+        "action", DEFAULT_RATE, DEFAULT_BURST)
+    roots = application_roots({"settings": {"application_roots": ["/Applications", "/opt"]}})
+    assert roots == tuple(DEFAULT_ROOTS) + ("/opt",)
+
+
+def test_profiles_share_detection_and_compile_only_their_changes():
+    config = _edit(CONFIG, profiles={
+        "quiet": {"top_left": []},
+        "slow": {"settings": {"dwell": 1.0}},
+    })
+    snapshot, diff = build_snapshot(config)
+    quiet, slow = snapshot.profiles["quiet"], snapshot.profiles["slow"]
+    assert "top_left" not in quiet.plans
+    assert quiet.detection is snapshot.detection
+    assert slow.plans["top_left"] is snapshot.plans["top_left"]
+    assert slow.detection.zones is snapshot.detection.zones
+    assert diff.compiled == 3
+
+    switch = switch_diff(snapshot, quiet)
+    assert not switch.detection and not switch.geometry
+    switch = switch_diff(snapshot, slow)
+    assert switch.detection and not switch.geometry
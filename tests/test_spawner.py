@@ -0,0 +1,168 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+import types
+
+import pytest
+
+from firecorners import __main__ as entry_point
+from firecorners import spawner
+from firecorners.spawner import posix_spawn_popen, start_spawn_helper
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "posix_spawnp"), reason="needs posix_spawn")
+
+
+@pytest.fixture
+def helper():
+    helper = start_spawn_helper()
+    yield helper
+    helper.close()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _read(process):
+    data = process.stdout.read()
+    process.stdout.close()
+    return data
+
+
+@pytest.mark.parametrize("launcher", ["helper", "posix_spawn"])
+def test_output_pipe_reaches_the_child(helper, launcher):
+    popen = helper.popen if launcher == "helper" else posix_spawn_popen
+    process = popen("echo out; echo err >&2; exit 3", shell=True, stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    assert _read(process) == b"out\nerr\n"
+    assert process.wait(5.0) == 3
+
+
+def test_helper_passes_each_pipe_to_its_own_child(helper):
+    processes = [helper.popen(["echo", str(i)], stdout=subprocess.PIPE) for i in range(20)]
+    assert [_read(process) for process in processes] == [f"{i}\n".encode() for i in range(20)]
+    assert all(process.wait(5.0) == 0 for process in processes)
+
+
+def test_helper_children_get_their_own_session_and_environment(helper):
+    process = helper.popen([sys.executable, "-c",
+                            "import os; print(os.getsid(0) == os.getpid(), os.environ['FC'])"],
+                           stdout=subprocess.PIPE, start_new_session=True,
+                           env=dict(os.environ, FC="yes"))
+    assert _read(process) == b"True yes\n"
+    assert process.wait(5.0) == 0
+
+
+def test_helper_reports_launch_errors_and_timeouts(helper):
+    with pytest.raises(OSError):
+        helper.popen(["/nonexistent/command"])
+    process = helper.popen(["sleep", "30"], start_new_session=True)
+    with pytest.raises(subprocess.TimeoutExpired):
+        process.wait(0.05)
+    os.killpg(process.pid, 9)
+    assert process.wait(5.0) == -9
+
+
+def test_a_child_started_after_popen_gave_up_is_killed(helper, monkeypatch):
+    monkeypatch.setattr(spawner, "START_TIMEOUT", 0.0)
+    killed = []
+    kill = spawner._kill
+    monkeypatch.setattr(spawner, "_kill", lambda pid, group: (killed.append(pid),
+                                                              kill(pid, group)))
+    for _ in range(20):
+        try:
+            process = helper.popen(["sleep", "30"], start_new_session=True)
+        except OSError:
+            break
+        # The answer beat the zero timeout; try again
+        os.killpg(process.pid, 9)
+        process.wait(5.0)
+    else:
+        pytest.skip("the helper always answered at once")
+    assert not helper._pending
+    # The child may be killed before it gets to run anything
+    _wait_for(lambda: killed)
+    assert not helper._abandoned
+    _wait_for(lambda: not _alive(killed[0]))
+
+
+def test_falls_back_to_posix_spawn_when_the_helper_is_gone(helper):
+    helper.close()
+    _wait_for(lambda: not helper.alive)
+    process = helper.popen(["true"])
+    assert isinstance(process, spawner.SpawnedProcess)
+    assert process.wait(5.0) == 0
+
+
+
+def test_close_reaps_the_helper_without_a_warning(caplog):
+    helper = start_spawn_helper()
+    process = helper.popen(["sleep", "30"], start_new_session=True)
+    with caplog.at_level("WARNING", logger=spawner.__name__):
+        helper.close()
+        _wait_for(lambda: not helper.alive)
+    assert not caplog.records
+    with pytest.raises(ChildProcessError):
+        os.waitpid(helper.pid, os.WNOHANG)
+    assert process.wait(5.0) == -1  # no longer reported
+    os.killpg(process.pid, 9)
+
+
+def test_a_helper_that_dies_is_reported(caplog):
+    helper = start_spawn_helper()
+    with caplog.at_level("WARNING", logger=spawner.__name__):
+        os.kill(helper.pid, 9)
+        _wait_for(lambda: not helper.alive)
+    assert "Spawn helper exited" in caplog.text
+    helper.close()
+
+class _DaemonModule:
+    """Imports firecorners.simple_hot_corners the way the real one does to
+    the process: loading Quartz and PyQt6 first"""
+
+    def __init__(self, monkeypatch, main):
+        self.monkeypatch = monkeypatch
+        self.main = main
+
+    def find_spec(self, name, path=None, target=None):
+        if name == "firecorners.simple_hot_corners":
+            return importlib.util.spec_from_loader(name, self)
+        return None
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        for name in ("Quartz", "PyQt6"):
+            self.monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+        module.main = self.main
+
+
+def test_the_entry_point_forks_the_helper_before_quartz_and_qt_load(monkeypatch):
+    seen = {}
+
+    def run_daemon(spawn_helper):
+        assert "Quartz" in sys.modules and "PyQt6" in sys.modules
+        seen["modules"] = spawn_helper.stats()["modules"]
+        spawn_helper.close()
+
+    monkeypatch.setattr(sys, "meta_path", [_DaemonModule(monkeypatch, run_daemon)] + sys.meta_path)
+    try:
+        entry_point.main()
+    finally:
+        sys.modules.pop("firecorners.simple_hot_corners", None)
+    assert "firecorners.spawner" in seen["modules"]
+    assert "Quartz" not in seen["modules"] and "PyQt6" not in seen["modules"]
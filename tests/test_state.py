@@ -0,0 +1,58 @@
+from firecorners.state import ZoneStateMachine
+
+
+def _run(machine, samples):
+    return [t for t, zone in samples if machine.update(t, zone)]
+
+
+def test_entering_sample_never_fires_and_dwell_is_measured_from_entry():
+    machine = ZoneStateMachine(cooldown=0.0, dwell=0.3)
+    assert _run(machine, [(100.0, "a"), (100.2, "a"), (100.3, "a"), (100.4, "a")]) == \
+        [100.3, 100.4]
+
+
+def test_cooldown_is_per_zone():
+    machine = ZoneStateMachine(cooldown=1.0)
+    fired = _run(machine, [(100.0, "a"), (100.1, "a"), (100.2, "b"), (100.3, "b"),
+                           (100.4, "a"), (100.5, "a"), (101.1, "a")])
+    assert fired == [100.1, 100.3, 101.1]
+    assert machine.ready_time("a") == 102.1
+    assert machine.last_trigger_time == 101.1
+
+
+def test_hysteresis_keeps_a_visit_across_short_exits():
+    machine = ZoneStateMachine(cooldown=0.0, dwell=0.5, hysteresis=0.2)
+    # Leaves for 0.1 s: still the same visit, so the dwell started at 100.0
+    assert _run(machine, [(100.0, "a"), (100.3, None), (100.4, "a"), (100.5, "a")]) == [100.5]
+    # Leaves for longer than the hysteresis: a new visit
+    machine = ZoneStateMachine(cooldown=0.0, dwell=0.5, hysteresis=0.2)
+    assert _run(machine, [(100.0, "a"), (100.1, None), (100.35, None), (100.4, "a"),
+                          (100.5, "a"), (100.9, "a")]) == [100.9]
+
+
+def test_a_different_zone_always_starts_a_new_visit():
+    machine = ZoneStateMachine(cooldown=0.0, dwell=0.1, hysteresis=1.0)
+    assert _run(machine, [(100.0, "a"), (100.05, None), (100.06, "b"), (100.1, "b"),
+                          (100.2, "b")]) == [100.2]
+
+
+def test_next_deadline():
+    machine = ZoneStateMachine(cooldown=1.0, dwell=0.3, hysteresis=0.2)
+    assert machine.next_deadline() is None
+    machine.update(100.0, "a")
+    assert machine.next_deadline() == 100.3
+    machine.update(100.3, "a")
+    assert machine.next_deadline() == 101.3
+    machine.update(100.5, None)
+    assert machine.next_deadline() == 100.7
+    machine.reset()
+    assert machine.next_deadline() is None
+
+
+def test_settings_changes_apply_to_the_current_visit():
+    machine = ZoneStateMachine(cooldown=1.0, dwell=1.0)
+    machine.update(100.0, "a")
+    machine.dwell = 0.2
+    assert machine.update(100.2, "a") == "a"
+    machine.cooldown = 0.1
+    assert machine.update(100.3, "a") == "a"
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+
+import pytest
+
+from firecorners.metrics import Metrics
+from firecorners.output import OutputCapture, OutputLog
+from firecorners.store import ConfigStore, atomic_write
+
+
+def test_atomic_write_replaces_the_file_and_leaves_no_temporary(tmp_path):
+    path = tmp_path / "metrics.json"
+    path.write_text("old")
+    atomic_write(str(path), b"new")
+    assert path.read_text() == "new"
+    assert os.listdir(tmp_path) == ["metrics.json"]
+
+
+def test_atomic_write_keeps_the_old_file_when_writing_fails(tmp_path, monkeypatch):
+    path = tmp_path / "config.json"
+    path.write_text("old")
+
+    def fail(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "fsync", fail)
+    with pytest.raises(OSError):
+        atomic_write(str(path), b"new")
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["config.json"]
+
+
+def test_generation_counts_changes_only(tmp_path):
+    store = ConfigStore(str(tmp_path / "config.json"))
+    assert store.generation() is None
+    assert store.write({"top_left": []}) == 1
+    assert store.generation() == 1
+    assert store.write({"top_left": []}) == 1  # same contents, nothing written
+    assert store.write({"top_left": [{"type": "url", "value": "x"}]}) == 2
+    assert store.generation() == 2
+
+
+def test_a_config_edited_by_hand_has_no_generation(tmp_path):
+    store = ConfigStore(str(tmp_path / "config.json"))
+    store.write({})
+    with open(store.path, "w") as f:
+        f.write('{"top_left": []}')
+    assert store.generation() is None
+    # The next save starts from the sidecar's generation again
+    assert store.write({}) == 2
+
+
+def test_concurrent_writers_get_distinct_generations(tmp_path):
+    path = str(tmp_path / "config.json")
+    generations = []
+    lock = threading.Lock()
+
+    def save(i):
+        generation = ConfigStore(path).write({"writer": i})
+        with lock:
+            generations.append(generation)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(generations) == list(range(1, 9))
+    assert ConfigStore(path).generation() == 8
+    assert sorted(os.listdir(tmp_path)) == ["config.generation", "config.json", "config.lock"]
+
+
+def test_metrics_and_outputs_are_written_atomically(tmp_path):
+    metrics = Metrics()
+    metrics.register("actions", lambda: {"submitted": 3})
+    snapshot = metrics.write(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text()) == snapshot
+    assert snapshot["counters"]["actions.submitted"] == 3
+
+    outputs = OutputLog()
+    capture = OutputCapture(16)
+    capture.write(b"hello\n")
+    outputs.record("top_left", "Shell Command", "echo hello", 0, capture)
+    written = outputs.write(str(tmp_path / "output.json"))
+    assert json.loads((tmp_path / "output.json").read_text()) == written
+    assert written[0]["output"] == "hello\n"
+    assert sorted(os.listdir(tmp_path)) == ["metrics.json", "output.json"]
@@ -0,0 +1,110 @@
+import os
+import struct
+
+import pytest
+
+from firecorners.geometry import Display, single_display
+from firecorners.pointer import SyntheticEventSource
+from firecorners.tracefile import (HEADER, MAGIC, RECORD, RecordingEventSource, TraceWriter,
+                                   open_trace)
+
+DOCKED = [Display(1, 0, 0, 1920, 1080), Display(2, 1920, 0, 2560, 1440)]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "t.fct")
+    samples = [(1000.0 + i / 100, i, -i) for i in range(100)]
+    with TraceWriter(path, DOCKED) as writer:
+        for sample in samples:
+            writer.write(*sample)
+    with open_trace(path) as trace:
+        assert trace.displays == DOCKED
+        assert len(trace) == 100
+        assert len(trace.segments) == 1
+        assert [(round(t, 6), x, y) for t, x, y in trace.samples()] == \
+            [(round(t, 6), x, y) for t, x, y in samples]
+
+
+def test_fractional_coordinates_are_floored(tmp_path):
+    path = str(tmp_path / "t.fct")
+    with TraceWriter(path, DOCKED) as writer:
+        writer.write(1.0, -0.5, 1079.9)
+        writer.write(2.0, 1919.5, -1.25)
+    with open_trace(path) as trace:
+        assert [(x, y) for _, x, y in trace.samples()] == [(-1, 1079), (1919, -2)]
+
+
+def test_layout_changes_split_the_trace_into_segments(tmp_path):
+    path = str(tmp_path / "t.fct")
+    undocked = single_display(1440, 900)
+    with TraceWriter(path, DOCKED) as writer:
+        writer.write(1.0, 10, 10)
+        writer.write(2.0, 3000, 10)
+        writer.set_displays(undocked, timestamp=2.5)
+        writer.set_displays(undocked, timestamp=2.6)  # unchanged: not recorded
+        writer.write(3.0, 20, 20)
+        writer.set_displays(DOCKED, timestamp=3.5)
+        writer.write(4.0, 4000, 30)
+        writer.write(5.0, 4001, 31)
+    with open_trace(path) as trace:
+        assert len(trace) == 5
+        assert [(list(s.displays), s.start, list(s.xs)) for s in trace.segments] == [
+            (DOCKED, 0, [10, 3000]), (undocked, 2, [20]), (DOCKED, 3, [4000, 4001])]
+        assert [x for _, x, _ in trace.samples()] == [10, 3000, 20, 4000, 4001]
+
+
+def test_partial_records_are_ignored(tmp_path):
+    path = str(tmp_path / "t.fct")
+    with TraceWriter(path, DOCKED) as writer:
+        writer.write(1.0, 1, 1)
+        writer.set_displays(single_display(800, 600), timestamp=1.5)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 4)  # killed while writing the layout
+    with open_trace(path) as trace:
+        assert len(trace) == 1
+        assert trace.segments[-1].displays == DOCKED
+
+
+def test_reads_version_2(tmp_path):
+    path = str(tmp_path / "t.fct")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 2, RECORD.size, 1, 0))
+        f.write(struct.pack("<I4i", 7, 0, 0, 800, 600).ljust(24, b"\0"))
+        f.write(RECORD.pack(1_000_000, 5, 6))
+    with open_trace(path) as trace:
+        assert trace.displays == [Display(7, 0, 0, 800, 600)]
+        assert list(trace.samples()) == [(1.0, 5, 6)]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "t.fct"
+    path.write_bytes(b"not a trace at all, just some bytes")
+    with pytest.raises(ValueError):
+        open_trace(str(path))
+
+
+def test_buffered_samples_are_flushed_every_second(tmp_path):
+    path = str(tmp_path / "t.fct")
+    writer = TraceWriter(path, DOCKED)
+    full = HEADER.size + 40 + 3 * RECORD.size  # two displays, padded, and three samples
+    writer.write(10.0, 1, 1)
+    writer.write(10.5, 1, 1)
+    assert os.path.getsize(path) < full
+    writer.write(11.0, 1, 1)
+    assert os.path.getsize(path) == full
+    writer.close()
+    writer.write(12.0, 1, 1)  # discarded once closed
+    assert os.path.getsize(path) == full
+
+
+def test_recording_event_source_stops_pushing_before_closing(tmp_path):
+    path = str(tmp_path / "t.fct")
+    writer = TraceWriter(path, DOCKED)
+    samples = [(float(i), i, i) for i in range(20000)]
+    source = RecordingEventSource(SyntheticEventSource(samples, realtime=False), writer)
+    pushed = []
+    source.start(lambda t, x, y: pushed.append(t))
+    source.stop()  # while the synthetic thread may still be pushing
+    with open_trace(path) as trace:
+        # Every sample is written before it is pushed on
+        assert len(pushed) <= len(trace) <= len(pushed) + 1
@@ -0,0 +1,150 @@
+import os
+import time
+
+import pytest
+
+from firecorners.catalog import ApplicationCatalog
+from firecorners.store import atomic_write
+from firecorners.watcher import ConfigWatcher, FolderWatcher
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture(params=["auto", "poll"])
+def backend(request):
+    return request.param
+
+
+def _watcher(folders, callback, backend):
+    watcher = FolderWatcher(folders, callback, backend=backend, interval=0.05)
+    watcher.start()
+    return watcher
+
+
+def test_folder_watcher_calls_back_once_per_burst(tmp_path, backend):
+    calls = []
+    watcher = _watcher([tmp_path], lambda: calls.append(1), backend)
+    try:
+        for i in range(5):
+            (tmp_path / f"App{i}.app").mkdir()
+        _wait_for(lambda: calls)
+        time.sleep(0.3)
+        assert len(calls) == 1
+    finally:
+        watcher.stop()
+
+
+def test_folder_watcher_follows_set_folders(tmp_path, backend):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    calls = []
+    watcher = _watcher([first], lambda: calls.append(1), backend)
+    try:
+        watcher.set_folders([second])
+        # Once re-armed, it checks the new folders in case they changed meanwhile
+        _wait_for(lambda: calls)
+        assert watcher.folders == (str(second),)
+        time.sleep(0.2)
+        calls.clear()
+        (first / "Old.app").mkdir()
+        time.sleep(0.3)
+        assert not calls
+        (second / "New.app").mkdir()
+        _wait_for(lambda: calls)
+    finally:
+        watcher.stop()
+
+
+def test_missing_folder_does_not_stop_the_others(tmp_path):
+    calls = []
+    watcher = _watcher([tmp_path / "missing", tmp_path], lambda: calls.append(1), "auto")
+    try:
+        (tmp_path / "New.app").mkdir()
+        _wait_for(lambda: calls)
+        assert watcher.fallbacks == 0
+    finally:
+        watcher.stop()
+
+
+def test_catalog_refreshes_on_a_folder_change_without_a_lookup(tmp_path, backend):
+    (tmp_path / "Safari.app").mkdir()
+    catalog = ApplicationCatalog([str(tmp_path)], min_interval=3600)
+
+    def refresh():
+        if catalog.refresh():
+            watcher.set_folders(catalog.folders())
+
+    watcher = _watcher(catalog.folders(), refresh, backend)
+    try:
+        (tmp_path / "Notes.app").mkdir()
+        _wait_for(lambda: "notes" in catalog.applications())
+        # A new subfolder is watched once the refresh has scanned it
+        (tmp_path / "Utilities").mkdir()
+        _wait_for(lambda: str(tmp_path / "Utilities") in watcher.folders)
+        (tmp_path / "Utilities" / "Terminal.app").mkdir()
+        _wait_for(lambda: "terminal" in catalog.applications())
+        assert catalog.misses == 0
+    finally:
+        watcher.stop()
+
+
+@pytest.fixture(params=["inotify", "kqueue", "poll"])
+def config_watcher(request, tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text("{}")
+    reloads = []
+    watcher = ConfigWatcher(path, lambda: reloads.append(path.read_text()),
+                            backend=request.param, interval=0.05)
+    if watcher.backend != request.param:
+        watcher.stop()
+        pytest.skip(f"{request.param} is not available")
+    watcher.start()
+    yield watcher, path, reloads
+    watcher.stop()
+
+
+def test_config_watcher_reloads_an_in_place_write(config_watcher):
+    watcher, path, reloads = config_watcher
+    time.sleep(0.05)  # a later mtime, for the poll backend
+    with open(path, "a") as f:
+        f.write(" ")
+    _wait_for(lambda: reloads)
+    assert reloads == ["{} "]
+
+
+def test_config_watcher_follows_a_file_renamed_over_the_config(config_watcher):
+    watcher, path, reloads = config_watcher
+    for text in ('{"a": 1}', '{"a": 2}'):
+        atomic_write(str(path), text.encode())
+        _wait_for(lambda: reloads and reloads[-1] == text)
+    assert watcher.fallbacks == 0
+
+
+def test_config_watcher_ignores_other_files_in_the_folder(config_watcher):
+    watcher, path, reloads = config_watcher
+    folder = path.parent
+    for i in range(3):
+        atomic_write(str(folder / "metrics.json"), b"{}")
+        (folder / f"other{i}").write_text("x")
+        os.remove(folder / f"other{i}")
+    time.sleep(0.3)
+    assert watcher.events == 0
+    assert not reloads
+    with open(path, "a") as f:
+        f.write(" ")
+    _wait_for(lambda: reloads)
+
+
+def test_config_watcher_sees_the_config_created_again(config_watcher):
+    watcher, path, reloads = config_watcher
+    os.remove(path)
+    time.sleep(0.3)
+    assert not reloads
+    path.write_text('{"b": 1}')
+    _wait_for(lambda: reloads == ['{"b": 1}'])
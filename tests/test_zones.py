@@ -0,0 +1,89 @@
+import logging
+
+import pytest
+
+from firecorners.geometry import Display, single_display
+from firecorners.zones import ZoneSpec, ZoneTable, parse_zone, parse_zones
+
+DISPLAY = single_display(1920, 1080)
+
+
+def test_parse_zones_skips_invalid_entries(caplog):
+    config = {"zones": [
+        {"name": "dock", "edge": "bottom", "start": 0.25, "end": 0.75, "threshold": 3},
+        {"name": "bad_edge", "edge": "middle"},
+        {"name": "widget", "rect": [100, 100, 300, 200], "display": 0},
+        {"rect": [0, 0, 1, 1]},
+        {"name": "wide", "arc": "top_right", "radius": 40, "actions": {"type": "URL"}},
+    ]}
+    with caplog.at_level(logging.WARNING):
+        zones = parse_zones(config)
+    assert [zone.name for zone in zones] == ["dock", "widget", "wide"]
+    assert zones[0] == ZoneSpec("dock", "edge", side="bottom", threshold=3, start=0.25, end=0.75)
+    assert zones[1].rect == (100, 100, 300, 200) and zones[1].display == 0
+    assert zones[2].actions == ({"type": "URL"},)
+    assert len(caplog.records) == 2
+
+
+@pytest.mark.parametrize("entry", [
+    {"name": "a", "edge": "top", "start": 0.5, "end": 0.5},
+    {"name": "a", "rect": [0, 0, 0, 10]},
+    {"name": "a", "arc": "top_left", "radius": 0},
+    {"name": "a", "edge": "left", "threshold": -1},
+    {"name": "a"},
+])
+def test_parse_zone_rejects(entry):
+    with pytest.raises(ValueError):
+        parse_zone(entry)
+
+
+def test_edge_rect_and_arc_zones():
+    zones = [parse_zone({"name": "dock", "edge": "bottom", "start": 0.25, "end": 0.75,
+                         "threshold": 3}),
+             parse_zone({"name": "widget", "rect": [100, 100, 300, 200]}),
+             parse_zone({"name": "wide", "arc": "top_right", "radius": 40})]
+    table = ZoneTable(DISPLAY, 5, zones)
+    assert table.classify(480, 1079) == "dock"
+    assert table.classify(479, 1079) is None
+    assert table.classify(1439, 1077) == "dock"
+    assert table.classify(1439, 1076) is None
+    assert table.classify(1440, 1079) is None
+    assert table.classify(960, 1075) is None
+    assert table.classify(100, 100) == "widget"
+    assert table.classify(399, 299) == "widget"
+    assert table.classify(400, 299) is None
+    # The arc wins over the built-in corner it covers, and is round
+    assert table.classify(1919, 0) == "wide"
+    assert table.classify(1919 - 28, 28) == "wide"
+    assert table.classify(1919 - 30, 30) is None
+    assert table.classify(0, 0) == "top_left"
+
+
+def test_configured_zones_take_precedence_in_order():
+    zones = [ZoneSpec("first", "rect", rect=(0, 0, 64, 64)),
+             ZoneSpec("second", "rect", rect=(0, 0, 128, 128))]
+    table = ZoneTable(DISPLAY, 5, zones)
+    assert table.classify(0, 0) == "first"
+    assert table.classify(100, 100) == "second"
+    assert table.classify(1919, 1079) == "bottom_right"
+
+
+def test_zones_on_one_display():
+    displays = [Display(1, 0, 0, 1920, 1080), Display(2, -1280, 0, 1280, 1024)]
+    zones = [ZoneSpec("left_only", "rect", display=1, rect=(0, 0, 10, 10)),
+             ZoneSpec("missing", "rect", display=5, rect=(0, 0, 10, 10)),
+             ZoneSpec("everywhere", "edge", side="right", start=0.4, end=0.6)]
+    table = ZoneTable(displays, 5, zones)
+    assert table.classify(-1275, 5) == "left_only"
+    # The left display continues the main display's top left corner
+    assert table.classify(5, 5) is None
+    assert table.classify(1919, 500) == "everywhere"
+    assert table.classify(-1, 500) == "everywhere"
+    assert "missing" not in {name for _, name, *_ in table.regions}
+
+
+def test_nearest_zone():
+    table = ZoneTable(DISPLAY, 5)
+    assert table.nearest(20, 5) == (15.0, 5, 5)
+    assert table.nearest(0, 0)[0] == 0.0
+    assert ZoneTable(DISPLAY, 5, ()).nearest(960, 540)[0] > 0